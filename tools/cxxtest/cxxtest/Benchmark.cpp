@@ -0,0 +1,167 @@
+/*
+-------------------------------------------------------------------------
+ CxxTest: A lightweight C++ unit testing library.
+ Copyright (c) 2008 Sandia Corporation.
+ This software is distributed under the LGPL License v2.1
+ For more information, see the COPYING file in the top CxxTest directory.
+ Under the terms of Contract DE-AC04-94AL85000 with Sandia Corporation,
+ the U.S. Government retains certain rights in this software.
+-------------------------------------------------------------------------
+*/
+
+#ifndef __cxxtest__Benchmark_cpp__
+#define __cxxtest__Benchmark_cpp__
+
+#include <cxxtest/Benchmark.h>
+#include <cxxtest/Clock.h>
+#include <cxxtest/TestTracker.h>
+#include <math.h>
+#include <stdio.h>
+
+namespace CxxTest
+{
+    static BenchmarkResults *currentBenchmarkResults = 0;
+    static BenchmarkBaseline *currentBenchmarkBaseline = 0;
+    static unsigned currentBenchmarkSamples = CXXTEST_BENCHMARK_SAMPLES;
+    static unsigned currentBenchmarkThreshold = CXXTEST_BENCHMARK_THRESHOLD;
+
+    enum { MAX_BENCHMARK_ITERATIONS = 1u << 30 };
+
+    BenchmarkResults *benchmarkResults()
+    {
+        return currentBenchmarkResults;
+    }
+
+    void setBenchmarkResults( BenchmarkResults *results )
+    {
+        currentBenchmarkResults = results;
+    }
+
+    BenchmarkBaseline *benchmarkBaseline()
+    {
+        return currentBenchmarkBaseline;
+    }
+
+    void setBenchmarkBaseline( BenchmarkBaseline *baseline )
+    {
+        currentBenchmarkBaseline = baseline;
+    }
+
+    unsigned benchmarkSamples()
+    {
+        return currentBenchmarkSamples;
+    }
+
+    void setBenchmarkSamples( unsigned value )
+    {
+        currentBenchmarkSamples = value ? value : 1;
+    }
+
+    unsigned benchmarkThreshold()
+    {
+        return currentBenchmarkThreshold;
+    }
+
+    void setBenchmarkThreshold( unsigned percent )
+    {
+        currentBenchmarkThreshold = percent;
+    }
+
+    //
+    // The time count calls of a benchmark take.  A failure ends the calls.
+    //
+    static double timeCalls( TestDescription &td, unsigned count )
+    {
+        double start = wallClock();
+        for ( unsigned i = 0; i < count && !tracker().testFailed(); ++ i )
+            td.run();
+        return wallClock() - start;
+    }
+
+    //
+    // The minimum, median and standard deviation of the sample times.
+    // The times are sorted in place.
+    //
+    static void computeBenchmarkStats( double *times, unsigned count, BenchmarkStats &stats )
+    {
+        for ( unsigned i = 1; i < count; ++ i ) {
+            double t = times[i];
+            unsigned j = i;
+            for ( ; j > 0 && times[j - 1] > t; -- j )
+                times[j] = times[j - 1];
+            times[j] = t;
+        }
+
+        double sum = 0, squares = 0;
+        for ( unsigned i = 0; i < count; ++ i )
+            sum += times[i];
+        double mean = count ? sum / count : 0;
+        for ( unsigned i = 0; i < count; ++ i )
+            squares += (times[i] - mean) * (times[i] - mean);
+
+        stats.samples = count;
+        stats.min = count ? times[0] : 0;
+        stats.median = !count ? 0 :
+            (count % 2) ? times[count / 2] : (times[count / 2 - 1] + times[count / 2]) / 2;
+        stats.stddev = (count > 1) ? sqrt( squares / (count - 1) ) : 0;
+    }
+
+    //
+    // Run a benchmark and fill stats with the time of one call.
+    // Returns false if the benchmark failed.
+    //
+    bool measureBenchmark( TestDescription &td, BenchmarkStats &stats )
+    {
+        timeCalls( td, 1 );
+        unsigned iterations = 1;
+        while ( !tracker().testFailed() && iterations < MAX_BENCHMARK_ITERATIONS &&
+                timeCalls( td, iterations ) < CXXTEST_BENCHMARK_SAMPLE_TIME )
+            iterations *= 2;
+
+        unsigned samples = currentBenchmarkSamples;
+        double *times = new double[samples];
+        for ( unsigned i = 0; i < samples && !tracker().testFailed(); ++ i )
+            times[i] = timeCalls( td, iterations ) / iterations;
+
+        bool passed = !tracker().testFailed();
+        if ( passed ) {
+            stats.iterations = iterations;
+            computeBenchmarkStats( times, samples, stats );
+        }
+        delete [] times;
+        return passed;
+    }
+
+    //
+    // The slowest median that is not a regression from the baseline:
+    // the threshold above the baseline, plus the noise of both runs
+    //
+    double benchmarkLimit( const BenchmarkStats &baseline, const BenchmarkStats &stats )
+    {
+        double noise = sqrt( baseline.stddev * baseline.stddev + stats.stddev * stats.stddev );
+        return baseline.median * (1 + currentBenchmarkThreshold / 100.0) + 3 * noise;
+    }
+
+    //
+    // Print a time in the unit that suits it, e.g. "12.3us".  Times from
+    // a baseline file can be anything, so times that are too long for
+    // fixed notation, negative times and NaN are printed in exponent
+    // notation, which always fits in a buffer of BENCHMARK_TIME_SIZE.
+    //
+    char *formatBenchmarkTime( char *buffer, double seconds )
+    {
+        if ( !(seconds >= 0 && seconds < 1e6) )
+            sprintf( buffer, "%.3es", seconds );
+        else if ( seconds >= 1 )
+            sprintf( buffer, "%.3fs", seconds );
+        else if ( seconds >= 1e-3 )
+            sprintf( buffer, "%.3fms", seconds * 1e3 );
+        else if ( seconds >= 1e-6 )
+            sprintf( buffer, "%.3fus", seconds * 1e6 );
+        else
+            sprintf( buffer, "%.3fns", seconds * 1e9 );
+        return buffer;
+    }
+}
+
+#endif // __cxxtest__Benchmark_cpp__
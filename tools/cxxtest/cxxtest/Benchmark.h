@@ -0,0 +1,69 @@
+/*
+-------------------------------------------------------------------------
+ CxxTest: A lightweight C++ unit testing library.
+ Copyright (c) 2008 Sandia Corporation.
+ This software is distributed under the LGPL License v2.1
+ For more information, see the COPYING file in the top CxxTest directory.
+ Under the terms of Contract DE-AC04-94AL85000 with Sandia Corporation,
+ the U.S. Government retains certain rights in this software.
+-------------------------------------------------------------------------
+*/
+
+#ifndef __cxxtest__Benchmark_h__
+#define __cxxtest__Benchmark_h__
+
+//
+// Benchmarks are the bench*() functions of the test suites.  The
+// runner calls a benchmark once to warm up, doubles the number of
+// calls until they take long enough to be timed, and then times a
+// number of samples of that many calls.  The results are the times
+// of one call.  A benchmark regresses when its median is above the
+// median of its baseline by more than the threshold, in percent, and
+// by more than three standard deviations of the two runs.
+//
+
+#include <cxxtest/Flags.h>
+#include <cxxtest/Descriptions.h>
+
+namespace CxxTest
+{
+    struct BenchmarkStats
+    {
+        unsigned iterations, samples;
+        double min, median, stddev;
+    };
+
+    class BenchmarkResults
+    {
+    public:
+        virtual ~BenchmarkResults() {}
+        virtual void record( const TestDescription &td, const BenchmarkStats &stats ) = 0;
+    };
+
+    BenchmarkResults *benchmarkResults();
+    void setBenchmarkResults( BenchmarkResults *results );
+
+    class BenchmarkBaseline
+    {
+    public:
+        virtual ~BenchmarkBaseline() {}
+        virtual bool find( const TestDescription &td, BenchmarkStats &stats ) const = 0;
+    };
+
+    BenchmarkBaseline *benchmarkBaseline();
+    void setBenchmarkBaseline( BenchmarkBaseline *baseline );
+
+    unsigned benchmarkSamples();
+    void setBenchmarkSamples( unsigned value );
+
+    unsigned benchmarkThreshold();
+    void setBenchmarkThreshold( unsigned percent );
+
+    bool measureBenchmark( TestDescription &td, BenchmarkStats &stats );
+    double benchmarkLimit( const BenchmarkStats &baseline, const BenchmarkStats &stats );
+
+    enum { BENCHMARK_TIME_SIZE = 32 };
+    char *formatBenchmarkTime( char *buffer, double seconds );
+}
+
+#endif // __cxxtest__Benchmark_h__
@@ -0,0 +1,177 @@
+/*
+-------------------------------------------------------------------------
+ CxxTest: A lightweight C++ unit testing library.
+ Copyright (c) 2008 Sandia Corporation.
+ This software is distributed under the LGPL License v2.1
+ For more information, see the COPYING file in the top CxxTest directory.
+ Under the terms of Contract DE-AC04-94AL85000 with Sandia Corporation,
+ the U.S. Government retains certain rights in this software.
+-------------------------------------------------------------------------
+*/
+
+#ifndef __cxxtest__BenchmarkReport_cpp__
+#define __cxxtest__BenchmarkReport_cpp__
+
+#include <cxxtest/BenchmarkReport.h>
+
+#if defined(_CXXTEST_HAVE_STD)
+#   include <fstream>
+#   include <sstream>
+#   include <ctype.h>
+#   include <stdlib.h>
+#endif // _CXXTEST_HAVE_STD
+
+namespace CxxTest
+{
+#if defined(_CXXTEST_HAVE_STD)
+    static std::string jsonString( const std::string &s )
+    {
+        std::string quoted( "\"" );
+        for ( std::string::size_type i = 0; i < s.size(); ++ i ) {
+            if ( s[i] == '"' || s[i] == '\\' )
+                quoted += '\\';
+            quoted += s[i];
+        }
+        return quoted + "\"";
+    }
+
+    //
+    // A reader for the JSON that save() writes: an object with an array
+    // of benchmarks, each a flat object of strings and numbers
+    //
+    static bool readChar( const std::string &text, std::string::size_type &i, char c )
+    {
+        while ( i < text.size() && isspace( (unsigned char)text[i] ) )
+            ++ i;
+        if ( i >= text.size() || text[i] != c )
+            return false;
+        ++ i;
+        return true;
+    }
+
+    static bool readString( const std::string &text, std::string::size_type &i, std::string &value )
+    {
+        if ( !readChar( text, i, '"' ) )
+            return false;
+        value.clear();
+        for ( ; i < text.size() && text[i] != '"'; ++ i ) {
+            if ( text[i] == '\\' && ++ i >= text.size() )
+                return false;
+            value += text[i];
+        }
+        return i++ < text.size();
+    }
+
+    static bool readNumber( const std::string &text, std::string::size_type &i, double &value )
+    {
+        while ( i < text.size() && isspace( (unsigned char)text[i] ) )
+            ++ i;
+        const char *start = text.c_str() + i;
+        char *end = 0;
+        value = strtod( start, &end );
+        i += end - start;
+        return end != start;
+    }
+
+    bool BenchmarkReport::readResult( const std::string &text, std::string::size_type &i, Result &result )
+    {
+        BenchmarkStats stats = { 0, 0, 0, 0, 0 };
+        result.stats = stats;
+        if ( !readChar( text, i, '{' ) )
+            return false;
+        do {
+            std::string key;
+            double value = 0;
+            if ( !readString( text, i, key ) || !readChar( text, i, ':' ) )
+                return false;
+            if ( key == "suite" || key == "test" ) {
+                if ( !readString( text, i, (key == "suite") ? result.suite : result.test ) )
+                    return false;
+                continue;
+            }
+            if ( !readNumber( text, i, value ) )
+                return false;
+            if ( key == "iterations" )
+                result.stats.iterations = (unsigned)value;
+            else if ( key == "samples" )
+                result.stats.samples = (unsigned)value;
+            else if ( key == "min" )
+                result.stats.min = value;
+            else if ( key == "median" )
+                result.stats.median = value;
+            else if ( key == "stddev" )
+                result.stats.stddev = value;
+        } while ( readChar( text, i, ',' ) );
+        return readChar( text, i, '}' ) && !result.suite.empty() && !result.test.empty();
+    }
+
+    bool BenchmarkReport::load( const char *fileName )
+    {
+        std::ifstream input( fileName );
+        if ( !input )
+            return false;
+        std::ostringstream contents;
+        contents << input.rdbuf();
+        std::string text = contents.str(), key;
+        std::string::size_type i = 0;
+
+        if ( !readChar( text, i, '{' ) || !readString( text, i, key ) || key != "benchmarks" ||
+             !readChar( text, i, ':' ) || !readChar( text, i, '[' ) )
+            return false;
+        if ( readChar( text, i, ']' ) )
+            return true;
+        do {
+            Result result;
+            if ( !readResult( text, i, result ) )
+                return false;
+            _results.push_back( result );
+        } while ( readChar( text, i, ',' ) );
+        return readChar( text, i, ']' );
+    }
+
+    void BenchmarkReport::record( const TestDescription &td, const BenchmarkStats &stats )
+    {
+        Result result;
+        result.suite = td.suiteName();
+        result.test = td.testName();
+        result.stats = stats;
+        _results.push_back( result );
+    }
+
+    bool BenchmarkReport::find( const TestDescription &td, BenchmarkStats &stats ) const
+    {
+        for ( std::vector<Result>::const_iterator i = _results.begin(); i != _results.end(); ++ i ) {
+            if ( i->suite == td.suiteName() && i->test == td.testName() ) {
+                stats = i->stats;
+                return true;
+            }
+        }
+        return false;
+    }
+
+    //
+    // One benchmark per line, with its times in seconds
+    //
+    bool BenchmarkReport::save( const char *fileName ) const
+    {
+        std::ofstream output( fileName );
+        output.precision( 9 );
+        output << "{\n  \"benchmarks\": [";
+        for ( std::vector<Result>::const_iterator i = _results.begin(); i != _results.end(); ++ i ) {
+            output << (i == _results.begin() ? "\n" : ",\n");
+            output << "    {\"suite\": " << jsonString( i->suite ) <<
+                ", \"test\": " << jsonString( i->test ) <<
+                ", \"iterations\": " << i->stats.iterations <<
+                ", \"samples\": " << i->stats.samples <<
+                ", \"min\": " << i->stats.min <<
+                ", \"median\": " << i->stats.median <<
+                ", \"stddev\": " << i->stats.stddev << "}";
+        }
+        output << "\n  ]\n}\n";
+        output.close();
+        return !output.fail();
+    }
+#endif // _CXXTEST_HAVE_STD
+}
+
+#endif // __cxxtest__BenchmarkReport_cpp__
@@ -0,0 +1,54 @@
+/*
+-------------------------------------------------------------------------
+ CxxTest: A lightweight C++ unit testing library.
+ Copyright (c) 2008 Sandia Corporation.
+ This software is distributed under the LGPL License v2.1
+ For more information, see the COPYING file in the top CxxTest directory.
+ Under the terms of Contract DE-AC04-94AL85000 with Sandia Corporation,
+ the U.S. Government retains certain rights in this software.
+-------------------------------------------------------------------------
+*/
+
+#ifndef __cxxtest__BenchmarkReport_h__
+#define __cxxtest__BenchmarkReport_h__
+
+//
+// The benchmark results of a run, which the runner options
+// --bench-results and --save-baseline write to a JSON file.  The
+// results loaded with --baseline are the baseline of the next run.
+//
+
+#include <cxxtest/Flags.h>
+#include <cxxtest/Benchmark.h>
+
+#if defined(_CXXTEST_HAVE_STD)
+#   include <cxxtest/StdHeaders.h>
+#endif // _CXXTEST_HAVE_STD
+
+namespace CxxTest
+{
+#if defined(_CXXTEST_HAVE_STD)
+    class BenchmarkReport : public BenchmarkResults, public BenchmarkBaseline
+    {
+    public:
+        bool load( const char *fileName );
+        bool save( const char *fileName ) const;
+
+        void record( const TestDescription &td, const BenchmarkStats &stats );
+        bool find( const TestDescription &td, BenchmarkStats &stats ) const;
+
+    private:
+        struct Result
+        {
+            std::string suite, test;
+            BenchmarkStats stats;
+        };
+
+        static bool readResult( const std::string &text, std::string::size_type &i, Result &result );
+
+        std::vector<Result> _results;
+    };
+#endif // _CXXTEST_HAVE_STD
+}
+
+#endif // __cxxtest__BenchmarkReport_h__
@@ -0,0 +1,41 @@
+/*
+-------------------------------------------------------------------------
+ CxxTest: A lightweight C++ unit testing library.
+ Copyright (c) 2008 Sandia Corporation.
+ This software is distributed under the LGPL License v2.1
+ For more information, see the COPYING file in the top CxxTest directory.
+ Under the terms of Contract DE-AC04-94AL85000 with Sandia Corporation,
+ the U.S. Government retains certain rights in this software.
+-------------------------------------------------------------------------
+*/
+
+#ifndef __cxxtest__Clock_cpp__
+#define __cxxtest__Clock_cpp__
+
+#include <cxxtest/Clock.h>
+#include <time.h>
+
+namespace CxxTest
+{
+    double wallClock()
+    {
+#if defined(CLOCK_MONOTONIC)
+        struct timespec now;
+        if ( clock_gettime( CLOCK_MONOTONIC, &now ) == 0 )
+            return (double)now.tv_sec + (double)now.tv_nsec * 1e-9;
+#endif // CLOCK_MONOTONIC
+        return (double)clock() / CLOCKS_PER_SEC;
+    }
+
+    double cpuClock()
+    {
+#if defined(CLOCK_PROCESS_CPUTIME_ID)
+        struct timespec now;
+        if ( clock_gettime( CLOCK_PROCESS_CPUTIME_ID, &now ) == 0 )
+            return (double)now.tv_sec + (double)now.tv_nsec * 1e-9;
+#endif // CLOCK_PROCESS_CPUTIME_ID
+        return (double)clock() / CLOCKS_PER_SEC;
+    }
+}
+
+#endif // __cxxtest__Clock_cpp__
@@ -0,0 +1,29 @@
+/*
+-------------------------------------------------------------------------
+ CxxTest: A lightweight C++ unit testing library.
+ Copyright (c) 2008 Sandia Corporation.
+ This software is distributed under the LGPL License v2.1
+ For more information, see the COPYING file in the top CxxTest directory.
+ Under the terms of Contract DE-AC04-94AL85000 with Sandia Corporation,
+ the U.S. Government retains certain rights in this software.
+-------------------------------------------------------------------------
+*/
+
+#ifndef __cxxtest__Clock_h__
+#define __cxxtest__Clock_h__
+
+//
+// The clocks used to time tests, in seconds from an arbitrary origin.
+// wallClock() is monotonic where the system provides a monotonic
+// clock; cpuClock() is the processor time used by this process.
+//
+
+#include <cxxtest/Flags.h>
+
+namespace CxxTest
+{
+    double wallClock();
+    double cpuClock();
+}
+
+#endif // __cxxtest__Clock_h__
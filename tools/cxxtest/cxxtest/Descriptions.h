@@ -33,6 +33,8 @@ namespace CxxTest
         virtual const char *testName() const = 0;
         virtual const char *suiteName() const = 0;
         
+        virtual bool isBenchmark() const { return false; }
+
         virtual void run() = 0;
         virtual bool setUp() = 0;
         virtual bool tearDown() = 0;
@@ -50,10 +50,17 @@ namespace CxxTest
             _reported( false ),
             _o(o),
             _preLine(preLine),
-            _postLine(postLine)
+            _postLine(postLine),
+            _slowest(0),
+            _numSlowest(0)
         {
         }
 
+        ~ErrorFormatter()
+        {
+            delete [] _slowest;
+        }
+
         int run()
         {
             TestRunner::runAllTests( *this );
@@ -66,6 +73,9 @@ namespace CxxTest
             _o->flush();
             _dotting = true;
             _reported = false;
+            delete [] _slowest;
+            _slowest = tracker().print_slowest ? new SlowTest[tracker().print_slowest] : 0;
+            _numSlowest = 0;
         }
 
         static void totalTests( OutputStream &o )
@@ -85,7 +95,7 @@ namespace CxxTest
             _reported = false;
         }
 
-        void leaveTest( const TestDescription & )
+        void leaveTest( const TestDescription &td )
         {
             if ( !tracker().testFailed() ) {
                 (*_o) << ".";
@@ -93,18 +103,22 @@ namespace CxxTest
                 fflush(stdout);
                 _dotting = true;
             }
+            reportBenchmark( td );
+            recordTime( td );
         }
 
         void leaveWorld( const WorldDescription &desc )
         {
             if ( !tracker().failedTests() ) {
                 (*_o) << "OK!" << endl;
-                return;
             }
-            newLine();
-            (*_o) << "Failed " << tracker().failedTests() << " of " << totalTests << endl;
-            unsigned numPassed = desc.numTotalTests() - tracker().failedTests();
-            (*_o) << "Success rate: " << (numPassed * 100 / desc.numTotalTests()) << "%" << endl;
+            else {
+                newLine();
+                (*_o) << "Failed " << tracker().failedTests() << " of " << totalTests << endl;
+                unsigned numPassed = desc.numTotalTests() - tracker().failedTests();
+                (*_o) << "Success rate: " << (numPassed * 100 / desc.numTotalTests()) << "%" << endl;
+            }
+            reportSlowest();
         }
 
         void trace( const char *file, int line, const char *expression )
@@ -287,16 +301,83 @@ namespace CxxTest
             (*_o) << "}" << endl;
         }
 
+        void reportBenchmark( const TestDescription &td )
+        {
+            const BenchmarkStats *stats = tracker().testBenchmark();
+            if ( !stats )
+                return;
+            char min[BENCHMARK_TIME_SIZE], median[BENCHMARK_TIME_SIZE], stddev[BENCHMARK_TIME_SIZE];
+            newLine();
+            (*_o) << "Benchmark " << td.suiteName() << "::" << td.testName() <<
+                ": min " << formatBenchmarkTime( min, stats->min ) <<
+                ", median " << formatBenchmarkTime( median, stats->median ) <<
+                ", stddev " << formatBenchmarkTime( stddev, stats->stddev ) <<
+                " (" << stats->iterations << (stats->iterations == 1 ? " call x " : " calls x ") <<
+                stats->samples << (stats->samples == 1 ? " sample)" : " samples)");
+
+            BenchmarkStats baseline;
+            if ( benchmarkBaseline() && benchmarkBaseline()->find( td, baseline ) && baseline.median > 0 ) {
+                char change[32];
+                double percent = (stats->median / baseline.median - 1) * 100;
+                if ( percent < 1e6 )
+                    sprintf( change, "%+.1f%%", percent );
+                else
+                    sprintf( change, "%+.3e%%", percent );
+                (*_o) << ", baseline median " << formatBenchmarkTime( median, baseline.median ) <<
+                    " (" << change << ")";
+            }
+            (*_o) << endl;
+        }
+
+        //
+        // Keep the slowest tests, slowest first
+        //
+        void recordTime( const TestDescription &td )
+        {
+            unsigned max = tracker().print_slowest;
+            double wall = tracker().testWallTime();
+            if ( !_slowest || (_numSlowest == max && wall <= _slowest[max - 1].wall) )
+                return;
+            unsigned i = (_numSlowest < max) ? _numSlowest++ : max - 1;
+            for ( ; i > 0 && _slowest[i - 1].wall < wall; -- i )
+                _slowest[i] = _slowest[i - 1];
+            _slowest[i].test = &td;
+            _slowest[i].wall = wall;
+            _slowest[i].cpu = tracker().testCpuTime();
+        }
+
+        void reportSlowest()
+        {
+            if ( !_numSlowest )
+                return;
+            (*_o) << "Slowest " << _numSlowest << (_numSlowest == 1 ? " test:" : " tests:") << endl;
+            for ( unsigned i = 0; i < _numSlowest; ++ i ) {
+                char wall[32], cpu[32];
+                sprintf( wall, "%.3f", _slowest[i].wall );
+                sprintf( cpu, "%.3f", _slowest[i].cpu );
+                (*_o) << "   " << wall << "s wall, " << cpu << "s cpu: " <<
+                    _slowest[i].test->suiteName() << "::" << _slowest[i].test->testName() << endl;
+            }
+        }
+
         static void endl( OutputStream &o )
         {
             OutputStream::endl( o );
         }
 
+        struct SlowTest
+        {
+            const TestDescription *test;
+            double wall, cpu;
+        };
+
         bool _dotting;
         bool _reported;
         OutputStream *_o;
         const char *_preLine;
         const char *_postLine;
+        SlowTest *_slowest;
+        unsigned _numSlowest;
     };
 }
 
@@ -28,6 +28,10 @@
 #   define _CXXTEST_HAVE_STD
 #endif // CXXTEST_HAVE_STD
 
+#if defined(CXXTEST_HAVE_FORK) && !defined(_CXXTEST_HAVE_FORK)
+#   define _CXXTEST_HAVE_FORK
+#endif // CXXTEST_HAVE_FORK
+
 #if defined(CXXTEST_OLD_TEMPLATE_SYNTAX) && !defined(_CXXTEST_OLD_TEMPLATE_SYNTAX)
 #   define _CXXTEST_OLD_TEMPLATE_SYNTAX
 #endif // CXXTEST_OLD_TEMPLATE_SYNTAX
@@ -63,6 +67,30 @@
 #   define CXXTEST_MAX_DUMP_SIZE 0
 #endif // CXXTEST_MAX_DUMP_SIZE
 
+#ifndef CXXTEST_TEST_TIMEOUT
+#   define CXXTEST_TEST_TIMEOUT 0
+#endif // CXXTEST_TEST_TIMEOUT
+
+#ifndef CXXTEST_SUITE_TIMEOUT
+#   define CXXTEST_SUITE_TIMEOUT 0
+#endif // CXXTEST_SUITE_TIMEOUT
+
+#ifndef CXXTEST_ISOLATION
+#   define CXXTEST_ISOLATION 0
+#endif // CXXTEST_ISOLATION
+
+#ifndef CXXTEST_BENCHMARK_SAMPLES
+#   define CXXTEST_BENCHMARK_SAMPLES 10
+#endif // CXXTEST_BENCHMARK_SAMPLES
+
+#ifndef CXXTEST_BENCHMARK_SAMPLE_TIME
+#   define CXXTEST_BENCHMARK_SAMPLE_TIME 0.01
+#endif // CXXTEST_BENCHMARK_SAMPLE_TIME
+
+#ifndef CXXTEST_BENCHMARK_THRESHOLD
+#   define CXXTEST_BENCHMARK_THRESHOLD 10
+#endif // CXXTEST_BENCHMARK_THRESHOLD
+
 #if defined(_CXXTEST_ABORT_TEST_ON_FAIL) && !defined(CXXTEST_DEFAULT_ABORT)
 #   define CXXTEST_DEFAULT_ABORT true
 #endif // _CXXTEST_ABORT_TEST_ON_FAIL && !CXXTEST_DEFAULT_ABORT
@@ -76,6 +104,11 @@
 #   undef _CXXTEST_ABORT_TEST_ON_FAIL
 #endif // _CXXTEST_ABORT_TEST_ON_FAIL && !_CXXTEST_HAVE_EH
 
+#if defined(_CXXTEST_HAVE_FORK) && !defined(__unix__) && !defined(__APPLE__)
+#   warning "CXXTEST_HAVE_FORK is meaningless without fork()"
+#   undef _CXXTEST_HAVE_FORK
+#endif // _CXXTEST_HAVE_FORK && !unix
+
 //
 // Some minimal per-compiler configuration to allow us to compile
 //
@@ -0,0 +1,146 @@
+/*
+-------------------------------------------------------------------------
+ CxxTest: A lightweight C++ unit testing library.
+ Copyright (c) 2008 Sandia Corporation.
+ This software is distributed under the LGPL License v2.1
+ For more information, see the COPYING file in the top CxxTest directory.
+ Under the terms of Contract DE-AC04-94AL85000 with Sandia Corporation,
+ the U.S. Government retains certain rights in this software.
+-------------------------------------------------------------------------
+*/
+
+#ifndef __cxxtest__LastRun_cpp__
+#define __cxxtest__LastRun_cpp__
+
+#include <cxxtest/LastRun.h>
+#include <stdio.h>
+
+#if defined(_CXXTEST_HAVE_STD)
+#   include <fstream>
+#endif // _CXXTEST_HAVE_STD
+
+namespace CxxTest
+{
+    static TestResults *currentTestResults = 0;
+
+    TestResults *testResults()
+    {
+        return currentTestResults;
+    }
+
+    void setTestResults( TestResults *results )
+    {
+        currentTestResults = results;
+    }
+
+    //
+    // FNV-1a hash of the contents of a file
+    //
+    unsigned long fileContentsHash( const char *fileName, bool &found )
+    {
+        unsigned long h = 2166136261UL;
+        FILE *file = fopen( fileName, "rb" );
+        found = (file != 0);
+        if ( !file )
+            return h;
+        unsigned char buffer[4096];
+        size_t n;
+        while ( (n = fread( buffer, 1, sizeof(buffer), file )) > 0 )
+            for ( size_t i = 0; i < n; ++ i )
+                h = ((h ^ buffer[i]) * 16777619UL) & 0xFFFFFFFFUL;
+        fclose( file );
+        return h;
+    }
+
+#if defined(_CXXTEST_HAVE_STD)
+    //
+    // The results file has a line "failed <suite> <test>" for every test
+    // that failed and a line "header <hash> <file>" for every header.  A
+    // file that does not exist yet is a run without failures.
+    //
+    bool LastRun::load( const char *fileName, const WorldDescription &wd )
+    {
+        for ( const SuiteDescription *sd = wd.firstSuite(); sd; sd = sd->next() ) {
+            bool found;
+            unsigned long hash = fileContentsHash( sd->file(), found );
+            if ( found )
+                _hashes[sd->file()] = hash;
+        }
+
+        std::ifstream input( fileName );
+        if ( !input )
+            return true;
+        std::string kind;
+        while ( input >> kind ) {
+            if ( kind == "failed" ) {
+                std::string suite, test;
+                if ( !(input >> suite >> test) )
+                    return false;
+                _failed.insert( Name( suite, test ) );
+            }
+            else if ( kind == "header" ) {
+                unsigned long hash;
+                std::string file;
+                if ( !(input >> std::hex >> hash >> std::dec) || !std::getline( input >> std::ws, file ) )
+                    return false;
+                _lastHashes[file] = hash;
+            }
+            else
+                return false;
+        }
+        return input.eof();
+    }
+
+    bool LastRun::save( const char *fileName ) const
+    {
+        std::map<std::string, unsigned long> hashes( _lastHashes );
+        for ( std::map<std::string, unsigned long>::const_iterator i = _hashes.begin(); i != _hashes.end(); ++ i )
+            hashes[i->first] = i->second;
+
+        std::ofstream output( fileName );
+        for ( std::set<Name>::const_iterator i = _failed.begin(); i != _failed.end(); ++ i )
+            output << "failed " << i->first << " " << i->second << "\n";
+        output << std::hex;
+        for ( std::map<std::string, unsigned long>::const_iterator i = hashes.begin(); i != hashes.end(); ++ i )
+            output << "header " << i->second << " " << i->first << "\n";
+        output.close();
+        return !output.fail();
+    }
+
+    unsigned LastRun::rank( const SuiteDescription &sd ) const
+    {
+        for ( const TestDescription *td = sd.firstTest(); td; td = td->next() )
+            if ( failed( sd.suiteName(), td->testName() ) )
+                return FAILED;
+
+        std::map<std::string, unsigned long>::const_iterator now = _hashes.find( sd.file() );
+        if ( now == _hashes.end() )
+            return UNCHANGED;
+        std::map<std::string, unsigned long>::const_iterator last = _lastHashes.find( sd.file() );
+        if ( last == _lastHashes.end() || last->second != now->second )
+            return CHANGED;
+        return UNCHANGED;
+    }
+
+    unsigned LastRun::rank( const TestDescription &td ) const
+    {
+        return failed( td.suiteName(), td.testName() ) ? FAILED : UNCHANGED;
+    }
+
+    void LastRun::record( const TestDescription &td, bool failed )
+    {
+        Name name( td.suiteName(), td.testName() );
+        if ( failed )
+            _failed.insert( name );
+        else
+            _failed.erase( name );
+    }
+
+    bool LastRun::failed( const char *suiteName, const char *testName ) const
+    {
+        return _failed.count( Name( suiteName, testName ) ) > 0;
+    }
+#endif // _CXXTEST_HAVE_STD
+}
+
+#endif // __cxxtest__LastRun_cpp__
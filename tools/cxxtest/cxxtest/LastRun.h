@@ -0,0 +1,77 @@
+/*
+-------------------------------------------------------------------------
+ CxxTest: A lightweight C++ unit testing library.
+ Copyright (c) 2008 Sandia Corporation.
+ This software is distributed under the LGPL License v2.1
+ For more information, see the COPYING file in the top CxxTest directory.
+ Under the terms of Contract DE-AC04-94AL85000 with Sandia Corporation,
+ the U.S. Government retains certain rights in this software.
+-------------------------------------------------------------------------
+*/
+
+#ifndef __cxxtest__LastRun_h__
+#define __cxxtest__LastRun_h__
+
+//
+// The results of the last run: the tests that failed and the contents
+// of the headers of the suites.  They are used to run the tests that
+// failed first, then the tests of the headers that changed since.
+//
+
+#include <cxxtest/Flags.h>
+#include <cxxtest/Descriptions.h>
+
+#if defined(_CXXTEST_HAVE_STD)
+#   include <cxxtest/StdHeaders.h>
+#endif // _CXXTEST_HAVE_STD
+
+namespace CxxTest
+{
+    class TestResults
+    {
+    public:
+        virtual ~TestResults() {}
+        virtual void record( const TestDescription &td, bool failed ) = 0;
+    };
+
+    TestResults *testResults();
+    void setTestResults( TestResults *results );
+
+    //
+    // The order of the suites and tests of a run; lower ranks run first
+    //
+    class TestOrder
+    {
+    public:
+        virtual ~TestOrder() {}
+        virtual unsigned rank( const SuiteDescription &sd ) const = 0;
+        virtual unsigned rank( const TestDescription &td ) const = 0;
+    };
+
+    unsigned long fileContentsHash( const char *fileName, bool &found );
+
+#if defined(_CXXTEST_HAVE_STD)
+    class LastRun : public TestResults, public TestOrder
+    {
+    public:
+        enum { FAILED, CHANGED, UNCHANGED };
+
+        bool load( const char *fileName, const WorldDescription &wd );
+        bool save( const char *fileName ) const;
+
+        unsigned rank( const SuiteDescription &sd ) const;
+        unsigned rank( const TestDescription &td ) const;
+        void record( const TestDescription &td, bool failed );
+
+    private:
+        typedef std::pair<std::string, std::string> Name;
+
+        bool failed( const char *suiteName, const char *testName ) const;
+
+        std::set<Name> _failed;
+        std::map<std::string, unsigned long> _lastHashes, _hashes;
+    };
+#endif // _CXXTEST_HAVE_STD
+}
+
+#endif // __cxxtest__LastRun_h__
@@ -0,0 +1,1252 @@
+/*
+-------------------------------------------------------------------------
+ CxxTest: A lightweight C++ unit testing library.
+ Copyright (c) 2008 Sandia Corporation.
+ This software is distributed under the LGPL License v2.1
+ For more information, see the COPYING file in the top CxxTest directory.
+ Under the terms of Contract DE-AC04-94AL85000 with Sandia Corporation,
+ the U.S. Government retains certain rights in this software.
+-------------------------------------------------------------------------
+*/
+
+#ifndef __cxxtest__ParallelRunner_cpp__
+#define __cxxtest__ParallelRunner_cpp__
+
+#include <cxxtest/ParallelRunner.h>
+#include <cxxtest/TestTracker.h>
+#include <cxxtest/Timings.h>
+#include <cxxtest/Clock.h>
+
+#if defined(_CXXTEST_HAVE_FORK)
+#   include <errno.h>
+#   include <poll.h>
+#   include <signal.h>
+#   include <stdio.h>
+#   include <string.h>
+#   include <sys/wait.h>
+#   include <unistd.h>
+#endif // _CXXTEST_HAVE_FORK
+
+namespace CxxTest
+{
+    //
+    // Number of worker processes
+    //
+    static unsigned currentParallelJobs = 1;
+
+    unsigned parallelJobs()
+    {
+        return currentParallelJobs;
+    }
+
+    void setParallelJobs( unsigned value )
+    {
+        currentParallelJobs = value;
+    }
+
+    //
+    // Whether each suite or each test runs in a process of its own
+    //
+    static unsigned currentIsolation = CXXTEST_ISOLATION;
+
+    unsigned isolation()
+    {
+        return currentIsolation;
+    }
+
+    void setIsolation( unsigned value )
+    {
+        currentIsolation = value;
+    }
+
+    //
+    // Time limits in seconds, zero for no limit
+    //
+    static unsigned currentTestTimeLimit = CXXTEST_TEST_TIMEOUT;
+    static unsigned currentSuiteTimeLimit = CXXTEST_SUITE_TIMEOUT;
+
+    unsigned testTimeLimit()
+    {
+        return currentTestTimeLimit;
+    }
+
+    void setTestTimeLimit( unsigned seconds )
+    {
+        currentTestTimeLimit = seconds;
+    }
+
+    unsigned suiteTimeLimit()
+    {
+        return currentSuiteTimeLimit;
+    }
+
+    void setSuiteTimeLimit( unsigned seconds )
+    {
+        currentSuiteTimeLimit = seconds;
+    }
+
+#if defined(_CXXTEST_HAVE_FORK)
+    //
+    // A record is a one byte kind and the size of its fields, followed
+    // by the fields.  Strings and data blocks are preceded by their size
+    // and strings keep their terminating null; zero stands for a null
+    // pointer.
+    //
+    enum
+    {
+        EventEnterSuite, EventEnterTest, EventTrace, EventWarning,
+        EventFailedTest, EventFailedAssert, EventFailedAssertEquals,
+        EventFailedAssertSameData, EventFailedAssertDelta,
+        EventFailedAssertDiffers, EventFailedAssertLessThan,
+        EventFailedAssertLessThanEquals, EventFailedAssertPredicate,
+        EventFailedAssertRelation, EventFailedAssertThrows,
+        EventFailedAssertThrowsNot, EventFailedAssertSameFiles,
+        EventOutput, EventLeaveTest, EventLeaveSuite, EventCrash,
+        EventAbort, EventSuiteDone
+    };
+
+    static const unsigned EVENT_HEADER_SIZE = 1 + sizeof(unsigned);
+
+    static bool writeAll( int fd, const void *data, unsigned size )
+    {
+        const char *p = (const char *)data;
+        while ( size > 0 ) {
+            ssize_t n = write( fd, p, size );
+            if ( n < 0 && errno == EINTR )
+                continue;
+            if ( n <= 0 )
+                return false;
+            p += n;
+            size -= (unsigned)n;
+        }
+        return true;
+    }
+
+    static bool readAll( int fd, void *data, unsigned size )
+    {
+        char *p = (char *)data;
+        while ( size > 0 ) {
+            ssize_t n = read( fd, p, size );
+            if ( n < 0 && errno == EINTR )
+                continue;
+            if ( n <= 0 )
+                return false;
+            p += n;
+            size -= (unsigned)n;
+        }
+        return true;
+    }
+
+    static unsigned recordSize( const char *data, unsigned size )
+    {
+        unsigned fields;
+        if ( size < EVENT_HEADER_SIZE )
+            return 0;
+        memcpy( &fields, data + 1, sizeof(fields) );
+        if ( size - EVENT_HEADER_SIZE < fields )
+            return 0;
+        return EVENT_HEADER_SIZE + fields;
+    }
+
+    static void appendCrash( EventBuffer &events, const char *message )
+    {
+        unsigned char kind = EventCrash;
+        unsigned size = (unsigned)strlen( message ) + 1;
+        unsigned fields = sizeof(size) + size;
+        events.append( &kind, 1 );
+        events.append( &fields, sizeof(fields) );
+        events.append( &size, sizeof(size) );
+        events.append( message, size );
+    }
+
+    //
+    // EventBuffer
+    //
+    EventBuffer::EventBuffer() : _data( 0 ), _size( 0 ), _capacity( 0 ) {}
+    EventBuffer::~EventBuffer() { delete [] _data; }
+
+    void EventBuffer::append( const void *bytes, unsigned count )
+    {
+        if ( _size + count > _capacity ) {
+            unsigned capacity = _capacity ? _capacity : 256;
+            while ( capacity < _size + count )
+                capacity *= 2;
+            char *p = new char[capacity];
+            if ( _size )
+                memcpy( p, _data, _size );
+            delete [] _data;
+            _data = p;
+            _capacity = capacity;
+        }
+        if ( count )
+            memcpy( _data + _size, bytes, count );
+        _size += count;
+    }
+
+    void EventBuffer::consume( unsigned count )
+    {
+        if ( count < _size )
+            memmove( _data, _data + count, _size - count );
+        _size = (count < _size) ? _size - count : 0;
+    }
+
+    void EventBuffer::clear()
+    {
+        delete [] _data;
+        _data = 0;
+        _size = _capacity = 0;
+    }
+
+    //
+    // EventWriter
+    //
+    EventWriter::EventWriter( int fd ) :
+        _fd( fd ),
+        _suite( 0 ),
+        _test( 0 ),
+        _testIndex( 0 )
+    {
+        // The output of the tests goes to temporary files and is sent
+        // to the parent with the next notification
+        fflush( 0 );
+        for ( int i = 0; i < 2; ++ i ) {
+            _capture[i] = _saved[i] = -1;
+            FILE *f = tmpfile();
+            if ( !f )
+                continue;
+            _capture[i] = dup( fileno( f ) );
+            fclose( f );
+            _saved[i] = dup( i + 1 );
+            dup2( _capture[i], i + 1 );
+        }
+    }
+
+    EventWriter::~EventWriter()
+    {
+        sendOutput();
+        for ( int i = 0; i < 2; ++ i ) {
+            if ( _saved[i] >= 0 ) {
+                dup2( _saved[i], i + 1 );
+                close( _saved[i] );
+            }
+            if ( _capture[i] >= 0 )
+                close( _capture[i] );
+        }
+    }
+
+    void EventWriter::begin( unsigned char kind )
+    {
+        sendOutput();
+        start( kind );
+    }
+
+    void EventWriter::start( unsigned char kind )
+    {
+        unsigned fields = 0;
+        _record.consume( _record.size() );
+        _record.append( &kind, 1 );
+        _record.append( &fields, sizeof(fields) );
+    }
+
+    void EventWriter::put( int value )
+    {
+        _record.append( &value, sizeof(value) );
+    }
+
+    void EventWriter::put( double value )
+    {
+        _record.append( &value, sizeof(value) );
+    }
+
+    void EventWriter::put( const char *s )
+    {
+        unsigned size = s ? (unsigned)strlen( s ) + 1 : 0;
+        _record.append( &size, sizeof(size) );
+        _record.append( s, size );
+    }
+
+    void EventWriter::put( const void *data, unsigned size )
+    {
+        if ( !data )
+            size = 0;
+        _record.append( &size, sizeof(size) );
+        _record.append( data, size );
+    }
+
+    void EventWriter::end()
+    {
+        unsigned fields = _record.size() - EVENT_HEADER_SIZE;
+        memcpy( (char *)_record.data() + 1, &fields, sizeof(fields) );
+        writeAll( _fd, _record.data(), _record.size() );
+    }
+
+    void EventWriter::sendOutput()
+    {
+        // The C++ streams are synchronized with stdio, so this flushes
+        // them as well
+        fflush( stdout );
+        fflush( stderr );
+        for ( int i = 0; i < 2; ++ i ) {
+            if ( _capture[i] < 0 )
+                continue;
+            off_t size = lseek( _capture[i], 0, SEEK_CUR );
+            if ( size <= 0 )
+                continue;
+            start( EventOutput );
+            put( i + 1 );
+            unsigned sizeField = (unsigned)size;
+            _record.append( &sizeField, sizeof(sizeField) );
+            lseek( _capture[i], 0, SEEK_SET );
+            char data[4096];
+            ssize_t n;
+            while ( (n = read( _capture[i], data, sizeof(data) )) > 0 )
+                _record.append( data, (unsigned)n );
+            if ( ftruncate( _capture[i], 0 ) == 0 )
+                lseek( _capture[i], 0, SEEK_SET );
+            end();
+        }
+    }
+
+    void EventWriter::enterSuite( const SuiteDescription &sd )
+    {
+        _suite = &sd;
+        _test = 0;
+        begin( EventEnterSuite );
+        end();
+    }
+
+    void EventWriter::enterTest( const TestDescription &td )
+    {
+        if ( _test && _test->next() == &td )
+            ++ _testIndex;
+        else {
+            _testIndex = 0;
+            for ( const TestDescription *t = _suite->firstTest(); t && t != &td; t = t->next() )
+                ++ _testIndex;
+        }
+        _test = &td;
+        begin( EventEnterTest );
+        put( (int)_testIndex );
+        end();
+    }
+
+    void EventWriter::failure( unsigned char kind, const char *file, int line )
+    {
+        begin( kind );
+        put( file );
+        put( line );
+    }
+
+    void EventWriter::trace( const char *file, int line, const char *expression )
+    {
+        failure( EventTrace, file, line );
+        put( expression );
+        end();
+    }
+
+    void EventWriter::warning( const char *file, int line, const char *expression )
+    {
+        failure( EventWarning, file, line );
+        put( expression );
+        end();
+    }
+
+    void EventWriter::failedTest( const char *file, int line, const char *expression )
+    {
+        failure( EventFailedTest, file, line );
+        put( expression );
+        end();
+    }
+
+    void EventWriter::failedAssert( const char *file, int line, const char *expression )
+    {
+        failure( EventFailedAssert, file, line );
+        put( expression );
+        end();
+    }
+
+    void EventWriter::failedAssertEquals( const char *file, int line,
+                                          const char *xStr, const char *yStr,
+                                          const char *x, const char *y )
+    {
+        failure( EventFailedAssertEquals, file, line );
+        put( xStr );
+        put( yStr );
+        put( x );
+        put( y );
+        end();
+    }
+
+    void EventWriter::failedAssertSameData( const char *file, int line,
+                                            const char *xStr, const char *yStr,
+                                            const char *sizeStr, const void *x,
+                                            const void *y, unsigned size )
+    {
+        failure( EventFailedAssertSameData, file, line );
+        put( xStr );
+        put( yStr );
+        put( sizeStr );
+        put( (int)size );
+        put( x, size );
+        put( y, size );
+        end();
+    }
+
+    void EventWriter::failedAssertDelta( const char *file, int line,
+                                         const char *xStr, const char *yStr, const char *dStr,
+                                         const char *x, const char *y, const char *d )
+    {
+        failure( EventFailedAssertDelta, file, line );
+        put( xStr );
+        put( yStr );
+        put( dStr );
+        put( x );
+        put( y );
+        put( d );
+        end();
+    }
+
+    void EventWriter::failedAssertDiffers( const char *file, int line,
+                                           const char *xStr, const char *yStr,
+                                           const char *value )
+    {
+        failure( EventFailedAssertDiffers, file, line );
+        put( xStr );
+        put( yStr );
+        put( value );
+        end();
+    }
+
+    void EventWriter::failedAssertLessThan( const char *file, int line,
+                                            const char *xStr, const char *yStr,
+                                            const char *x, const char *y )
+    {
+        failure( EventFailedAssertLessThan, file, line );
+        put( xStr );
+        put( yStr );
+        put( x );
+        put( y );
+        end();
+    }
+
+    void EventWriter::failedAssertLessThanEquals( const char *file, int line,
+                                                  const char *xStr, const char *yStr,
+                                                  const char *x, const char *y )
+    {
+        failure( EventFailedAssertLessThanEquals, file, line );
+        put( xStr );
+        put( yStr );
+        put( x );
+        put( y );
+        end();
+    }
+
+    void EventWriter::failedAssertPredicate( const char *file, int line,
+                                             const char *predicate, const char *xStr, const char *x )
+    {
+        failure( EventFailedAssertPredicate, file, line );
+        put( predicate );
+        put( xStr );
+        put( x );
+        end();
+    }
+
+    void EventWriter::failedAssertRelation( const char *file, int line,
+                                            const char *relation, const char *xStr, const char *yStr,
+                                            const char *x, const char *y )
+    {
+        failure( EventFailedAssertRelation, file, line );
+        put( relation );
+        put( xStr );
+        put( yStr );
+        put( x );
+        put( y );
+        end();
+    }
+
+    void EventWriter::failedAssertThrows( const char *file, int line,
+                                          const char *expression, const char *type,
+                                          bool otherThrown )
+    {
+        failure( EventFailedAssertThrows, file, line );
+        put( expression );
+        put( type );
+        put( (int)otherThrown );
+        end();
+    }
+
+    void EventWriter::failedAssertThrowsNot( const char *file, int line, const char *expression )
+    {
+        failure( EventFailedAssertThrowsNot, file, line );
+        put( expression );
+        end();
+    }
+
+    void EventWriter::failedAssertSameFiles( const char *file, int line,
+                                             const char *file1, const char *file2,
+                                             const char *explanation )
+    {
+        failure( EventFailedAssertSameFiles, file, line );
+        put( file1 );
+        put( file2 );
+        put( explanation );
+        end();
+    }
+
+    void EventWriter::leaveTest( const TestDescription & )
+    {
+        begin( EventLeaveTest );
+        put( tracker().testWallTime() );
+        put( tracker().testCpuTime() );
+        const BenchmarkStats *stats = tracker().testBenchmark();
+        if ( stats ) {
+            put( (int)stats->iterations );
+            put( (int)stats->samples );
+            put( stats->min );
+            put( stats->median );
+            put( stats->stddev );
+        }
+        end();
+    }
+
+    void EventWriter::leaveSuite( const SuiteDescription & )
+    {
+        begin( EventLeaveSuite );
+        put( tracker().suiteWallTime() );
+        put( tracker().suiteCpuTime() );
+        end();
+    }
+
+    void EventWriter::worldAborted()
+    {
+        begin( EventAbort );
+        end();
+    }
+
+    void EventWriter::suiteDone()
+    {
+        begin( EventSuiteDone );
+        end();
+        _suite = 0;
+        _test = 0;
+    }
+
+    //
+    // EventReader
+    //
+    class EventFields
+    {
+    public:
+        EventFields( const char *data, unsigned size ) : _p( data ), _end( data + size ) {}
+
+        int getInt()
+        {
+            int value = 0;
+            if ( _p + sizeof(value) <= _end ) {
+                memcpy( &value, _p, sizeof(value) );
+                _p += sizeof(value);
+            }
+            return value;
+        }
+
+        double getDouble()
+        {
+            double value = 0;
+            if ( _p + sizeof(value) <= _end ) {
+                memcpy( &value, _p, sizeof(value) );
+                _p += sizeof(value);
+            }
+            return value;
+        }
+
+        const char *getString()
+        {
+            return (const char *)getData();
+        }
+
+        const void *getData( unsigned *dataSize = 0 )
+        {
+            unsigned size = 0;
+            if ( _p + sizeof(size) <= _end ) {
+                memcpy( &size, _p, sizeof(size) );
+                _p += sizeof(size);
+            }
+            if ( size == 0 || _p + size > _end )
+                return 0;
+            const char *data = _p;
+            _p += size;
+            if ( dataSize )
+                *dataSize = size;
+            return data;
+        }
+
+    private:
+        const char *_p, *_end;
+    };
+
+    EventReader::EventReader() :
+        _inSuite( false ), _aborted( false ), _tests( 0 ), _test( 0 ),
+        _suiteWallTime( 0 ), _suiteCpuTime( 0 )
+    {
+    }
+
+    EventReader::~EventReader() { delete [] _tests; }
+
+    void EventReader::replay( const SuiteDescription &sd, const char *data, unsigned size )
+    {
+        unsigned n;
+        while ( !_aborted && (n = recordSize( data, size )) != 0 ) {
+            replayRecord( sd, (unsigned char)data[0], data + EVENT_HEADER_SIZE, n - EVENT_HEADER_SIZE );
+            data += n;
+            size -= n;
+        }
+    }
+
+    void EventReader::replayRecord( const SuiteDescription &sd, unsigned char kind, const char *data, unsigned size )
+    {
+        EventFields f( data, size );
+
+        if ( kind == EventEnterSuite ) {
+            // The tests of a suite may come from several processes
+            if ( _inSuite )
+                return;
+            unsigned numTests = sd.numTests(), i = 0;
+            delete [] _tests;
+            _tests = new const TestDescription *[numTests ? numTests : 1];
+            for ( const TestDescription *td = sd.firstTest(); td && i < numTests; td = td->next() )
+                _tests[i++] = td;
+            while ( i < numTests )
+                _tests[i++] = 0;
+            _inSuite = true;
+            _suiteWallTime = _suiteCpuTime = 0;
+            tracker().enterSuite( sd );
+            return;
+        }
+        if ( kind == EventEnterTest ) {
+            unsigned i = (unsigned)f.getInt();
+            if ( i < sd.numTests() && _tests[i] ) {
+                _test = _tests[i];
+                tracker().enterTest( *_test );
+            }
+            return;
+        }
+        if ( kind == EventLeaveTest ) {
+            double wall = f.getDouble(), cpu = f.getDouble();
+            BenchmarkStats stats;
+            stats.iterations = (unsigned)f.getInt();
+            stats.samples = (unsigned)f.getInt();
+            stats.min = f.getDouble();
+            stats.median = f.getDouble();
+            stats.stddev = f.getDouble();
+            if ( _test ) {
+                tracker().setTestTime( wall, cpu );
+                if ( stats.samples )
+                    tracker().setTestBenchmark( stats );
+                tracker().leaveTest( *_test );
+            }
+            _test = 0;
+            return;
+        }
+        if ( kind == EventLeaveSuite ) {
+            // The suite is left in finish()
+            _suiteWallTime += f.getDouble();
+            _suiteCpuTime += f.getDouble();
+            return;
+        }
+        if ( kind == EventCrash ) {
+            crashed( sd, f.getString() );
+            return;
+        }
+        if ( kind == EventAbort ) {
+            _aborted = true;
+            return;
+        }
+        if ( kind == EventOutput ) {
+            int fd = (f.getInt() == 2) ? 2 : 1;
+            unsigned textSize = 0;
+            const char *text = (const char *)f.getData( &textSize );
+            if ( text ) {
+                // After what the listener has written so far
+                fflush( fd == 2 ? stderr : stdout );
+                writeAll( fd, text, textSize );
+            }
+            return;
+        }
+
+        const char *file = f.getString();
+        int line = f.getInt();
+        switch ( kind ) {
+        case EventTrace:
+            tracker().trace( file, line, f.getString() );
+            break;
+        case EventWarning:
+            tracker().warning( file, line, f.getString() );
+            break;
+        case EventFailedTest:
+            tracker().failedTest( file, line, f.getString() );
+            break;
+        case EventFailedAssert:
+            tracker().failedAssert( file, line, f.getString() );
+            break;
+        case EventFailedAssertEquals: {
+            const char *xStr = f.getString(), *yStr = f.getString();
+            const char *x = f.getString(), *y = f.getString();
+            tracker().failedAssertEquals( file, line, xStr, yStr, x, y );
+            break;
+        }
+        case EventFailedAssertSameData: {
+            const char *xStr = f.getString(), *yStr = f.getString(), *sizeStr = f.getString();
+            unsigned dataSize = (unsigned)f.getInt();
+            const void *x = f.getData(), *y = f.getData();
+            tracker().failedAssertSameData( file, line, xStr, yStr, sizeStr, x, y, dataSize );
+            break;
+        }
+        case EventFailedAssertDelta: {
+            const char *xStr = f.getString(), *yStr = f.getString(), *dStr = f.getString();
+            const char *x = f.getString(), *y = f.getString(), *d = f.getString();
+            tracker().failedAssertDelta( file, line, xStr, yStr, dStr, x, y, d );
+            break;
+        }
+        case EventFailedAssertDiffers: {
+            const char *xStr = f.getString(), *yStr = f.getString();
+            const char *value = f.getString();
+            tracker().failedAssertDiffers( file, line, xStr, yStr, value );
+            break;
+        }
+        case EventFailedAssertLessThan: {
+            const char *xStr = f.getString(), *yStr = f.getString();
+            const char *x = f.getString(), *y = f.getString();
+            tracker().failedAssertLessThan( file, line, xStr, yStr, x, y );
+            break;
+        }
+        case EventFailedAssertLessThanEquals: {
+            const char *xStr = f.getString(), *yStr = f.getString();
+            const char *x = f.getString(), *y = f.getString();
+            tracker().failedAssertLessThanEquals( file, line, xStr, yStr, x, y );
+            break;
+        }
+        case EventFailedAssertPredicate: {
+            const char *predicate = f.getString(), *xStr = f.getString();
+            const char *x = f.getString();
+            tracker().failedAssertPredicate( file, line, predicate, xStr, x );
+            break;
+        }
+        case EventFailedAssertRelation: {
+            const char *relation = f.getString(), *xStr = f.getString(), *yStr = f.getString();
+            const char *x = f.getString(), *y = f.getString();
+            tracker().failedAssertRelation( file, line, relation, xStr, yStr, x, y );
+            break;
+        }
+        case EventFailedAssertThrows: {
+            const char *expression = f.getString(), *type = f.getString();
+            bool otherThrown = (f.getInt() != 0);
+            tracker().failedAssertThrows( file, line, expression, type, otherThrown );
+            break;
+        }
+        case EventFailedAssertThrowsNot:
+            tracker().failedAssertThrowsNot( file, line, f.getString() );
+            break;
+        case EventFailedAssertSameFiles: {
+            const char *file1 = f.getString(), *file2 = f.getString();
+            const char *explanation = f.getString();
+            tracker().failedAssertSameFiles( file, line, file1, file2, explanation );
+            break;
+        }
+        default:
+            break;
+        }
+    }
+
+    void EventReader::finish( const SuiteDescription &sd )
+    {
+        if ( _test )
+            tracker().leaveTest( *_test );
+        _test = 0;
+        if ( _inSuite ) {
+            tracker().setSuiteTime( _suiteWallTime, _suiteCpuTime );
+            tracker().leaveSuite( sd );
+        }
+        _inSuite = false;
+    }
+
+    void EventReader::crashed( const SuiteDescription &sd, const char *message )
+    {
+        if ( !_inSuite ) {
+            tracker().enterSuite( sd );
+            _inSuite = true;
+            _suiteWallTime = _suiteCpuTime = 0;
+        }
+        if ( _test ) {
+            tracker().failedTest( _test->file(), _test->line(), message );
+            tracker().leaveTest( *_test );
+            _test = 0;
+        }
+        else
+            tracker().failedTest( sd.file(), sd.line(), message );
+    }
+
+    //
+    // ParallelRunner
+    //
+    ParallelRunner::ParallelRunner( SuiteRunner &runner, unsigned jobs, unsigned mode ) :
+        _runner( runner ),
+        _jobs( jobs ? jobs : 1 ),
+        _isolation( mode ),
+        _numUnits( 0 ),
+        _nextUnit( 0 ),
+        _replayed( 0 ),
+        _testLimit( testTimeLimit() ),
+        _suiteLimit( suiteTimeLimit() ),
+        _workers( 0 ),
+        _suites( 0 ),
+        _tests( 0 ),
+        _order( 0 ),
+        _events( 0 ),
+        _done( 0 ),
+        _started( 0 )
+    {
+    }
+
+    ParallelRunner::~ParallelRunner()
+    {
+        delete [] _workers;
+        delete [] _suites;
+        delete [] _tests;
+        delete [] _order;
+        delete [] _events;
+        delete [] _done;
+        delete [] _started;
+    }
+
+    bool ParallelRunner::runSuites( WorldDescription &wd )
+    {
+        // A unit of work is a suite, or a test when each test runs in
+        // a process of its own
+        bool byTest = (_isolation == ISOLATE_TESTS);
+        for ( SuiteDescription *sd = wd.firstSuite(); sd; sd = sd->next() )
+            if ( sd->active() )
+                _numUnits += (byTest && sd->numTests()) ? sd->numTests() : 1;
+        if ( _numUnits == 0 )
+            return true;
+
+        _suites = new SuiteDescription *[_numUnits];
+        _tests = new const TestDescription *[_numUnits];
+        _events = new EventBuffer[_numUnits];
+        _done = new bool[_numUnits];
+        _started = new double[_numUnits];
+        unsigned i = 0;
+        for ( SuiteDescription *sd = wd.firstSuite(); sd && i < _numUnits; sd = sd->next() ) {
+            if ( !sd->active() )
+                continue;
+            if ( byTest && sd->numTests() ) {
+                for ( const TestDescription *td = sd->firstTest(); td && i < _numUnits; td = td->next() )
+                    if ( td->active() ) {
+                        _done[i] = false;
+                        _suites[i] = sd;
+                        _tests[i++] = td;
+                    }
+            }
+            else {
+                _done[i] = false;
+                _suites[i] = sd;
+                _tests[i++] = 0;
+            }
+        }
+        _numUnits = i;
+
+        // With timings, the longest units are started first, so that
+        // no worker is left with a long suite at the end of the run
+        _order = new unsigned[_numUnits];
+        double *times = new double[_numUnits];
+        for ( i = 0; i < _numUnits; ++ i )
+            times[i] = !testTimings() ? 0 :
+                _tests[i] ? testTimings()->estimate( *_tests[i] ) : estimatedTime( *_suites[i] );
+        longestFirst( _order, times, _numUnits );
+        delete [] times;
+
+        if ( _jobs > _numUnits )
+            _jobs = _numUnits;
+        _workers = new Worker[_jobs];
+        for ( i = 0; i < _jobs; ++ i ) {
+            Worker &w = _workers[i];
+            w.pid = w.command = w.events = w.unit = w.test = w.resumeUnit = w.resumeTest = -1;
+            w.testStart = 0;
+        }
+
+        // A worker that dies must not take the runner with it
+        void (*oldPipeHandler)(int) = signal( SIGPIPE, SIG_IGN );
+
+        for ( i = 0; i < _jobs; ++ i ) {
+            startWorker( _workers[i] );
+            dispatch( _workers[i] );
+        }
+
+        struct pollfd *fds = new struct pollfd[_jobs];
+        Worker **ready = new Worker *[_jobs];
+        while ( true ) {
+            unsigned n = 0;
+            for ( i = 0; i < _jobs; ++ i )
+                if ( _workers[i].events >= 0 ) {
+                    fds[n].fd = _workers[i].events;
+                    fds[n].events = POLLIN;
+                    fds[n].revents = 0;
+                    ready[n++] = &_workers[i];
+                }
+            if ( n == 0 )
+                break;
+            if ( poll( fds, n, timeLeft() ) < 0 ) {
+                if ( errno == EINTR )
+                    continue;
+                break;
+            }
+            for ( i = 0; i < n; ++ i )
+                if ( fds[i].revents )
+                    receive( *ready[i] );
+            checkTimeLimits();
+            replay();
+            if ( _reader.aborted() )
+                stopWorkers();
+        }
+        delete [] fds;
+        delete [] ready;
+
+        // No worker could be started for the remaining suites
+        while ( !_reader.aborted() && _nextUnit < _numUnits ) {
+            unsigned unit = _order[_nextUnit++];
+            appendCrash( _events[unit], "Cannot start worker process" );
+            _done[unit] = true;
+        }
+
+        signal( SIGPIPE, oldPipeHandler );
+        replay();
+        return !_reader.aborted();
+    }
+
+    void ParallelRunner::startWorker( Worker &w )
+    {
+        int command[2], events[2];
+        if ( pipe( command ) != 0 )
+            return;
+        if ( pipe( events ) != 0 ) {
+            close( command[0] );
+            close( command[1] );
+            return;
+        }
+
+        // Anything still buffered would be written by the worker as well
+        fflush( 0 );
+        int pid = fork();
+        if ( pid == 0 ) {
+            close( command[1] );
+            close( events[0] );
+            for ( unsigned i = 0; i < _jobs; ++ i ) {
+                if ( _workers[i].command >= 0 )
+                    close( _workers[i].command );
+                if ( _workers[i].events >= 0 )
+                    close( _workers[i].events );
+            }
+            runWorker( command[0], events[1] );
+        }
+
+        close( command[0] );
+        close( events[1] );
+        if ( pid < 0 ) {
+            close( command[1] );
+            close( events[0] );
+            return;
+        }
+        w.pid = pid;
+        w.command = command[1];
+        w.events = events[0];
+    }
+
+    void ParallelRunner::runWorker( int command, int events )
+    {
+        {
+            EventWriter writer( events );
+            unsigned job[2];
+            while ( readAll( command, job, sizeof(job) ) && job[0] < _numUnits ) {
+                // The unit and the index of the test to start from
+                unsigned unit = job[0];
+                TestDescription *first = job[1] ? _suites[unit]->firstTest() : 0;
+                for ( unsigned i = 0; first && i < job[1]; ++ i )
+                    first = first->next();
+                if ( job[1] && !first )
+                    break;
+                if ( !_runner.runSuite( *_suites[unit], _tests[unit], first, writer ) ) {
+                    writer.worldAborted();
+                    break;
+                }
+                writer.suiteDone();
+                // An isolated unit gets a fresh process
+                if ( _isolation != ISOLATE_NONE )
+                    break;
+            }
+        }
+        fflush( 0 );
+        _exit( 0 );
+    }
+
+    void ParallelRunner::dispatch( Worker &w )
+    {
+        int resumeUnit = w.resumeUnit;
+        unsigned resumeTest = (unsigned)w.resumeTest;
+        w.unit = w.test = w.resumeUnit = w.resumeTest = -1;
+        w.testStart = 0;
+        if ( w.command < 0 ) {
+            // No worker could be started to go on with the suite
+            if ( resumeUnit >= 0 )
+                _done[resumeUnit] = true;
+            return;
+        }
+        if ( resumeUnit >= 0 ) {
+            if ( send( w, (unsigned)resumeUnit, resumeTest ) )
+                return;
+        }
+        else if ( _nextUnit < _numUnits ) {
+            unsigned unit = _order[_nextUnit++];
+            _started[unit] = wallClock();
+            if ( send( w, unit, 0 ) )
+                return;
+        }
+        close( w.command );
+        w.command = -1;
+    }
+
+    bool ParallelRunner::send( Worker &w, unsigned unit, unsigned first )
+    {
+        unsigned job[2] = { unit, first };
+        w.unit = (int)unit;
+        return writeAll( w.command, job, sizeof(job) );
+    }
+
+    void ParallelRunner::receive( Worker &w )
+    {
+        char data[4096];
+        ssize_t n = read( w.events, data, sizeof(data) );
+        if ( n < 0 && errno == EINTR )
+            return;
+        if ( n <= 0 ) {
+            workerExited( w );
+            return;
+        }
+
+        w.input.append( data, (unsigned)n );
+        unsigned size, used = 0;
+        while ( (size = recordSize( w.input.data() + used, w.input.size() - used )) != 0 ) {
+            const char *record = w.input.data() + used;
+            used += size;
+            received( w, record, size );
+        }
+        w.input.consume( used );
+    }
+
+    void ParallelRunner::received( Worker &w, const char *record, unsigned size )
+    {
+        if ( w.unit < 0 )
+            return;
+        if ( record[0] == EventSuiteDone ) {
+            _done[w.unit] = true;
+            if ( _isolation != ISOLATE_NONE ) {
+                // The worker exits, and a new one takes the next unit
+                w.unit = -1;
+                close( w.command );
+                w.command = -1;
+            }
+            else
+                dispatch( w );
+        }
+        else {
+            track( w, record, size );
+            _events[w.unit].append( record, size );
+        }
+    }
+
+    //
+    // Follow the test that a worker is running, for the time limits
+    //
+    void ParallelRunner::track( Worker &w, const char *record, unsigned size )
+    {
+        if ( record[0] == EventEnterTest ) {
+            EventFields f( record + EVENT_HEADER_SIZE, size - EVENT_HEADER_SIZE );
+            w.test = f.getInt();
+            w.testStart = wallClock();
+        }
+        else if ( record[0] == EventLeaveTest )
+            w.testStart = 0;
+    }
+
+    void ParallelRunner::workerExited( Worker &w )
+    {
+        int status = 0;
+        close( w.events );
+        w.events = -1;
+        if ( w.command >= 0 ) {
+            close( w.command );
+            w.command = -1;
+        }
+        while ( waitpid( w.pid, &status, 0 ) < 0 && errno == EINTR )
+            ;
+        w.pid = -1;
+        w.input.clear();
+
+        if ( w.unit >= 0 ) {
+            // The worker died in the middle of a suite
+            char message[128];
+            if ( WIFSIGNALED( status ) )
+                snprintf( message, sizeof(message), "Worker process killed by signal %d (%s)",
+                          WTERMSIG( status ), strsignal( WTERMSIG( status ) ) );
+            else
+                snprintf( message, sizeof(message), "Worker process exited with status %d",
+                          WIFEXITED( status ) ? WEXITSTATUS( status ) : status );
+            appendCrash( _events[w.unit], message );
+            _done[w.unit] = true;
+            w.unit = -1;
+        }
+
+        if ( (_nextUnit < _numUnits || w.resumeUnit >= 0) && !_reader.aborted() ) {
+            startWorker( w );
+            dispatch( w );
+        }
+    }
+
+    //
+    // The milliseconds until the first time limit of a running worker
+    // is reached, or -1 without limits
+    //
+    int ParallelRunner::timeLeft() const
+    {
+        if ( !_testLimit && !_suiteLimit )
+            return -1;
+        bool limited = false;
+        double now = wallClock(), left = 0;
+        for ( unsigned i = 0; i < _jobs; ++ i ) {
+            const Worker &w = _workers[i];
+            if ( w.pid < 0 || w.unit < 0 )
+                continue;
+            if ( _suiteLimit ) {
+                double l = _started[w.unit] + _suiteLimit - now;
+                if ( !limited || l < left )
+                    left = l;
+                limited = true;
+            }
+            if ( _testLimit && w.testStart > 0 ) {
+                double l = w.testStart + _testLimit - now;
+                if ( !limited || l < left )
+                    left = l;
+                limited = true;
+            }
+        }
+        if ( !limited )
+            return -1;
+        return (left > 0) ? (int)(left * 1000) + 1 : 0;
+    }
+
+    void ParallelRunner::checkTimeLimits()
+    {
+        if ( !_testLimit && !_suiteLimit )
+            return;
+        double now = wallClock();
+        for ( unsigned i = 0; i < _jobs; ++ i ) {
+            Worker &w = _workers[i];
+            if ( w.pid < 0 || w.unit < 0 )
+                continue;
+            double testDeadline = (_testLimit && w.testStart > 0) ? w.testStart + _testLimit : 0;
+            double suiteDeadline = _suiteLimit ? _started[w.unit] + _suiteLimit : 0;
+            char message[128];
+            if ( testDeadline && now >= testDeadline && (!suiteDeadline || testDeadline <= suiteDeadline) ) {
+                snprintf( message, sizeof(message), "Test timed out after %.3fs", now - w.testStart );
+                timedOut( w, message, true );
+            }
+            else if ( suiteDeadline && now >= suiteDeadline ) {
+                if ( w.testStart > 0 )
+                    snprintf( message, sizeof(message), "Suite timed out, test stopped after %.3fs", now - w.testStart );
+                else
+                    snprintf( message, sizeof(message), "Suite timed out after %.3fs", now - _started[w.unit] );
+                timedOut( w, message, false );
+            }
+        }
+    }
+
+    //
+    // Kill a worker that ran out of time and fail the test it was
+    // running.  After a test timeout, the tests that follow it in the
+    // suite run in a new worker; after a suite timeout, they are
+    // skipped, as when the setUp() of the suite fails.
+    //
+    void ParallelRunner::timedOut( Worker &w, const char *message, bool resume )
+    {
+        kill( w.pid, SIGKILL );
+
+        // What the worker sent before it was killed comes first
+        char data[4096];
+        ssize_t n;
+        while ( (n = read( w.events, data, sizeof(data) )) != 0 ) {
+            if ( n > 0 )
+                w.input.append( data, (unsigned)n );
+            else if ( errno != EINTR )
+                break;
+        }
+        unsigned unit = (unsigned)w.unit, size, used = 0;
+        bool done = false;
+        while ( (size = recordSize( w.input.data() + used, w.input.size() - used )) != 0 ) {
+            const char *record = w.input.data() + used;
+            used += size;
+            if ( record[0] == EventSuiteDone )
+                done = true;
+            else {
+                track( w, record, size );
+                _events[unit].append( record, size );
+            }
+        }
+
+        // The worker may have finished the unit just in time
+        if ( !done ) {
+            appendCrash( _events[unit], message );
+            if ( resume && !_tests[unit] && w.testStart > 0 &&
+                 (unsigned)(w.test + 1) < _suites[unit]->numTests() ) {
+                w.resumeUnit = (int)unit;
+                w.resumeTest = w.test + 1;
+            }
+        }
+        if ( w.resumeUnit < 0 )
+            _done[unit] = true;
+        w.unit = -1;
+        workerExited( w );
+    }
+
+    void ParallelRunner::stopWorkers()
+    {
+        // An exception left the world, so the remaining suites are
+        // not run, just like in a serial run
+        _nextUnit = _numUnits;
+        for ( unsigned i = 0; i < _jobs; ++ i ) {
+            Worker &w = _workers[i];
+            if ( w.pid < 0 )
+                continue;
+            kill( w.pid, SIGKILL );
+            w.unit = w.resumeUnit = -1;
+            workerExited( w );
+        }
+    }
+
+    void ParallelRunner::replay()
+    {
+        while ( _replayed < _numUnits ) {
+            EventBuffer &events = _events[_replayed];
+            const SuiteDescription &sd = *_suites[_replayed];
+            _reader.replay( sd, events.data(), events.size() );
+            events.consume( events.size() );
+            if ( !_done[_replayed] || _reader.aborted() )
+                break;
+            events.clear();
+            ++ _replayed;
+            // The units of the tests of a suite are replayed as one suite
+            if ( _replayed == _numUnits || _suites[_replayed] != &sd )
+                _reader.finish( sd );
+        }
+    }
+#endif // _CXXTEST_HAVE_FORK
+}
+
+#endif // __cxxtest__ParallelRunner_cpp__
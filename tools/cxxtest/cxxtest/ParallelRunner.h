@@ -0,0 +1,223 @@
+/*
+-------------------------------------------------------------------------
+ CxxTest: A lightweight C++ unit testing library.
+ Copyright (c) 2008 Sandia Corporation.
+ This software is distributed under the LGPL License v2.1
+ For more information, see the COPYING file in the top CxxTest directory.
+ Under the terms of Contract DE-AC04-94AL85000 with Sandia Corporation,
+ the U.S. Government retains certain rights in this software.
+-------------------------------------------------------------------------
+*/
+
+#ifndef __cxxtest__ParallelRunner_h__
+#define __cxxtest__ParallelRunner_h__
+
+//
+// ParallelRunner runs the test suites in a pool of worker processes.
+// Each worker sends the notifications of the suites it runs down a
+// pipe, and the parent passes them on to the tracker one suite at a
+// time, in the order of the suites, so the listener sees the same
+// sequence of notifications as in a serial run.  With isolation, each
+// suite or each test runs in a process of its own, so a crash fails
+// only that suite or test.  The parent also enforces the time limits
+// of the tests and suites: it kills a worker that runs out of time,
+// fails the test it was running, and goes on with the next test in a
+// new worker.
+//
+
+#include <cxxtest/Flags.h>
+#include <cxxtest/TestListener.h>
+
+namespace CxxTest
+{
+    unsigned parallelJobs();
+    void setParallelJobs( unsigned value );
+
+    enum { ISOLATE_NONE = 0, ISOLATE_SUITES = 1, ISOLATE_TESTS = 2 };
+
+    unsigned isolation();
+    void setIsolation( unsigned value );
+
+    // Time limits in seconds, zero for no limit
+    unsigned testTimeLimit();
+    void setTestTimeLimit( unsigned seconds );
+    unsigned suiteTimeLimit();
+    void setSuiteTimeLimit( unsigned seconds );
+
+#if defined(_CXXTEST_HAVE_FORK)
+    class EventBuffer
+    {
+    public:
+        EventBuffer();
+        ~EventBuffer();
+
+        const char *data() const { return _data; }
+        unsigned size() const { return _size; }
+
+        void append( const void *bytes, unsigned count );
+        void consume( unsigned count );
+        void clear();
+
+    private:
+        EventBuffer( const EventBuffer & );
+        EventBuffer &operator=( const EventBuffer & );
+
+        char *_data;
+        unsigned _size, _capacity;
+    };
+
+    class EventWriter : public TestListener
+    {
+    public:
+        EventWriter( int fd );
+        ~EventWriter();
+
+        void enterSuite( const SuiteDescription &sd );
+        void enterTest( const TestDescription &td );
+        void trace( const char *file, int line, const char *expression );
+        void warning( const char *file, int line, const char *expression );
+        void failedTest( const char *file, int line, const char *expression );
+        void failedAssert( const char *file, int line, const char *expression );
+        void failedAssertEquals( const char *file, int line,
+                                 const char *xStr, const char *yStr,
+                                 const char *x, const char *y );
+        void failedAssertSameData( const char *file, int line,
+                                   const char *xStr, const char *yStr,
+                                   const char *sizeStr, const void *x,
+                                   const void *y, unsigned size );
+        void failedAssertDelta( const char *file, int line,
+                                const char *xStr, const char *yStr, const char *dStr,
+                                const char *x, const char *y, const char *d );
+        void failedAssertDiffers( const char *file, int line,
+                                  const char *xStr, const char *yStr,
+                                  const char *value );
+        void failedAssertLessThan( const char *file, int line,
+                                   const char *xStr, const char *yStr,
+                                   const char *x, const char *y );
+        void failedAssertLessThanEquals( const char *file, int line,
+                                         const char *xStr, const char *yStr,
+                                         const char *x, const char *y );
+        void failedAssertPredicate( const char *file, int line,
+                                    const char *predicate, const char *xStr, const char *x );
+        void failedAssertRelation( const char *file, int line,
+                                   const char *relation, const char *xStr, const char *yStr,
+                                   const char *x, const char *y );
+        void failedAssertThrows( const char *file, int line,
+                                 const char *expression, const char *type,
+                                 bool otherThrown );
+        void failedAssertThrowsNot( const char *file, int line, const char *expression );
+        void failedAssertSameFiles( const char *file, int line,
+                                    const char *file1, const char *file2,
+                                    const char *explanation );
+        void leaveTest( const TestDescription &td );
+        void leaveSuite( const SuiteDescription &sd );
+
+        void suiteDone();
+        void worldAborted();
+
+    private:
+        EventWriter( const EventWriter & );
+        EventWriter &operator=( const EventWriter & );
+
+        void begin( unsigned char kind );
+        void start( unsigned char kind );
+        void put( int value );
+        void put( double value );
+        void put( const char *s );
+        void put( const void *data, unsigned size );
+        void end();
+        void failure( unsigned char kind, const char *file, int line );
+        void sendOutput();
+
+        int _fd;
+        EventBuffer _record;
+        const SuiteDescription *_suite;
+        const TestDescription *_test;
+        unsigned _testIndex;
+        int _capture[2], _saved[2];
+    };
+
+    class EventReader
+    {
+    public:
+        EventReader();
+        ~EventReader();
+
+        void replay( const SuiteDescription &sd, const char *data, unsigned size );
+        void finish( const SuiteDescription &sd );
+        bool aborted() const { return _aborted; }
+
+    private:
+        EventReader( const EventReader & );
+        EventReader &operator=( const EventReader & );
+
+        void replayRecord( const SuiteDescription &sd, unsigned char kind, const char *data, unsigned size );
+        void crashed( const SuiteDescription &sd, const char *message );
+
+        bool _inSuite, _aborted;
+        const TestDescription **_tests;
+        const TestDescription *_test;
+        double _suiteWallTime, _suiteCpuTime;
+    };
+
+    class SuiteRunner
+    {
+    public:
+        virtual ~SuiteRunner() {}
+        // Run the tests of a suite from the test first on, or only
+        // test if it is not null
+        virtual bool runSuite( SuiteDescription &sd, const TestDescription *test,
+                               TestDescription *first, TestListener &listener ) = 0;
+    };
+
+    class ParallelRunner
+    {
+    public:
+        ParallelRunner( SuiteRunner &runner, unsigned jobs, unsigned mode = ISOLATE_NONE );
+        ~ParallelRunner();
+
+        bool runSuites( WorldDescription &wd );
+
+    private:
+        ParallelRunner( const ParallelRunner & );
+        ParallelRunner &operator=( const ParallelRunner & );
+
+        // A worker goes on with the suite of resumeUnit, from the test
+        // resumeTest on, after the worker before it ran out of time
+        struct Worker
+        {
+            int pid, command, events, unit, test, resumeUnit, resumeTest;
+            double testStart;
+            EventBuffer input;
+        };
+
+        void startWorker( Worker &w );
+        void runWorker( int command, int events );
+        void dispatch( Worker &w );
+        bool send( Worker &w, unsigned unit, unsigned first );
+        void receive( Worker &w );
+        void received( Worker &w, const char *record, unsigned size );
+        void track( Worker &w, const char *record, unsigned size );
+        void workerExited( Worker &w );
+        int timeLeft() const;
+        void checkTimeLimits();
+        void timedOut( Worker &w, const char *message, bool resume );
+        void replay();
+        void stopWorkers();
+
+        SuiteRunner &_runner;
+        unsigned _jobs, _isolation, _numUnits, _nextUnit, _replayed;
+        unsigned _testLimit, _suiteLimit;
+        Worker *_workers;
+        SuiteDescription **_suites;
+        const TestDescription **_tests;
+        unsigned *_order;
+        EventBuffer *_events;
+        bool *_done;
+        double *_started;
+        EventReader _reader;
+    };
+#endif // _CXXTEST_HAVE_FORK
+}
+
+#endif // __cxxtest__ParallelRunner_h__
@@ -18,6 +18,8 @@
 //
 
 #include <cxxtest/RealDescriptions.h>
+#include <cxxtest/Timings.h>
+#include <cxxtest/LastRun.h>
 
 namespace CxxTest 
 {
@@ -272,6 +274,121 @@ namespace CxxTest
         return false;
     }
         
+    static unsigned long testNameHash( const TestDescription &td )
+    {
+        // FNV-1a hash of "suite::test", so that a test keeps its shard
+        // when other tests are added or removed
+        const char *parts[3] = { td.suiteName(), "::", td.testName() };
+        unsigned long h = 2166136261UL;
+        for ( unsigned i = 0; i < 3; ++ i )
+            for ( const char *p = parts[i]; *p; ++ p )
+                h = ((h ^ (unsigned char)*p) * 16777619UL) & 0xFFFFFFFFUL;
+        return h;
+    }
+
+    bool RealWorldDescription::leaveShard( unsigned index, unsigned count, bool byHash )
+    {
+        if ( count == 0 || index >= count )
+            return false;
+
+        if ( !byHash && testTimings() ) {
+            leaveShardByTime( index, count );
+            return true;
+        }
+
+        // Without byHash, shard i gets the i-th of count blocks of
+        // consecutive tests, so the shards differ by at most one test
+        unsigned long total = numTotalTests(), position = 0;
+        SuiteDescription *sd = firstSuite();
+        while ( sd != 0 ) {
+            SuiteDescription *nextSuite = sd->next();
+            bool inShard = false;
+            TestDescription *td = sd->firstTest();
+            while ( td != 0 ) {
+                TestDescription *nextTest = td->next();
+                unsigned long shard = byHash ? testNameHash( *td ) % count : (position * count) / total;
+                ++ position;
+                if ( shard == index )
+                    inShard = true;
+                else
+                    td->setActive( false );
+                td = nextTest;
+            }
+            if ( !inShard )
+                sd->setActive( false );
+            sd = nextSuite;
+        }
+        return true;
+    }
+
+    void RealWorldDescription::leaveShardByTime( unsigned index, unsigned count )
+    {
+        // Longest processing time first: each suite, longest first,
+        // goes to the shard with the least work so far
+        unsigned n = numSuites(), i = 0;
+        SuiteDescription **suites = new SuiteDescription *[n];
+        double *times = new double[n];
+        unsigned *order = new unsigned[n];
+        double *load = new double[count];
+        for ( SuiteDescription *sd = firstSuite(); sd && i < n; sd = sd->next() ) {
+            suites[i] = sd;
+            times[i++] = sd->active() ? estimatedTime( *sd ) : 0;
+        }
+        n = i;
+        longestFirst( order, times, n );
+        for ( i = 0; i < count; ++ i )
+            load[i] = 0;
+        for ( i = 0; i < n; ++ i ) {
+            unsigned shard = 0;
+            for ( unsigned j = 1; j < count; ++ j )
+                if ( load[j] < load[shard] )
+                    shard = j;
+            load[shard] += times[order[i]];
+            if ( shard != index )
+                suites[order[i]]->setActive( false );
+        }
+        delete [] suites;
+        delete [] times;
+        delete [] order;
+        delete [] load;
+    }
+
+    //
+    // Sort the links of a list by rank, keeping the order of links with
+    // the same rank
+    //
+    template<class Description>
+    static void reorderList( List &list, const TestOrder &order )
+    {
+        unsigned n = 0, maxRank = 0, i;
+        for ( Link *l = list._head; l != 0; l = l->justNext() )
+            ++ n;
+        Link **links = new Link *[n];
+        unsigned *ranks = new unsigned[n];
+        i = 0;
+        for ( Link *l = list._head; l != 0; l = l->justNext() ) {
+            links[i] = l;
+            ranks[i] = order.rank( *(Description *)l );
+            if ( ranks[i] > maxRank )
+                maxRank = ranks[i];
+            ++ i;
+        }
+        list._head = list._tail = 0;
+        for ( unsigned rank = 0; rank <= maxRank; ++ rank )
+            for ( i = 0; i < n; ++ i )
+                if ( ranks[i] == rank )
+                    links[i]->attach( list );
+        delete [] links;
+        delete [] ranks;
+    }
+
+    void RealWorldDescription::reorder( const TestOrder &order )
+    {
+        for ( Link *l = suites()._head; l != 0; l = l->justNext() )
+            reorderList<RealTestDescription>( *((RealSuiteDescription *)l)->_tests, order );
+        reorderList<RealSuiteDescription>( suites(), order );
+    }
+        
     bool RealWorldDescription::setUp()
     {
         for ( GlobalFixture *gf = GlobalFixture::firstGlobalFixture(); gf != 0; gf = gf->nextGlobalFixture() ) {
@@ -324,6 +441,16 @@ namespace CxxTest
     {
         return RealWorldDescription().leaveOnly( suiteName, testName );
     }
+
+    bool leaveShard( unsigned index, unsigned count, bool byHash )
+    {
+        return RealWorldDescription().leaveShard( index, count, byHash );
+    }
+
+    void reorder( const TestOrder &order )
+    {
+        RealWorldDescription().reorder( order );
+    }
 }
 
 #endif // __cxxtest__RealDescriptions_cpp__
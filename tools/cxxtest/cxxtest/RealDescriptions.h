@@ -22,6 +22,8 @@
 
 namespace CxxTest 
 {
+    class TestOrder;
+
     class RealTestDescription : public TestDescription
     {
     public:
@@ -221,16 +223,23 @@ namespace CxxTest
         const SuiteDescription &suiteDescription( unsigned i ) const;
         void activateAllTests();
         bool leaveOnly( const char *suiteName, const char *testName = 0 );
+        bool leaveShard( unsigned index, unsigned count, bool byHash = false );
+        void reorder( const TestOrder &order );
         
         bool setUp();
         bool tearDown();
         static void reportError( const char *message );
 
         static const char *_worldName;
+
+    private:
+        void leaveShardByTime( unsigned index, unsigned count );
     };
 
     void activateAllTests();
     bool leaveOnly( const char *suiteName, const char *testName = 0 );
+    bool leaveShard( unsigned index, unsigned count, bool byHash = false );
+    void reorder( const TestOrder &order );
 }
 
 #endif // __cxxtest__RealDescriptions_h__
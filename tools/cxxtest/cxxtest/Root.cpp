@@ -17,13 +17,19 @@
 // the parts that must be in a source file file.
 //
 
+#include <cxxtest/Benchmark.cpp>
+#include <cxxtest/BenchmarkReport.cpp>
+#include <cxxtest/Clock.cpp>
 #include <cxxtest/Descriptions.cpp>
 #include <cxxtest/DummyDescriptions.cpp>
 #include <cxxtest/GlobalFixture.cpp>
 #include <cxxtest/LinkedList.cpp>
+#include <cxxtest/LastRun.cpp>
+#include <cxxtest/ParallelRunner.cpp>
 #include <cxxtest/RealDescriptions.cpp>
 #include <cxxtest/TestSuite.cpp>
 #include <cxxtest/TestTracker.cpp>
+#include <cxxtest/Timings.cpp>
 #include <cxxtest/ValueTraits.cpp>
 
 #endif // __cxxtest__Root_cpp__
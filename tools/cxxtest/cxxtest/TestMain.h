@@ -13,6 +13,7 @@
 #define __CxxTestMain_h
 
 #include <cxxtest/TestTracker.h>
+#include <cxxtest/ParallelRunner.h>
 #include <cxxtest/Flags.h>
 
 #ifndef _CXXTEST_HAVE_STD
@@ -20,13 +21,18 @@
 #endif // _CXXTEST_HAVE_STD
 
 #include <cxxtest/StdValueTraits.h>
+#include <cxxtest/Timings.h>
+#include <cxxtest/LastRun.h>
+#include <cxxtest/BenchmarkReport.h>
 
 #ifdef _CXXTEST_OLD_STD
 #   include <iostream.h>
 #   include <string.h>
+#   include <stdlib.h>
 #else // !_CXXTEST_OLD_STD
 #   include <iostream>
 #   include <cstring>
+#   include <cstdlib>
 #endif // _CXXTEST_OLD_STD
 
 namespace CxxTest
@@ -40,6 +46,73 @@ inline void print_help(const char* name)
    CXXTEST_STD(cerr) << name << " --help" << CXXTEST_STD(endl);
    CXXTEST_STD(cerr) << name << " --help-tests" << CXXTEST_STD(endl);
    CXXTEST_STD(cerr) << name << " -v             Enable tracing output." << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << name << " --slowest <n>  Report the <n> slowest tests." << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << name << " --jobs <n>     Run the test suites in <n> worker processes." << CXXTEST_STD(endl);
+#if defined(_CXXTEST_HAVE_FORK)
+   CXXTEST_STD(cerr) << name << " --isolate <m>  Run each suite (<m> = suites) or each test (<m> = tests)" << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << "                 in a process of its own, so a crash fails only that one." << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << name << " --test-timeout <s>" << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << "                 Fail a test that runs longer than <s> seconds." << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << name << " --suite-timeout <s>" << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << "                 Fail a suite that runs longer than <s> seconds." << CXXTEST_STD(endl);
+#endif // _CXXTEST_HAVE_FORK
+   CXXTEST_STD(cerr) << name << " --shard-index <i> --shard-count <n>" << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << "                 Run only the tests of shard <i> out of <n> shards." << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << name << " --shard-hash   Assign tests to shards by a hash of their names." << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << name << " --timings <f>  Balance shards and workers by the test times in <f>." << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << name << " --save-timings <f>" << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << "                 Save the test times of this run in <f>." << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << name << " --failed-first <f>" << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << "                 Run the tests that failed in <f> first, then the tests of" << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << "                 changed headers, and save the results of this run in <f>." << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << name << " --bench-samples <n>" << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << "                 Time <n> samples of each benchmark." << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << name << " --bench-results <f>" << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << "                 Save the benchmark results of this run in <f>, as JSON." << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << name << " --baseline <f> Fail the benchmarks that are slower than in the results" << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << "                 in <f> by more than the threshold and the noise." << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << name << " --bench-threshold <p>" << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << "                 Allow benchmarks to be <p> percent slower than the baseline." << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << name << " --save-baseline <f>" << CXXTEST_STD(endl);
+   CXXTEST_STD(cerr) << "                 Save the benchmark results of this run in <f>, as a baseline." << CXXTEST_STD(endl);
+}
+
+//
+// Take the number that follows an option off the command line
+//
+inline bool option_value(int& argc, char* argv[], int& value, int minimum)
+{
+   if (argc < 3)
+      return false;
+   char* end = 0;
+   long number = CXXTEST_STD(strtol)(argv[2], &end, 10);
+   if ((end == argv[2]) || (*end != '\0') || (number < minimum))
+      return false;
+   value = (int)number;
+   for (int i=2; i<(argc-1); i++)
+     argv[i] = argv[i+1];
+   argc--;
+   return true;
+}
+
+//
+// Take the file name that follows an option off the command line
+//
+inline bool option_value(int& argc, char* argv[], const char*& value)
+{
+   if (argc < 3)
+      return false;
+   value = argv[2];
+   for (int i=2; i<(argc-1); i++)
+     argv[i] = argv[i+1];
+   argc--;
+   return true;
+}
+
+inline int bad_option_value(const char* option)
+{
+   CXXTEST_STD(cerr) << "ERROR: bad value for option '" << option << "'" << CXXTEST_STD(endl);
+   return -1;
 }
 
 
@@ -73,10 +146,113 @@ for (int i=1; i<argc; i++) {
 //
 // Process command-line options here.
 //
+int shardIndex=-1, shardCount=0;
+bool shardHash=false;
+const char* timingsFile=0;
+const char* saveTimingsFile=0;
+const char* resultsFile=0;
+const char* benchmarksFile=0;
+const char* baselineFile=0;
+const char* saveBaselineFile=0;
 while ((argc > 1) && (argv[1][0] == '-')) {
   if (CXXTEST_STD(strcmp)(argv[1],"-v") == 0) {
      tracker().print_tracing = true;
      }
+  else if (CXXTEST_STD(strcmp)(argv[1],"--slowest") == 0) {
+     int slowest = 0;
+     if (!option_value(argc, argv, slowest, 0))
+        return bad_option_value(argv[1]);
+     tracker().print_slowest = (unsigned)slowest;
+     }
+  else if (CXXTEST_STD(strcmp)(argv[1],"--jobs") == 0) {
+     int jobs = 0;
+     if (!option_value(argc, argv, jobs, 1))
+        return bad_option_value(argv[1]);
+#if defined(_CXXTEST_HAVE_FORK)
+     setParallelJobs((unsigned)jobs);
+#else // !_CXXTEST_HAVE_FORK
+     //
+     // Build scripts pass --jobs to every runner, so a runner without
+     // worker processes runs the tests serially instead of failing
+     //
+     if (jobs > 1)
+        CXXTEST_STD(cerr) << "WARNING: option '--jobs' needs a runner generated with --have-fork; running the tests serially" << CXXTEST_STD(endl);
+#endif // _CXXTEST_HAVE_FORK
+     }
+#if defined(_CXXTEST_HAVE_FORK)
+  else if (CXXTEST_STD(strcmp)(argv[1],"--isolate") == 0) {
+     const char* mode = 0;
+     if (!option_value(argc, argv, mode))
+        return bad_option_value(argv[1]);
+     if (CXXTEST_STD(strcmp)(mode,"none") == 0)
+        setIsolation(ISOLATE_NONE);
+     else if (CXXTEST_STD(strcmp)(mode,"suites") == 0)
+        setIsolation(ISOLATE_SUITES);
+     else if (CXXTEST_STD(strcmp)(mode,"tests") == 0)
+        setIsolation(ISOLATE_TESTS);
+     else
+        return bad_option_value(argv[1]);
+     }
+  else if (CXXTEST_STD(strcmp)(argv[1],"--test-timeout") == 0) {
+     int seconds = 0;
+     if (!option_value(argc, argv, seconds, 0))
+        return bad_option_value(argv[1]);
+     setTestTimeLimit((unsigned)seconds);
+     }
+  else if (CXXTEST_STD(strcmp)(argv[1],"--suite-timeout") == 0) {
+     int seconds = 0;
+     if (!option_value(argc, argv, seconds, 0))
+        return bad_option_value(argv[1]);
+     setSuiteTimeLimit((unsigned)seconds);
+     }
+#endif // _CXXTEST_HAVE_FORK
+  else if (CXXTEST_STD(strcmp)(argv[1],"--shard-index") == 0) {
+     if (!option_value(argc, argv, shardIndex, 0))
+        return bad_option_value(argv[1]);
+     }
+  else if (CXXTEST_STD(strcmp)(argv[1],"--shard-count") == 0) {
+     if (!option_value(argc, argv, shardCount, 1))
+        return bad_option_value(argv[1]);
+     }
+  else if (CXXTEST_STD(strcmp)(argv[1],"--shard-hash") == 0) {
+     shardHash = true;
+     }
+  else if (CXXTEST_STD(strcmp)(argv[1],"--timings") == 0) {
+     if (!option_value(argc, argv, timingsFile))
+        return bad_option_value(argv[1]);
+     }
+  else if (CXXTEST_STD(strcmp)(argv[1],"--save-timings") == 0) {
+     if (!option_value(argc, argv, saveTimingsFile))
+        return bad_option_value(argv[1]);
+     }
+  else if (CXXTEST_STD(strcmp)(argv[1],"--failed-first") == 0) {
+     if (!option_value(argc, argv, resultsFile))
+        return bad_option_value(argv[1]);
+     }
+  else if (CXXTEST_STD(strcmp)(argv[1],"--bench-samples") == 0) {
+     int samples = 0;
+     if (!option_value(argc, argv, samples, 1))
+        return bad_option_value(argv[1]);
+     setBenchmarkSamples((unsigned)samples);
+     }
+  else if (CXXTEST_STD(strcmp)(argv[1],"--bench-results") == 0) {
+     if (!option_value(argc, argv, benchmarksFile))
+        return bad_option_value(argv[1]);
+     }
+  else if (CXXTEST_STD(strcmp)(argv[1],"--baseline") == 0) {
+     if (!option_value(argc, argv, baselineFile))
+        return bad_option_value(argv[1]);
+     }
+  else if (CXXTEST_STD(strcmp)(argv[1],"--bench-threshold") == 0) {
+     int percent = 0;
+     if (!option_value(argc, argv, percent, 0))
+        return bad_option_value(argv[1]);
+     setBenchmarkThreshold((unsigned)percent);
+     }
+  else if (CXXTEST_STD(strcmp)(argv[1],"--save-baseline") == 0) {
+     if (!option_value(argc, argv, saveBaselineFile))
+        return bad_option_value(argv[1]);
+     }
   else {
      CXXTEST_STD(cerr) << "ERROR: unknown option '" << argv[1] << "'" << CXXTEST_STD(endl);
      return -1;
@@ -105,8 +281,87 @@ if ((argc==3) && (argv[1][0] != '-')) {
        }
     }
 
+//
+// Times of previous runs, to balance shards and workers
+//
+TimingHistory history;
+history.add(defaultTimings());
+if (timingsFile && !history.load(timingsFile)) {
+   CXXTEST_STD(cerr) << "ERROR: cannot read timings file '" << timingsFile << "'" << CXXTEST_STD(endl);
+   return -1;
+   }
+if (timingsFile || saveTimingsFile || !history.empty())
+   setTestTimings(&history);
+
+if ((shardCount > 0) || (shardIndex >= 0) || shardHash) {
+    if ((shardCount == 0) || (shardIndex < 0)) {
+       CXXTEST_STD(cerr) << "ERROR: options '--shard-index' and '--shard-count' must be used together" << CXXTEST_STD(endl);
+       return -1;
+       }
+    //
+    // Every shard must be balanced by the same times, so a shard may
+    // not change the history that the others read
+    //
+    if (timingsFile && saveTimingsFile && (CXXTEST_STD(strcmp)(timingsFile,saveTimingsFile) == 0)) {
+       CXXTEST_STD(cerr) << "ERROR: a shard cannot save its times in the timings file '" << timingsFile << "' that balances the shards" << CXXTEST_STD(endl);
+       return -1;
+       }
+    if (!leaveShard((unsigned)shardIndex, (unsigned)shardCount, shardHash)) {
+       CXXTEST_STD(cerr) << "ERROR: shard index " << shardIndex << " is not less than the shard count " << shardCount << CXXTEST_STD(endl);
+       return -1;
+       }
+    }
+
+//
+// Results of the previous run, to run the tests that failed first
+//
+LastRun lastRun;
+if (resultsFile) {
+   if (!lastRun.load(resultsFile, RealWorldDescription())) {
+      CXXTEST_STD(cerr) << "ERROR: cannot read results file '" << resultsFile << "'" << CXXTEST_STD(endl);
+      return -1;
+      }
+   reorder(lastRun);
+   setTestResults(&lastRun);
+   }
+
+//
+// Benchmark results of this run, and the baseline to compare them with
+//
+BenchmarkReport benchmarks, baseline;
+if (benchmarksFile || saveBaselineFile)
+   setBenchmarkResults(&benchmarks);
+if (baselineFile) {
+   if (!baseline.load(baselineFile)) {
+      CXXTEST_STD(cerr) << "ERROR: cannot read baseline file '" << baselineFile << "'" << CXXTEST_STD(endl);
+      return -1;
+      }
+   setBenchmarkBaseline(&baseline);
+   }
+
 tmp.process_commandline(argc,argv);
-return tmp.run();
+int failures = tmp.run();
+setTestTimings(0);
+setTestResults(0);
+setBenchmarkResults(0);
+setBenchmarkBaseline(0);
+if (saveTimingsFile && !history.save(saveTimingsFile)) {
+   CXXTEST_STD(cerr) << "ERROR: cannot write timings file '" << saveTimingsFile << "'" << CXXTEST_STD(endl);
+   return -1;
+   }
+if (resultsFile && !lastRun.save(resultsFile)) {
+   CXXTEST_STD(cerr) << "ERROR: cannot write results file '" << resultsFile << "'" << CXXTEST_STD(endl);
+   return -1;
+   }
+if (benchmarksFile && !benchmarks.save(benchmarksFile)) {
+   CXXTEST_STD(cerr) << "ERROR: cannot write benchmark results file '" << benchmarksFile << "'" << CXXTEST_STD(endl);
+   return -1;
+   }
+if (saveBaselineFile && !benchmarks.save(saveBaselineFile)) {
+   CXXTEST_STD(cerr) << "ERROR: cannot write baseline file '" << saveBaselineFile << "'" << CXXTEST_STD(endl);
+   return -1;
+   }
+return failures;
 }
 
 }
@@ -22,6 +22,10 @@
 #include <cxxtest/RealDescriptions.h>
 #include <cxxtest/TestSuite.h>
 #include <cxxtest/TestTracker.h>
+#include <cxxtest/ParallelRunner.h>
+#include <cxxtest/Clock.h>
+#include <cxxtest/Benchmark.h>
+#include <stdio.h>
 
 namespace CxxTest 
 {
@@ -52,6 +56,14 @@ namespace CxxTest
             
             tracker().enterWorld( wd );
             if ( wd.setUp() ) {
+#if defined(_CXXTEST_HAVE_FORK)
+                // The time limits are enforced by the parent of the
+                // worker processes
+                if ( parallelJobs() > 1 || isolation() != ISOLATE_NONE ||
+                     testTimeLimit() || suiteTimeLimit() )
+                    runParallel( wd );
+                else
+#endif // _CXXTEST_HAVE_FORK
                 for ( SuiteDescription *sd = wd.firstSuite(); sd; sd = sd->next() )
                     if ( sd->active() )
                         runSuite( *sd );
@@ -61,18 +73,20 @@ namespace CxxTest
             tracker().leaveWorld( wd );
         }
     
-        void runSuite( SuiteDescription &sd )
+        void runSuite( SuiteDescription &sd, const TestDescription *only = 0, TestDescription *first = 0 )
         {
             StateGuard sg;
             
             tracker().enterSuite( sd );
+            double wall = wallClock(), cpu = cpuClock();
             if ( sd.setUp() ) {
-                for ( TestDescription *td = sd.firstTest(); td; td = td->next() )
-                    if ( td->active() )
+                for ( TestDescription *td = first ? first : sd.firstTest(); td; td = td->next() )
+                    if ( td->active() && (!only || td == only) )
                         runTest( *td );
 
                 sd.tearDown();
             }
+            tracker().setSuiteTime( wallClock() - wall, cpuClock() - cpu );
             tracker().leaveSuite( sd );
         }
 
@@ -81,13 +95,70 @@ namespace CxxTest
             StateGuard sg;
             
             tracker().enterTest( td );
+            double wall = wallClock(), cpu = cpuClock();
             if ( td.setUp() ) {
-                td.run();
+                if ( td.isBenchmark() )
+                    runBenchmark( td );
+                else
+                    td.run();
                 td.tearDown();
             }
+            tracker().setTestTime( wallClock() - wall, cpuClock() - cpu );
             tracker().leaveTest( td );
         }
-        
+
+        static void runBenchmark( TestDescription &td )
+        {
+            BenchmarkStats stats, baseline;
+            if ( !measureBenchmark( td, stats ) )
+                return;
+            tracker().setTestBenchmark( stats );
+            if ( benchmarkBaseline() && benchmarkBaseline()->find( td, baseline ) &&
+                 stats.median > benchmarkLimit( baseline, stats ) )
+                regressed( td, stats, baseline );
+        }
+
+        static void regressed( const TestDescription &td, const BenchmarkStats &stats, const BenchmarkStats &baseline )
+        {
+            char median[BENCHMARK_TIME_SIZE], base[BENCHMARK_TIME_SIZE], limit[BENCHMARK_TIME_SIZE];
+            char message[64 + 3 * BENCHMARK_TIME_SIZE];
+            sprintf( message, "Benchmark regressed: median %s, baseline %s, limit %s",
+                     formatBenchmarkTime( median, stats.median ),
+                     formatBenchmarkTime( base, baseline.median ),
+                     formatBenchmarkTime( limit, benchmarkLimit( baseline, stats ) ) );
+            tracker().failedTest( td.file(), td.line(), message );
+        }
+
+#if defined(_CXXTEST_HAVE_FORK)
+        //
+        // Runs one suite, or one test of a suite, in a worker process
+        // of a ParallelRunner
+        //
+        class Worker : public SuiteRunner
+        {
+        public:
+            bool runSuite( SuiteDescription &sd, const TestDescription *test,
+                           TestDescription *first, TestListener &listener )
+            {
+                tracker().setListener( &listener );
+                _TS_TRY { TestRunner().runSuite( sd, test, first ); }
+                _TS_LAST_CATCH( { return false; } );
+                return true;
+            }
+        };
+
+        void runParallel( WorldDescription &wd )
+        {
+            Worker worker;
+            if ( !ParallelRunner( worker, parallelJobs(), isolation() ).runSuites( wd ) ) {
+#ifdef _CXXTEST_HAVE_EH
+                // An exception left a suite in one of the workers
+                throw AbortTest();
+#endif // _CXXTEST_HAVE_EH
+            }
+        }
+#endif // _CXXTEST_HAVE_FORK
+
         class StateGuard
         {
 #ifdef _CXXTEST_HAVE_EH
@@ -13,11 +13,14 @@
 #define __cxxtest__TestTracker_cpp__
 
 #include <cxxtest/TestTracker.h>
+#include <cxxtest/Timings.h>
+#include <cxxtest/LastRun.h>
 
 namespace CxxTest
 {
     bool TestTracker::_created = false;
     bool TestTracker::print_tracing = false;
+    unsigned TestTracker::print_slowest = 0;
 
     TestTracker::TestTracker()
     {
@@ -45,6 +48,9 @@ namespace CxxTest
         _testFailedAsserts = 0;
         _suiteFailedTests = 0;
         _failedSuites = 0;
+        _testWallTime = _testCpuTime = 0;
+        _suiteWallTime = _suiteCpuTime = 0;
+        _haveBenchmark = false;
         _world = 0;
         _suite = 0;
         _test = 0;
@@ -96,6 +102,7 @@ namespace CxxTest
     {
         setSuite( &sd );
         _testFailedAsserts = _suiteFailedTests = 0;
+        _suiteWallTime = _suiteCpuTime = 0;
         _l->enterSuite(sd);
     }
         
@@ -103,11 +110,19 @@ namespace CxxTest
     {
         setTest( &td );
         _testFailedAsserts = false;
+        _testWallTime = _testCpuTime = 0;
+        _haveBenchmark = false;
         _l->enterTest(td);
     }
 
     void TestTracker::leaveTest( const TestDescription &td )
     {
+        if ( testTimings() )
+            testTimings()->record( td, _testWallTime );
+        if ( testResults() )
+            testResults()->record( td, testFailed() );
+        if ( _haveBenchmark && benchmarkResults() )
+            benchmarkResults()->record( td, _benchmark );
         _l->leaveTest( td );
         setTest( 0 );
     }
@@ -261,6 +276,24 @@ namespace CxxTest
                 ++ _failedSuites;
         }
     }
+
+    void TestTracker::setTestTime( double wall, double cpu )
+    {
+        _testWallTime = wall;
+        _testCpuTime = cpu;
+    }
+
+    void TestTracker::setSuiteTime( double wall, double cpu )
+    {
+        _suiteWallTime = wall;
+        _suiteCpuTime = cpu;
+    }
+
+    void TestTracker::setTestBenchmark( const BenchmarkStats &stats )
+    {
+        _benchmark = stats;
+        _haveBenchmark = true;
+    }
 }
 
 #endif // __cxxtest__TestTracker_cpp__
@@ -20,6 +20,7 @@
 
 #include <cxxtest/TestListener.h>
 #include <cxxtest/DummyDescriptions.h>
+#include <cxxtest/Benchmark.h>
 
 namespace CxxTest
 {
@@ -32,6 +33,7 @@ namespace CxxTest
         
         static TestTracker &tracker();
         static bool print_tracing;
+        static unsigned print_slowest;
 
         const TestDescription *fixTest( const TestDescription *d ) const;
         const SuiteDescription *fixSuite( const SuiteDescription *d ) const;
@@ -51,6 +53,12 @@ namespace CxxTest
         unsigned suiteFailedTests() const { return _suiteFailedTests; }
         unsigned failedSuites() const { return _failedSuites; }
 
+        double testWallTime() const { return _testWallTime; }
+        double testCpuTime() const { return _testCpuTime; }
+        double suiteWallTime() const { return _suiteWallTime; }
+        double suiteCpuTime() const { return _suiteCpuTime; }
+        const BenchmarkStats *testBenchmark() const { return _haveBenchmark ? &_benchmark : 0; }
+
         void enterWorld( const WorldDescription &wd );
         void enterSuite( const SuiteDescription &sd );
         void enterTest( const TestDescription &td );
@@ -101,6 +109,9 @@ namespace CxxTest
         TestListener _dummyListener;
         DummyWorldDescription _dummyWorld;
         unsigned _warnings, _failedTests, _testFailedAsserts, _suiteFailedTests, _failedSuites;
+        double _testWallTime, _testCpuTime, _suiteWallTime, _suiteCpuTime;
+        BenchmarkStats _benchmark;
+        bool _haveBenchmark;
         TestListener *_l;
         const WorldDescription *_world;
         const SuiteDescription *_suite;
@@ -115,8 +126,12 @@ namespace CxxTest
         void setTest( const TestDescription *t );
         void countWarning();
         void countFailure();
+        void setTestTime( double wall, double cpu );
+        void setSuiteTime( double wall, double cpu );
+        void setTestBenchmark( const BenchmarkStats &stats );
 
         friend class TestRunner;
+        friend class EventReader;
         
         TestTracker();
         void setListener( TestListener *l );
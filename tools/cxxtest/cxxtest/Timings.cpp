@@ -0,0 +1,174 @@
+/*
+-------------------------------------------------------------------------
+ CxxTest: A lightweight C++ unit testing library.
+ Copyright (c) 2008 Sandia Corporation.
+ This software is distributed under the LGPL License v2.1
+ For more information, see the COPYING file in the top CxxTest directory.
+ Under the terms of Contract DE-AC04-94AL85000 with Sandia Corporation,
+ the U.S. Government retains certain rights in this software.
+-------------------------------------------------------------------------
+*/
+
+#ifndef __cxxtest__Timings_cpp__
+#define __cxxtest__Timings_cpp__
+
+#include <cxxtest/Timings.h>
+
+#if defined(_CXXTEST_HAVE_STD)
+#   include <fstream>
+#endif // _CXXTEST_HAVE_STD
+
+namespace CxxTest
+{
+    static TestTimings *currentTestTimings = 0;
+    static const TestTime *currentDefaultTimings = 0;
+
+    TestTimings *testTimings()
+    {
+        return currentTestTimings;
+    }
+
+    void setTestTimings( TestTimings *timings )
+    {
+        currentTestTimings = timings;
+    }
+
+    //
+    // The expected time of the active tests of a suite, or the
+    // number of tests when there are no timings
+    //
+    double estimatedTime( const SuiteDescription &sd )
+    {
+        double total = 0;
+        for ( const TestDescription *td = sd.firstTest(); td; td = td->next() )
+            if ( td->active() )
+                total += currentTestTimings ? currentTestTimings->estimate( *td ) : 1.0;
+        return total;
+    }
+
+    static void mergeLongestFirst( unsigned *order, unsigned *scratch, const double *times,
+                                   unsigned begin, unsigned end )
+    {
+        if ( end - begin < 2 )
+            return;
+        unsigned middle = (begin + end) / 2;
+        mergeLongestFirst( order, scratch, times, begin, middle );
+        mergeLongestFirst( order, scratch, times, middle, end );
+        unsigned i = begin, j = middle, k = begin;
+        while ( i < middle && j < end )
+            scratch[k++] = (times[order[j]] > times[order[i]]) ? order[j++] : order[i++];
+        while ( i < middle )
+            scratch[k++] = order[i++];
+        while ( j < end )
+            scratch[k++] = order[j++];
+        for ( k = begin; k < end; ++ k )
+            order[k] = scratch[k];
+    }
+
+    //
+    // Fill order with the indices of times, longest first.  Equal
+    // times keep their order, so every process gets the same result.
+    //
+    void longestFirst( unsigned *order, const double *times, unsigned count )
+    {
+        unsigned *scratch = new unsigned[count];
+        for ( unsigned i = 0; i < count; ++ i )
+            order[i] = i;
+        mergeLongestFirst( order, scratch, times, 0, count );
+        delete [] scratch;
+    }
+
+    const TestTime *defaultTimings()
+    {
+        return currentDefaultTimings;
+    }
+
+    void setDefaultTimings( const TestTime *times )
+    {
+        currentDefaultTimings = times;
+    }
+
+    DefaultTimings::DefaultTimings( const TestTime *times )
+    {
+        setDefaultTimings( times );
+    }
+
+#if defined(_CXXTEST_HAVE_STD)
+    TimingHistory::TimingHistory() : _total( 0 )
+    {
+    }
+
+    void TimingHistory::add( const TestTime *times )
+    {
+        for ( ; times && times->suite; ++ times )
+            set( times->suite, times->test, times->wall );
+    }
+
+    //
+    // The history file has one line per test: suite name, test name
+    // and wall-clock seconds.  A file that does not exist yet is an
+    // empty history.
+    //
+    bool TimingHistory::load( const char *fileName )
+    {
+        std::ifstream input( fileName );
+        if ( !input )
+            return true;
+        std::string suite, test;
+        double wall;
+        while ( input >> suite >> test >> wall )
+            set( suite, test, wall );
+        return input.eof();
+    }
+
+    //
+    // The saved history has the times of the tests that ran, and the
+    // previous times of the tests that did not
+    //
+    bool TimingHistory::save( const char *fileName ) const
+    {
+        Times times( _recorded );
+        times.insert( _times.begin(), _times.end() );
+        std::ofstream output( fileName );
+        output.setf( std::ios::fixed );
+        for ( Times::const_iterator i = times.begin(); i != times.end(); ++ i )
+            output << i->first.first << " " << i->first.second << " " << i->second << "\n";
+        output.close();
+        return !output.fail();
+    }
+
+    //
+    // A test that is not in the history is expected to take as long
+    // as an average test, so those tests are balanced by their number
+    //
+    double TimingHistory::estimate( const TestDescription &td ) const
+    {
+        if ( _times.empty() )
+            return 1.0;
+        Times::const_iterator i = _times.find( Name( td.suiteName(), td.testName() ) );
+        if ( i != _times.end() )
+            return i->second;
+        return _total / _times.size();
+    }
+
+    //
+    // The times of this run do not change the estimates, so the suites
+    // are balanced by the same times however far the run has got
+    //
+    void TimingHistory::record( const TestDescription &td, double wall )
+    {
+        _recorded[Name( td.suiteName(), td.testName() )] = (wall < 0) ? 0 : wall;
+    }
+
+    void TimingHistory::set( const std::string &suite, const std::string &test, double wall )
+    {
+        if ( wall < 0 )
+            wall = 0;
+        double &entry = _times[Name( suite, test )];
+        _total += wall - entry;
+        entry = wall;
+    }
+#endif // _CXXTEST_HAVE_STD
+}
+
+#endif // __cxxtest__Timings_cpp__
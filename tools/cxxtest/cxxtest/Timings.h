@@ -0,0 +1,89 @@
+/*
+-------------------------------------------------------------------------
+ CxxTest: A lightweight C++ unit testing library.
+ Copyright (c) 2008 Sandia Corporation.
+ This software is distributed under the LGPL License v2.1
+ For more information, see the COPYING file in the top CxxTest directory.
+ Under the terms of Contract DE-AC04-94AL85000 with Sandia Corporation,
+ the U.S. Government retains certain rights in this software.
+-------------------------------------------------------------------------
+*/
+
+#ifndef __cxxtest__Timings_h__
+#define __cxxtest__Timings_h__
+
+//
+// The times that the tests took in a previous run.  They are used to
+// balance the suites between shards and worker processes, longest
+// first.  The times of the current run are recorded apart from them,
+// so every shard of a run balances its suites by the same times.
+//
+
+#include <cxxtest/Flags.h>
+#include <cxxtest/Descriptions.h>
+
+#if defined(_CXXTEST_HAVE_STD)
+#   include <cxxtest/StdHeaders.h>
+#endif // _CXXTEST_HAVE_STD
+
+namespace CxxTest
+{
+    struct TestTime
+    {
+        const char *suite;
+        const char *test;
+        double wall;
+    };
+
+    class TestTimings
+    {
+    public:
+        virtual ~TestTimings() {}
+        virtual double estimate( const TestDescription &td ) const = 0;
+        virtual void record( const TestDescription &td, double wall ) = 0;
+    };
+
+    TestTimings *testTimings();
+    void setTestTimings( TestTimings *timings );
+    double estimatedTime( const SuiteDescription &sd );
+    void longestFirst( unsigned *order, const double *times, unsigned count );
+
+    //
+    // The times that cxxtestgen --timings writes into the runner
+    //
+    const TestTime *defaultTimings();
+    void setDefaultTimings( const TestTime *times );
+
+    class DefaultTimings
+    {
+    public:
+        DefaultTimings( const TestTime *times );
+    };
+
+#if defined(_CXXTEST_HAVE_STD)
+    class TimingHistory : public TestTimings
+    {
+    public:
+        TimingHistory();
+
+        void add( const TestTime *times );
+        bool load( const char *fileName );
+        bool save( const char *fileName ) const;
+        bool empty() const { return _times.empty(); }
+
+        double estimate( const TestDescription &td ) const;
+        void record( const TestDescription &td, double wall );
+
+    private:
+        typedef std::pair<std::string, std::string> Name;
+        typedef std::map<Name, double> Times;
+
+        void set( const std::string &suite, const std::string &test, double wall );
+
+        Times _times, _recorded;
+        double _total;
+    };
+#endif // _CXXTEST_HAVE_STD
+}
+
+#endif // __cxxtest__Timings_h__
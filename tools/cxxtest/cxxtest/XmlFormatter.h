@@ -216,9 +216,13 @@ namespace CxxTest
 
         void write( OutputStream &o )
             {
+            std::ostringstream time;
+            time.setf( std::ios::fixed );
+            time << runtime;
             o << "    <testcase classname=\"" << className.c_str() 
               << "\" name=\"" << testName.c_str() 
-              << "\" line=\"" << line.c_str() << "\"";
+              << "\" line=\"" << line.c_str()
+              << "\" time=\"" << time.str().c_str() << "\"";
             bool elts=false;
             element_t curr = elements.begin();
             element_t end  = elements.end();
@@ -240,11 +244,25 @@ namespace CxxTest
 
     };
 
+    //
+    // An output that can go back and write over what it wrote.  With
+    // one, the XmlFormatter writes the head of the testsuite first,
+    // with room for the totals, and then each testcase as it ends.
+    //
+    class RewritableOutput
+    {
+    public:
+        virtual ~RewritableOutput() {}
+        // The position of the end of the output, or -1 if it cannot seek
+        virtual long position() = 0;
+        virtual void rewrite( long position, const char *text ) = 0;
+    };
+
     class XmlFormatter : public TestListener
     {
         public:
-        XmlFormatter( OutputStream *o, OutputStream *ostr, std::ostringstream *os) 
-           : _o(o), _ostr(ostr), _os(os), stream_redirect(NULL) 
+        XmlFormatter( OutputStream *o, OutputStream *ostr, std::ostringstream *os, RewritableOutput *head = 0 ) 
+           : _o(o), _ostr(ostr), _os(os), stream_redirect(NULL), _head(head), _totals(-1)
         {}
 
         std::list<TestCaseInfo> info;
@@ -262,12 +280,24 @@ namespace CxxTest
             return tracker().failedTests();
         }
 
-        void enterWorld( const WorldDescription & /*desc*/ )
+        void enterWorld( const WorldDescription & desc )
         {
             ntests=0;
             nfail=0;
             nerror=0;
             totaltime=0;
+            _totals = _head ? _head->position() : -1;
+            if ( _totals >= 0 )
+            {
+                // The testcases go straight to the output, and the
+                // totals are written over these ones at the end
+                (*_o) << "<?xml version=\"1.0\" encoding=\"UTF-8\" ?>" << endl;
+                (*_o) << "<testsuite name=\"" << desc.worldName() << "\" ";
+                _totals = _head->position();
+                (*_o) << totals().c_str() << ">";
+                _o->endl(*_o);
+                _o->flush();
+            }
         }
 
         static void totalTests( OutputStream &o )
@@ -300,26 +330,15 @@ namespace CxxTest
 
         void leaveSuite( const SuiteDescription & )
         {
-                std::list<TestCaseInfo>::iterator curr = info.begin();
-                std::list<TestCaseInfo>::iterator end  = info.end();
-                while (curr != end) {
-                    if (curr->fail) nfail++;
-                    if (curr->error) nerror++;
-                    totaltime += curr->runtime;
-                    ntests++;
-                    curr++;
-                }
-                curr = info.begin();
-                end  = info.end();
-                while (curr != end) {
-                  (*curr).write(*_ostr);
-                  curr++;
-                }
-                info.clear();
+                writeTestCases( _totals >= 0 ? *_o : *_ostr );
         }
 
         void enterTest( const TestDescription & desc )
         {
+                // The last testcase is kept until the next one starts,
+                // for the failures of the tearDown() of its suite
+                if ( _totals >= 0 )
+                   writeTestCases( *_o );
                 testcase = info.insert(info.end(),TestCaseInfo());
                 testcase->testName = desc.testName();
                 testcase->className = classname;
@@ -335,8 +354,11 @@ namespace CxxTest
               new TeeOutputStreams(CXXTEST_STD(cout), CXXTEST_STD(cerr));
         }
 
-        void leaveTest( const TestDescription & )
+        void leaveTest( const TestDescription &td )
         {
+           testcase->runtime = tracker().testWallTime();
+           if ( tracker().testBenchmark() )
+              benchmark( td, *tracker().testBenchmark() );
            if ( stream_redirect != NULL )
            {
                 std::string out = stream_redirect->out.str();
@@ -354,9 +376,37 @@ namespace CxxTest
            }
         }
 
+        //
+        // The times of a benchmark, and of its baseline if there is one
+        //
+        void benchmark( const TestDescription &td, BenchmarkStats stats )
+        {
+           element_t elt = testcase->add_element("benchmark");
+           elt->add("iterations",stats.iterations);
+           elt->add("samples",stats.samples);
+           elt->add("min",stats.min);
+           elt->add("median",stats.median);
+           elt->add("stddev",stats.stddev);
+           BenchmarkStats baseline;
+           if ( benchmarkBaseline() && benchmarkBaseline()->find( td, baseline ) )
+              {
+              double limit = benchmarkLimit( baseline, stats );
+              elt->add("baseline",baseline.median);
+              elt->add("limit",limit);
+              }
+        }
+
         void leaveWorld( const WorldDescription& desc )
         {
+                if ( _totals >= 0 )
+                {
+                   _head->rewrite( _totals, totals().c_str() );
+                   (*_o) << "</testsuite>" << endl;
+                   _o->flush();
+                   return;
+                }
                 std::ostringstream os;
+                os.setf( std::ios::fixed );
                 os << totaltime;
                 (*_o) << "<?xml version=\"1.0\" encoding=\"UTF-8\" ?>" << endl;
                 (*_o) << "<testsuite name=\"" << desc.worldName() << "\" ";
@@ -513,10 +563,58 @@ namespace CxxTest
             return _ostr;
         }
 
+        RewritableOutput *rewritableOutput() const
+        {
+            return _head;
+        }
+
     private:
         XmlFormatter( const XmlFormatter & );
         XmlFormatter &operator=( const XmlFormatter & );
 
+        void writeTestCases( OutputStream &o )
+        {
+                std::list<TestCaseInfo>::iterator curr = info.begin();
+                std::list<TestCaseInfo>::iterator end  = info.end();
+                while (curr != end) {
+                    if (curr->fail) nfail++;
+                    if (curr->error) nerror++;
+                    totaltime += curr->runtime;
+                    ntests++;
+                    curr++;
+                }
+                curr = info.begin();
+                end  = info.end();
+                while (curr != end) {
+                  (*curr).write(o);
+                  curr++;
+                }
+                info.clear();
+                if ( _totals >= 0 )
+                   o.flush();
+        }
+
+        //
+        // The totals of the testsuite, padded to a fixed width so that
+        // they can be written over the ones in the head
+        //
+        std::string totals() const
+        {
+                std::ostringstream os;
+                os.setf( std::ios::fixed );
+                os << " tests=\"" << ntests
+                   << "\" errors=\"" << nerror
+                   << "\" failures=\"" << nfail
+                   << "\" time=\"" << totaltime << "\" ";
+                std::string text = os.str();
+                std::string::size_type width = TOTALS_WIDTH;
+                if ( text.size() < width )
+                   text.append( width - text.size(), ' ' );
+                return text;
+        }
+
+        enum { TOTALS_WIDTH = 96 };
+
        std::stringstream& testFailure( const char* file, int line, const char *failureType)
         {
             testcase->fail=true;
@@ -568,6 +666,8 @@ namespace CxxTest
         std::ostringstream *_os;
 
         TeeOutputStreams *stream_redirect;
+        RewritableOutput *_head;
+        long _totals;
     };
 }
 
@@ -40,12 +40,13 @@ namespace CxxTest
     {
     public:
         XmlPrinter( CXXTEST_STD(ostream) &o = CXXTEST_STD(cout), const char* /*preLine*/ = ":", const char* /*postLine*/ = "" ) :
-            XmlFormatter( new Adapter(o), new Adapter(ostr), &ostr ) {}
+            XmlFormatter( new Adapter(o), new Adapter(ostr), &ostr, new Rewriter(o) ) {}
 
         virtual ~XmlPrinter() 
         {
             delete outputStream(); 
             delete outputFileStream(); 
+            delete rewritableOutput();
         }
 
     private:
@@ -68,6 +69,31 @@ namespace CxxTest
                 return *this;
             }
         };
+
+        //
+        // Files can seek, so each testcase is written to the file when
+        // it ends, and a crash keeps the testcases that ended before it
+        //
+        class Rewriter : public RewritableOutput
+        {
+            CXXTEST_STD(ostream) &_o;
+        public:
+            Rewriter( CXXTEST_STD(ostream) &o ) : _o(o) {}
+
+            long position()
+            {
+                CXXTEST_STD(streampos) p = _o.tellp();
+                return (p == CXXTEST_STD(streampos)(-1)) ? -1 : (long)CXXTEST_STD(streamoff)(p);
+            }
+
+            void rewrite( long position, const char *text )
+            {
+                CXXTEST_STD(streampos) end = _o.tellp();
+                _o.seekp( position );
+                _o << text;
+                _o.seekp( end );
+            }
+        };
     };
 }
 
@@ -4,7 +4,7 @@
 export PATH=$CXXTEST/bin:$PATH
 
 # @main:
-cxxtestgen -f --error-printer -o runner.cpp MyTestSuite1.h MyTestSuite2.h MyTestSuite4.h
+cxxtestgen -f --error-printer --have-fork -o runner.cpp MyTestSuite1.h MyTestSuite2.h MyTestSuite4.h
 # @:main
 
 # @compile:
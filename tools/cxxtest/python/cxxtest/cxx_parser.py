@@ -50,6 +50,10 @@
 from __future__ import division
 
 import os
+import types
+import shutil
+import hashlib
+import tempfile
 import ply.lex as lex
 import ply.yacc as yacc
 import re
@@ -85,18 +89,27 @@ class Scope(object):
         self.sub_scopes.append(scope)
 
 
+class Hierarchy(object):
+
+    def __init__(self):
+        self.bases=set()
+        self.functions=[]
+        self.unknown=[]
+
+
 class CppInfo(object):
 
     def __init__(self, filter=None):
         self.verbose=0
         if filter is None:
-            self.filter=re.compile("[Tt][Ee][Ss][Tt]|createSuite|destroySuite")
+            self.filter=re.compile("[Tt][Ee][Ss][Tt]|[Bb][Ee][Nn][Cc][Hh]|createSuite|destroySuite")
         else:
             self.filter=filter
         self.scopes=[""]
         self.index=OrderedDict()
         self.index[""]=Scope("","::","namespace",[],1)
         self.function=[]
+        self.hierarchy=None
 
     def push_scope(self,ns,scope_t,base_classes=[]):
         name = self.scopes[-1]+"::"+ns
@@ -104,6 +117,7 @@ class CppInfo(object):
             print "-- Starting "+scope_t+" "+name
         self.scopes.append(name)
         self.index[name] = Scope(ns,name,scope_t,base_classes,scope_lineno-1)
+        self.hierarchy=None
 
     def pop_scope(self):
         scope = self.scopes.pop()
@@ -115,6 +129,7 @@ class CppInfo(object):
         fn = str(fn)
         if self.filter.search(fn):
             self.index[self.scopes[-1]].function.append((fn, identifier_lineno.get(fn,lexer.lineno-1)))
+            self.hierarchy=None
             tmp = self.scopes[-1]+"::"+fn
             if self.verbose==2:
                 print "-- Function declaration "+fn+"  "+tmp
@@ -122,19 +137,16 @@ class CppInfo(object):
                 print "-- Function declaration "+tmp
 
     def get_functions(self,name,quiet=False):
+        '''Returns the functions of a scope, followed by the functions it
+        inherits.  The list is shared by all callers and must not be modified.'''
         if name == "::":
             name = ""
-        scope = self.index[name]
-        fns=scope.function
-        for key in scope.base_classes:
-            cname = self.find_class(key,scope)
-            if cname is None:
-                if not quiet:
-                    print "Defined classes: ",list(self.index.keys())
-                    print "WARNING: Unknown class "+key
-            else:
-                fns += self.get_functions(cname,quiet)
-        return fns
+        entry = self.get_hierarchy()[name]
+        if not quiet:
+            for key in entry.unknown:
+                print "Defined classes: ",list(self.index.keys())
+                print "WARNING: Unknown class "+key
+        return entry.functions
         
     def find_class(self,name,scope):
         if ':' in name:
@@ -156,19 +168,59 @@ class CppInfo(object):
 
     def is_baseclass(self,cls,base):
         '''Returns true if base is a base-class of cls'''
-        if cls in self.index:
-            bases = self.index[cls]
-        elif "::"+cls in self.index:
-            bases = self.index["::"+cls]
-        else:
+        key = self.find_key(cls)
+        if key is None:
             return False
             #raise IOError, "Unknown class "+cls
-        if base in bases.base_classes:
-            return True
-        for name in bases.base_classes:
-            if self.is_baseclass(name,base):
-                return True
-        return False
+        return base in self.get_hierarchy()[key].bases
+
+    def find_key(self,cls):
+        if cls in self.index:
+            return cls
+        if "::"+cls in self.index:
+            return "::"+cls
+        return None
+
+    def get_hierarchy(self):
+        '''Returns the hierarchy index, building it once after parsing'''
+        if self.hierarchy is None:
+            self.hierarchy = {}
+            for key in self.index:
+                self.index_scope(key,[])
+        return self.hierarchy
+
+    def index_scope(self,key,active):
+        #
+        # Collect the transitive base classes, the inherited functions and
+        # the unknown base classes of a scope.  Base classes that are
+        # already being indexed (cyclic definitions) are ignored.
+        #
+        if key in self.hierarchy:
+            return self.hierarchy[key]
+        scope = self.index[key]
+        entry = Hierarchy()
+        active.append(key)
+        functions = list(scope.function)
+        for name in scope.base_classes:
+            entry.bases.add(name)
+            base = self.find_key(name)
+            if base is not None and base not in active:
+                entry.bases.update(self.index_scope(base,active).bases)
+            cname = self.find_class(name,scope)
+            if cname is None:
+                entry.unknown.append(name)
+            elif cname not in active:
+                inherited = self.index_scope(cname,active)
+                functions += inherited.functions
+                entry.unknown += inherited.unknown
+        active.pop()
+        names = set()
+        for fn in functions:
+            if fn[0] not in names:
+                names.add(fn[0])
+                entry.functions.append(fn)
+        self.hierarchy[key] = entry
+        return entry
 
     def __str__(self):
         ans=""
@@ -180,10 +232,10 @@ class CppInfo(object):
             if scope.scope_t == "class":
                 ans += "  Base Classes: "+str(scope.base_classes)+"\n"
                 for fn in self.get_functions(scope.abs_name):
-                    ans += "  "+fn+"\n"
+                    ans += "  "+fn[0]+"\n"
             else:
                 for fn in scope.function:
-                    ans += "  "+fn+"\n"
+                    ans += "  "+fn[0]+"\n"
         return ans
 
 
@@ -327,6 +379,7 @@ tokens = [
  "DOT_STAR",
  "ELLIPSIS",
  "SCOPE",
+ "FunctionBody",
 ] + list(reserved.values())
 
 t_ignore = " \t\r"
@@ -1515,6 +1568,7 @@ def p_function_block(p):
 
 def p_function_body(p):
     '''function_body :              LBRACE nonbrace_seq_opt RBRACE 
+    |                               FunctionBody
     '''
     p[0] = ['{','}']
 
@@ -2097,70 +2151,277 @@ def p_error(p):
 
 
 #
-# The function that performs the parsing
+# The lexer and parser tables are generated once and saved in a cache
+# directory of the user, so they are loaded from the same place whatever
+# the current directory is.  The table modules are named after a hash of
+# this file, so a changed grammar gets new tables.
 #
-def parse_cpp(data=None, filename=None, debug=0, optimize=0, verbose=False, func_filter=None):
-    if debug > 0:
-        print "Debugging parse_cpp!"
-        #
-        # Always remove the parser.out file, which is generated to create debugging
-        #
-        if os.path.exists("parser.out"):
-            os.remove("parser.out")
-        #
-        # Remove the parsetab.py* files.  These apparently need to be removed
-        # to ensure the creation of a parser.out file.
-        #
-        if os.path.exists("parsetab.py"):
-           os.remove("parsetab.py")
-        if os.path.exists("parsetab.pyc"):
-           os.remove("parsetab.pyc")
-        global debugging
-        debugging=True
-    #
-    # Build lexer
-    #
-    global lexer
-    lexer = lex.lex()
-    #
-    # Initialize parse object
-    #
-    global _parse_info
-    _parse_info = CppInfo(filter=func_filter)
-    _parse_info.verbose=verbose
-    #
-    # Build yaccer
-    #
-    write_table = not os.path.exists("parsetab.py")
-    yacc.yacc(debug=debug, optimize=optimize, write_tables=write_table)
-    #
-    # Parse the file
-    #
-    global _parsedata
-    if not data is None:
-        _parsedata=data
-        ply_init(_parsedata)
-        yacc.parse(data,debug=debug)
-    elif not filename is None:
+_tables = None
+
+def table_cache_dir():
+    '''The directory that holds the saved lexer and parser tables'''
+    root = os.environ.get('XDG_CACHE_HOME')
+    if not root:
+        root = os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(root, 'cxxtest', 'ply-' + yacc.__version__)
+
+def table_names():
+    '''The names of the lexer and parser table modules for this grammar'''
+    digest = hashlib.sha1()
+    digest.update(str(getattr(yacc, '__tabversion__', '')).encode('utf-8'))
+    f = open(os.path.splitext(__file__)[0] + '.py', 'rb')
+    digest.update(f.read())
+    f.close()
+    key = digest.hexdigest()[:16]
+    return ('cxxtest_lextab_' + key, 'cxxtest_parsetab_' + key)
+
+def load_table(dirname, name):
+    '''Load a saved table module, or return None'''
+    filename = os.path.join(dirname, name + '.py')
+    if not os.path.exists(filename):
+        return None
+    module = types.ModuleType(name)
+    module.__file__ = filename
+    try:
         f = open(filename)
-        data = f.read()
+        code = compile(f.read(), filename, 'exec')
         f.close()
-        _parsedata=data
-        ply_init(_parsedata)
-        yacc.parse(data, debug=debug)
-    else:
+        exec code in module.__dict__
+    except Exception:
         return None
+    return module
+
+def save_tables(dirname, names):
+    '''Generate the lexer and parser tables into the cache directory'''
+    try:
+        os.makedirs(dirname)
+    except OSError:
+        if not os.path.isdir(dirname):
+            raise
     #
-    if not noExceptionLogic:
-        _parse_info.noExceptionLogic = False
-    else:
-        for key in identifier_lineno:
-            if 'ASSERT_THROWS' in key:
-                _parse_info.noExceptionLogic = False
-                break
-        _parse_info.noExceptionLogic = True
+    # Generate the tables in a private directory and then move them into
+    # place, so that concurrent runs never load a partially written table.
     #
-    return _parse_info
+    tmpdir = tempfile.mkdtemp(dir=dirname)
+    try:
+        lex.lex(optimize=1, lextab=names[0], outputdir=tmpdir)
+        yacc.yacc(optimize=1, tabmodule=names[1], outputdir=tmpdir, errorlog=yacc.NullLogger())
+        for name in names:
+            os.rename(os.path.join(tmpdir, name + '.py'), os.path.join(dirname, name + '.py'))
+    finally:
+        shutil.rmtree(tmpdir, True)
+
+def get_tables():
+    '''Return the lexer and parser table modules, generating them if they
+    are not saved yet.  Returns (None, None) if the tables cannot be saved.'''
+    global _tables
+    if _tables is None:
+        _tables = (None, None)
+        try:
+            dirname = table_cache_dir()
+            names = table_names()
+            tables = [load_table(dirname, name) for name in names]
+            if None in tables:
+                save_tables(dirname, names)
+                tables = [load_table(dirname, name) for name in names]
+            if not None in tables:
+                _tables = tuple(tables)
+        except (IOError, OSError):
+            pass
+    return _tables
+
+#
+# A lexer that returns the body of each function definition as a single
+# FunctionBody token, so the parser never sees the tokens inside it.  A
+# brace starts a function body if it follows the closing parenthesis of a
+# parameter list, or a const or volatile qualifier.  Parentheses that
+# belong to an attribute, or that follow the class-key or namespace keyword
+# of a class or namespace head, are no parameter list.  A body is skipped by
+# searching the text for braces, ignoring those in comments and literals,
+# and exception handling in a skipped body is still noted.
+#
+body_re = re.compile(r'''[{}]|<%|%>|"([^"\\]|\\.)*"|'([^'\\]|\\.)*'|/\*.*?\*/|//[^\n]*|\#[^\n]*|\b(try|catch|throw)\b''', re.S)
+
+head_keywords = ('CLASS', 'STRUCT', 'UNION', 'ENUM', 'NAMESPACE')
+attribute_names = ('__declspec', 'alignas', '__align__')
+
+class BodySkippingLexer(object):
+
+    def __init__(self, lexer):
+        self.lexer = lexer
+
+    def _get_lineno(self):
+        return self.lexer.lineno
+
+    def _set_lineno(self, lineno):
+        self.lexer.lineno = lineno
+
+    lineno = property(_get_lineno, _set_lineno)
+
+    def input(self, data):
+        self.lexer.input(data)
+        self.prev = None
+        self.prev_value = None
+        self.parens = []
+        self.paren_owner = None
+        self.head = None
+
+    def token(self):
+        tok = self.lexer.token()
+        if tok is None:
+            return None
+        if tok.type == '(':
+            self.parens.append((self.prev, self.prev_value))
+        elif tok.type == ')':
+            if self.parens:
+                self.paren_owner = self.parens.pop()
+            else:
+                self.paren_owner = None
+            if self.head is not None and len(self.parens) < self.head:
+                self.head = None
+        elif tok.type in head_keywords:
+            # The parenthesis depth of a class or namespace head
+            self.head = len(self.parens)
+        elif tok.type in (';', ',', '>', 'SHR') and self.head == len(self.parens):
+            self.head = None
+        elif tok.type == 'LBRACE':
+            if self.starts_body():
+                self.skip_body(tok)
+            self.head = None
+        self.prev = tok.type
+        self.prev_value = tok.value
+        return tok
+
+    def starts_body(self):
+        if self.head is not None:
+            return False
+        if self.prev == ')':
+            (owner, value) = self.paren_owner or (None, None)
+            if owner == 'Identifier':
+                return value not in attribute_names
+            return owner not in ('CATCH', 'IF', 'SWITCH', 'FOR', 'WHILE', 'ATTRIBUTE')
+        return self.prev in ('CONST', 'VOLATILE')
+
+    def skip_body(self, tok):
+        global noExceptionLogic
+        data = self.lexer.lexdata
+        start = pos = self.lexer.lexpos
+        depth = 1
+        while depth > 0:
+            m = body_re.search(data, pos)
+            if m is None:
+                pos = len(data)
+                break
+            pos = m.end()
+            text = m.group()
+            if text in ('{', '<%'):
+                depth += 1
+            elif text in ('}', '%>'):
+                depth -= 1
+            elif text in ('try', 'catch', 'throw'):
+                noExceptionLogic = False
+        self.lexer.lineno += data.count('\n', start, pos)
+        self.lexer.lexpos = pos
+        tok.type = 'FunctionBody'
+        tok.value = '{}'
+
+#
+# A parser object builds the lexer and the parser once, and can then parse
+# any number of files.  The grammar rules keep their state in module
+# globals, which are reset at the start of every parse.
+#
+class CppParser(object):
+
+    def __init__(self, debug=0, optimize=0, skip_bodies=False):
+        if debug > 0:
+            print "Debugging parse_cpp!"
+            #
+            # Always remove the parser.out file, which is generated to create debugging
+            #
+            if os.path.exists("parser.out"):
+                os.remove("parser.out")
+            #
+            # Remove the parsetab.py* files.  These apparently need to be removed
+            # to ensure the creation of a parser.out file.
+            #
+            if os.path.exists("parsetab.py"):
+               os.remove("parsetab.py")
+            if os.path.exists("parsetab.pyc"):
+               os.remove("parsetab.pyc")
+            global debugging
+            debugging=True
+        self.debug=debug
+        self.skip_bodies=skip_bodies
+        #
+        # Build lexer
+        #
+        if debug > 0:
+            lextab, parsetab = None, None
+        else:
+            lextab, parsetab = get_tables()
+        if lextab is not None:
+            try:
+                self.lexer = lex.lex(optimize=1, lextab=lextab)
+                self.parser = yacc.yacc(optimize=1, tabmodule=parsetab)
+            except Exception:
+                # Older versions of PLY only load tables by module name
+                lextab = None
+        if lextab is None:
+            self.lexer = lex.lex()
+            #
+            # Build yaccer
+            #
+            self.parser = yacc.yacc(debug=debug, optimize=optimize, write_tables=0)
+
+    def parse(self, data=None, filename=None, verbose=False, func_filter=None):
+        if data is None:
+            if filename is None:
+                return None
+            f = open(filename)
+            data = f.read()
+            f.close()
+        #
+        # Reset the state of the previous parse
+        #
+        global lexer, scope_lineno, identifier_lineno, noExceptionLogic
+        if self.skip_bodies:
+            lexer = BodySkippingLexer(self.lexer)
+        else:
+            lexer = self.lexer
+        lexer.lineno = 1
+        scope_lineno = 0
+        identifier_lineno = {}
+        noExceptionLogic = True
+        #
+        # Initialize parse object
+        #
+        global _parse_info
+        _parse_info = CppInfo(filter=func_filter)
+        _parse_info.verbose=verbose
+        #
+        # Parse the file
+        #
+        ply_init(data)
+        self.parser.parse(data, lexer=lexer, debug=self.debug)
+        #
+        if not noExceptionLogic:
+            _parse_info.noExceptionLogic = False
+        else:
+            for key in identifier_lineno:
+                if 'ASSERT_THROWS' in key:
+                    _parse_info.noExceptionLogic = False
+                    break
+            else:
+                _parse_info.noExceptionLogic = True
+        #
+        return _parse_info
+
+#
+# The function that performs the parsing
+#
+def parse_cpp(data=None, filename=None, debug=0, optimize=0, verbose=False, func_filter=None):
+    parser = CppParser(debug=debug, optimize=optimize)
+    return parser.parse(data=data, filename=filename, verbose=verbose, func_filter=func_filter)
 
 
 
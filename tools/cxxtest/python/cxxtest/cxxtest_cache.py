@@ -0,0 +1,157 @@
+#-------------------------------------------------------------------------
+# CxxTest: A lightweight C++ unit testing library.
+# Copyright (c) 2008 Sandia Corporation.
+# This software is distributed under the LGPL License v2.1
+# For more information, see the COPYING file in the top CxxTest directory.
+# Under the terms of Contract DE-AC04-94AL85000 with Sandia Corporation,
+# the U.S. Government retains certain rights in this software.
+#-------------------------------------------------------------------------
+
+#
+# On-disk cache of generated test runners.  A cache entry is keyed by
+# the contents of every input file, the template file, the cxxtestgen
+# options and the sources of cxxtestgen itself, so an unchanged build
+# can reuse the previous output without scanning any headers.  The
+# least recently used entries are removed when the cache grows past
+# its size limit.
+#
+
+from __future__ import division
+
+import os
+import hashlib
+import __release__
+import cxxtest_index
+
+# Options that do not influence the text of the generated runner
+ignoredOptions = ['outputFileName', 'cacheDir', 'cacheSize', 'serveSocket', 'serverSocket', 'jobs',
+                  'depFileName', 'writeDepFile', 'manifestFileName', 'manifestOnly']
+
+def hashText( digest, text ):
+    '''Add a string to a hash object'''
+    if not isinstance(text, bytes):
+        text = text.encode('utf-8')
+    digest.update( text )
+
+def hashFile( digest, fileName ):
+    '''Add the name and contents of a file to a hash object'''
+    hashText( digest, '\0file:%s\0' % fileName )
+    INPUT = open( fileName, 'rb' )
+    hashText( digest, INPUT.read() )
+    INPUT.close()
+
+sources = []
+
+def sourceDigest():
+    '''Hash of the sources of the cxxtest package, so that a changed
+    generator does not reuse the runners of the old one'''
+    if not sources:
+        digest = hashlib.sha1()
+        packageDir = os.path.dirname( os.path.abspath( __file__ ) )
+        for fileName in sorted( os.listdir( packageDir ) ):
+            if fileName.endswith( '.py' ):
+                hashFile( digest, os.path.join( packageDir, fileName ) )
+        sources.append( digest.hexdigest() )
+    return sources[0]
+
+def cacheKey( files, options ):
+    '''Compute the cache key for generating a runner from files'''
+    digest = hashlib.sha1()
+    hashText( digest, 'cxxtest-%s-%s\0' % (__release__.__version__, sourceDigest()) )
+    values = vars(options)
+    for name in sorted(values.keys()):
+        if name not in ignoredOptions:
+            hashText( digest, '%s=%r\0' % (name, values[name]) )
+    for fileName in files:
+        hashFile( digest, fileName )
+    if options.templateFileName:
+        hashFile( digest, options.templateFileName )
+    for fileName in options.timingsFiles:
+        if os.path.exists( fileName ):
+            hashFile( digest, fileName )
+    if options.classIndex:
+        # Suites may inherit tests from any header in the class index
+        for fileName in cxxtest_index.indexedFiles( options.classIndex ):
+            if os.path.exists( fileName ):
+                hashFile( digest, fileName )
+    return digest.hexdigest()
+
+def cacheFileName( cacheDir, key ):
+    '''The name of the cache entry for a key'''
+    return os.path.join( cacheDir, key + '.cpp' )
+
+def lookup( cacheDir, key ):
+    '''Return the cached runner for a key, or None'''
+    fileName = cacheFileName( cacheDir, key )
+    if not os.path.exists( fileName ):
+        return None
+    INPUT = open( fileName, 'r' )
+    text = INPUT.read()
+    INPUT.close()
+    try:
+        # The modification time of an entry is the time it was last used
+        os.utime( fileName, None )
+    except OSError:
+        pass
+    return text
+
+def store( cacheDir, key, text, maxSize=0 ):
+    '''Save the generated runner for a key, and remove the least recently
+    used entries while the cache is larger than maxSize bytes'''
+    if not os.path.isdir( cacheDir ):
+        os.makedirs( cacheDir )
+    fileName = cacheFileName( cacheDir, key )
+    # Write under a temporary name so concurrent builds never read a
+    # partially written entry
+    tmpName = '%s.%d.tmp' % (fileName, os.getpid())
+    OUTPUT = open( tmpName, 'w' )
+    OUTPUT.write( text )
+    OUTPUT.close()
+    try:
+        os.rename( tmpName, fileName )
+    except OSError:
+        # Another process stored the same entry first
+        os.remove( tmpName )
+    if maxSize:
+        prune( cacheDir, maxSize, fileName )
+
+def prune( cacheDir, maxSize, keep ):
+    '''Remove the least recently used entries, except keep, until the
+    cache is no larger than maxSize bytes'''
+    entries = []
+    total = 0
+    for name in os.listdir( cacheDir ):
+        fileName = os.path.join( cacheDir, name )
+        if not name.endswith( '.cpp' ) or fileName == keep:
+            continue
+        try:
+            info = os.stat( fileName )
+        except OSError:
+            # Removed by another process
+            continue
+        entries.append( (info.st_mtime, info.st_size, fileName) )
+        total += info.st_size
+    if os.path.exists( keep ):
+        total += os.path.getsize( keep )
+    entries.sort()
+    for (mtime, size, fileName) in entries:
+        if total <= maxSize:
+            break
+        try:
+            os.remove( fileName )
+        except OSError:
+            pass
+        total -= size
+
+def writeIfChanged( fileName, text ):
+    '''Write text to fileName, leaving the file untouched if it is current'''
+    if os.path.exists( fileName ):
+        INPUT = open( fileName, 'r' )
+        current = INPUT.read()
+        INPUT.close()
+        if current == text:
+            return False
+    OUTPUT = open( fileName, 'w' )
+    OUTPUT.write( text )
+    OUTPUT.close()
+    return True
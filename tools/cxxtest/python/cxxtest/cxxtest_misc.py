@@ -9,11 +9,75 @@
 #-------------------------------------------------------------------------
 
 import sys
+from StringIO import StringIO
+
+class GenerationError(ValueError):
+    '''A problem that keeps cxxtestgen from generating a test runner'''
 
 def abort( problem ):
+    '''Stop generating the test runner because of problem'''
+    raise GenerationError( problem )
+
+def reportError( error ):
     '''Print error message and exit'''
     sys.stderr.write( '\n' )
-    sys.stderr.write( problem )
+    sys.stderr.write( str(error) )
     sys.stderr.write( '\n\n' )
     sys.exit(2)
 
+
+def parallelMap( function, args, jobs, replay=True ):
+    '''Generate function(arg) for each of args, using up to jobs processes.
+    Results are generated, and the output of each call is replayed, in the
+    order of args, so the effect is the same as calling function serially.
+    If replay is false, (result, out, err) is generated instead, and the
+    caller decides whether to write the output of the call; out and err are
+    empty when the calls are made serially, as their output is not captured.'''
+    if jobs <= 1 or len(args) <= 1:
+        for arg in args:
+            if replay:
+                yield function( arg )
+            else:
+                yield ( function( arg ), '', '' )
+        return
+    import multiprocessing
+    pool = multiprocessing.Pool( min( jobs, len(args) ) )
+    try:
+        for (result, status, error, out, err) in pool.imap( runJob, [(function, arg) for arg in args] ):
+            if replay or status is not None or error is not None:
+                sys.stdout.write( out )
+                sys.stderr.write( err )
+            if error is not None:
+                raise error
+            if status is not None:
+                sys.exit( status )
+            if replay:
+                yield result
+            else:
+                yield ( result, out, err )
+    finally:
+        pool.terminate()
+        pool.join()
+
+def runJob( job ):
+    '''Call function(arg) in a worker process of parallelMap()'''
+    (function, arg) = job
+    out = StringIO()
+    err = StringIO()
+    (stdout, stderr) = (sys.stdout, sys.stderr)
+    (sys.stdout, sys.stderr) = (out, err)
+    result = None
+    status = None
+    error = None
+    try:
+        try:
+            result = function( arg )
+        except SystemExit, e:
+            status = e.code
+            if status is None:
+                status = 0
+        except GenerationError, e:
+            error = e
+    finally:
+        (sys.stdout, sys.stderr) = (stdout, stderr)
+    return (result, status, error, out.getvalue(), err.getvalue())
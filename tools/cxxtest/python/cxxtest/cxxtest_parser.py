@@ -11,161 +11,340 @@ from __future__ import division
 
 import codecs
 import re
-#import sys
+import sys
 #import getopt
 #import glob
-from cxxtest.cxxtest_misc import abort
+from cxxtest.cxxtest_misc import abort, parallelMap
 
-# Global variables
-suites = []
-suite = None
-inBlock = 0
-options=None
-
-def scanInputFiles(files, _options):
+def scanInputFiles(files, _options, classIndex=None):
     '''Scan all input files for test suites'''
-    global options
-    options=_options
-    for file in files:
-        scanInputFile(file)
-    global suites
-    if len(suites) is 0 and not options.root:
-        abort( 'No tests defined' )
-    return [options,suites]
-
-lineCont_re = re.compile('(.*)\\\s*$')
-def scanInputFile(fileName):
-    '''Scan single input file for test suites'''
-    # mode 'rb' is problematic in python3 - byte arrays don't behave the same as
-    # strings.
-    # As far as the choice of the default encoding: utf-8 chews through
-    # everything that the previous ascii codec could, plus most of new code.
-    # TODO: figure out how to do this properly - like autodetect encoding from
-    # file header.
-    file = codecs.open(fileName, mode='r', encoding='utf-8')
-    prev = ""
-    lineNo = 0
-    contNo = 0
-    while 1:
-        line = file.readline()
-        if not line:
-            break
-        lineNo += 1
-
-        m = lineCont_re.match(line)
-        if m:
-            prev += m.group(1) + " "
-            contNo += 1
+    return Scanner(_options, classIndex).scanInputFiles(files)
+
+boms = [ (codecs.BOM_UTF8, 'utf-8'),
+         (codecs.BOM_UTF16_LE, 'utf-16-le'),
+         (codecs.BOM_UTF16_BE, 'utf-16-be') ]
+coding_re = re.compile( br'coding[:=]\s*([-\w.]+)' )
+std = r"\b(?:std\s*::|CXXTEST_STD|using\s+namespace\s+std\b|^\s*\#\s*include\s+<[a-z0-9]+>)"
+std_re = re.compile( std )
+exception = r"\b(?:throw|try|catch|TSM?_ASSERT_THROWS[A-Z_]*)\b"
+exception_re = re.compile( exception )
+classdef = '(?:::\s*)?(?:\w+\s*::\s*)*\w+'
+baseclassdef = '(?:public|private|protected)\s+%s' % (classdef,)
+general_suite = r"\bclass\s+(?P<suiteName>%s)\s*:(?P<suiteBases>(?:\s*%s\s*,)*\s*public\s+%s)" \
+                % (classdef, baseclassdef, classdef,)
+publicBase_re = re.compile( r'\bpublic\s+(%s)' % (classdef,) )
+testsuite_re = re.compile( r'^(?:(?:::)?CxxTest::)?TestSuite$' )
+generatedSuite = r'\bCXXTEST_SUITE\s*\(\s*(?P<generatedName>\w*)\s*\)'
+test = r'\bvoid\s+(?P<testName>(?:[Tt]est|[Bb]ench)\w+)\s*\(\s*(?:void)?\s*\)'
+create = r'\bstatic\s+\w+\s*\*\s*createSuite\s*\(\s*(?:void)?\s*\)'
+destroy = r'\bstatic\s+void\s+destroySuite\s*\(\s*\w+\s*\*\s*\w*\s*\)'
+
+# Everything the scanner looks for in a line, as one pattern, so each line
+# is searched once no matter how many suites have been seen
+line_re = re.compile( '|'.join( [ '(?P<suite>%s)' % general_suite,
+                                  '(?P<generated>%s)' % generatedSuite,
+                                  '(?P<test>%s)' % test,
+                                  '(?P<create>%s)' % create,
+                                  '(?P<destroy>%s)' % destroy,
+                                  '(?P<std>%s)' % std,
+                                  '(?P<exception>%s)' % exception ] ) )
+
+class Scanner(object):
+    '''Line-oriented test discovery.  A scanner holds all of the state of
+    one scan, so separate scanners may be used for separate runners.
+    If a class index is given, suites may derive from the suites it knows,
+    and the classes of each scanned file are recorded in it.'''
+
+    def __init__(self, options, classIndex=None):
+        self.options = options
+        self.classIndex = classIndex
+        self.suites = []
+        self.suite = None
+        self.inBlock = 0
+        self.knownSuites = {}
+        self.unresolved = []
+        self.classes = {}
+        self.indexedClass = None
+
+    def scanInputFiles(self, files):
+        '''Scan all input files for test suites'''
+        if self.options.jobs > 1:
+            self.scanInParallel(files)
         else:
-            scanInputLine( fileName, lineNo - contNo, prev + line )
-            contNo = 0
-            prev = ""
-    if contNo:
-        scanInputLine( fileName, lineNo - contNo, prev + line )
-        
-    closeSuite()
-    file.close()
-
-def scanInputLine( fileName, lineNo, line ):
-    '''Scan single input line for interesting stuff'''
-    scanLineForExceptionHandling( line )
-    scanLineForStandardLibrary( line )
-
-    scanLineForSuiteStart( fileName, lineNo, line )
-
-    global suite
-    if suite:
-        scanLineInsideSuite( suite, lineNo, line )
-
-def scanLineInsideSuite( suite, lineNo, line ):
-    '''Analyze line which is part of a suite'''
-    global inBlock
-    if lineBelongsToSuite( suite, lineNo, line ):
-        scanLineForTest( suite, lineNo, line )
-        scanLineForCreate( suite, lineNo, line )
-        scanLineForDestroy( suite, lineNo, line )
-
-def lineBelongsToSuite( suite, lineNo, line ):
-    '''Returns whether current line is part of the current suite.
-    This can be false when we are in a generated suite outside of CXXTEST_CODE() blocks
-    If the suite is generated, adds the line to the list of lines'''
-    if not suite['generated']:
-        return 1
-
-    global inBlock
-    if not inBlock:
-        inBlock = lineStartsBlock( line )
-    if inBlock:
-        inBlock = addLineToBlock( suite, lineNo, line )
-    return inBlock
-
-
-std_re = re.compile( r"\b(std\s*::|CXXTEST_STD|using\s+namespace\s+std\b|^\s*\#\s*include\s+<[a-z0-9]+>)" )
-def scanLineForStandardLibrary( line ):
-    '''Check if current line uses standard library'''
-    global options
-    if not options.haveStandardLibrary and std_re.search(line):
-        if not options.noStandardLibrary:
-            options.haveStandardLibrary = 1
+            for file in files:
+                self.scanInputFile(file)
+        if len(self.suites) == 0 and not self.options.root:
+            abort( 'No tests defined' )
+        return [self.options,self.suites]
+
+    def scanInParallel(self, files):
+        '''Scan the input files on separate processes and merge the results
+        in the order of the files'''
+        jobs = [(file, self.options, self.classIndex) for file in files]
+        results = parallelMap( scanInputFileJob, jobs, self.options.jobs, replay=False )
+        for (file, (scanner, out, err)) in zip( files, results ):
+            if self.classIndex is not None:
+                self.classIndex.merge( scanner.classIndex )
+            if self.inheritsKnownSuite( scanner ):
+                # The file inherits from suites in earlier files.  The output
+                # of the first scan is dropped, as the rescan prints it again.
+                self.scanInputFile(file)
+            else:
+                sys.stdout.write( out )
+                sys.stderr.write( err )
+                self.mergeScanner(scanner)
 
-exception_re = re.compile( r"\b(throw|try|catch|TSM?_ASSERT_THROWS[A-Z_]*)\b" )
-def scanLineForExceptionHandling( line ):
-    '''Check if current line uses exception handling'''
-    global options
-    if not options.haveExceptionHandling and exception_re.search(line):
-        if not options.noExceptionHandling:
+    def inheritsKnownSuite(self, scanner):
+        '''Whether a class that the scanner could not resolve derives from
+        a suite of the files scanned so far'''
+        for name in scanner.unresolved:
+            if name in self.knownSuites:
+                return 1
+        return 0
+
+    def mergeScanner(self, scanner):
+        '''Add the results of scanning a single file'''
+        self.suites.extend( scanner.suites )
+        self.knownSuites.update( scanner.knownSuites )
+        options = self.options
+        if scanner.options.haveStandardLibrary and not options.haveStandardLibrary:
+            options.haveStandardLibrary = 1
+        if scanner.options.haveExceptionHandling and not options.haveExceptionHandling:
             options.haveExceptionHandling = 1
 
-classdef = '(?:::\s*)?(?:\w+\s*::\s*)*\w+'
-baseclassdef = '(?:public|private|protected)\s+%s' % (classdef,)
-general_suite = r"\bclass\s+(%s)\s*:(?:\s*%s\s*,)*\s*public\s+" \
-                % (classdef, baseclassdef,)
-testsuite = '(?:(?:::)?\s*CxxTest\s*::\s*)?TestSuite'
-suites_re = { re.compile( general_suite + testsuite ) : None }
-generatedSuite_re = re.compile( r'\bCXXTEST_SUITE\s*\(\s*(\w*)\s*\)' )
-def scanLineForSuiteStart( fileName, lineNo, line ):
-    '''Check if current line starts a new test suite'''
-    for i in list(suites_re.items()):
-        m = i[0].search( line )
+    def scanInputFile(self, fileName):
+        '''Scan single input file for test suites'''
+        lineNo = 0
+        prev = []
+        for line in readInputFile( fileName ).splitlines( True ):
+            lineNo += 1
+            if '\\' in line:
+                stripped = line.rstrip()
+                if stripped.endswith( '\\' ):
+                    # Continued lines are joined into a single logical line
+                    prev.append( stripped[:-1] + " " )
+                    continue
+            if prev:
+                prev.append( line )
+                self.scanInputLine( fileName, lineNo + 1 - len(prev), ''.join( prev ) )
+                prev = []
+            else:
+                self.scanInputLine( fileName, lineNo, line )
+        if prev:
+            self.scanInputLine( fileName, lineNo + 1 - len(prev), ''.join( prev ) )
+
+        self.closeSuite()
+        if self.classIndex is not None:
+            self.classIndex.update( fileName, self.classes )
+            self.classes = {}
+            self.indexedClass = None
+
+    def scanInputLine( self, fileName, lineNo, line ):
+        '''Scan single input line for interesting stuff'''
+        matches = scanLine( line )
+        if matches:
+            self.scanLineForExceptionHandling( matches )
+            self.scanLineForStandardLibrary( matches )
+            self.scanLineForSuiteStart( fileName, lineNo, matches )
+            if self.indexedClass is not None:
+                name = testName( line, matches )
+                if name:
+                    self.indexedClass['tests'].append( (name, lineNo) )
+
+        if self.suite:
+            self.scanLineInsideSuite( self.suite, lineNo, line, matches )
+
+    def scanLineInsideSuite( self, suite, lineNo, line, matches ):
+        '''Analyze line which is part of a suite'''
+        if self.lineBelongsToSuite( suite, lineNo, line ) and matches:
+            scanLineForTest( suite, lineNo, line, matches )
+            scanLineForCreate( suite, lineNo, matches )
+            scanLineForDestroy( suite, lineNo, matches )
+
+    def lineBelongsToSuite( self, suite, lineNo, line ):
+        '''Returns whether current line is part of the current suite.
+        This can be false when we are in a generated suite outside of CXXTEST_CODE() blocks
+        If the suite is generated, adds the line to the list of lines'''
+        if not suite['generated']:
+            return 1
+
+        if not self.inBlock:
+            self.inBlock = lineStartsBlock( line )
+        if self.inBlock:
+            self.inBlock = addLineToBlock( suite, lineNo, line )
+        return self.inBlock
+
+    def scanLineForStandardLibrary( self, matches ):
+        '''Check if current line uses standard library'''
+        options = self.options
+        if not options.haveStandardLibrary and lineUses( matches, 'std', std_re ):
+            if not options.noStandardLibrary:
+                options.haveStandardLibrary = 1
+
+    def scanLineForExceptionHandling( self, matches ):
+        '''Check if current line uses exception handling'''
+        options = self.options
+        if not options.haveExceptionHandling and lineUses( matches, 'exception', exception_re ):
+            if not options.noExceptionHandling:
+                options.haveExceptionHandling = 1
+
+    def scanLineForSuiteStart( self, fileName, lineNo, matches ):
+        '''Check if current line starts a new test suite'''
+        m = matches.get( 'suite' )
+        if m:
+            names = baseNames( m.group('suiteBases') )
+            if self.classIndex is not None:
+                self.indexClass( m.group('suiteName'), names )
+            base = self.suiteBase( names )
+            if base is not None:
+                suite = self.startSuite( m.group('suiteName'), fileName, lineNo, 0 )
+                if base:
+                    for test in base['tests']:
+                        addTest(suite, test['name'], test['line'])
+        m = matches.get( 'generated' )
         if m:
-            suite = startSuite( m.group(1), fileName, lineNo, 0 )
-            if i[1] is not None:
-                for test in i[1]['tests']:
-                    addTest(suite, test['name'], test['line'])
-            break
-    m = generatedSuite_re.search( line )
+            sys.stdout.write( "%s:%s: Warning: Inline test suites are deprecated.\n" % (fileName, lineNo) )
+            self.indexedClass = None
+            self.startSuite( m.group('generatedName'), fileName, lineNo, 1 )
+
+    def suiteBase( self, names ):
+        '''Find the suite a class derives from.  Returns 0 for a direct
+        CxxTest::TestSuite subclass, the base suite for a subclass of a
+        known suite and None if the class is not a suite at all'''
+        for name in names:
+            if testsuite_re.match( name ):
+                return 0
+        for name in names:
+            if name in self.knownSuites:
+                return self.knownSuites[name]
+        if self.classIndex is not None:
+            for name in names:
+                tests = self.classIndex.suiteTests( name )
+                if tests is not None:
+                    return { 'tests' : [ { 'name' : test[0], 'line' : test[1] } for test in tests ] }
+        self.unresolved.extend( names )
+        return None
+
+    def indexClass( self, name, bases ):
+        '''Start recording a class for the class index'''
+        self.indexedClass = { 'bases' : bases, 'tests' : [] }
+        self.classes[className( name )] = self.indexedClass
+
+    def startSuite( self, name, file, line, generated ):
+        '''Start scanning a new suite'''
+        self.closeSuite()
+        object_name = name.replace(':',"_")
+        suite = { 'name'         : name,
+                  'file'         : file,
+                  'cfile'        : cstr(file),
+                  'line'         : line,
+                  'generated'    : generated,
+                  'object'       : 'suite_%s' % object_name,
+                  'dobject'      : 'suiteDescription_%s' % object_name,
+                  'tlist'        : 'Tests_%s' % object_name,
+                  'tests'        : [],
+                  'lines'        : [] }
+        self.knownSuites[className( name )] = suite
+        self.suite = suite
+        return suite
+
+    def closeSuite(self):
+        '''Close current suite and add it to the list if valid'''
+        suite = self.suite
+        if suite is not None:
+            if len(suite['tests']) != 0:
+                verifySuite(suite)
+                self.rememberSuite(suite)
+            self.suite = None
+
+    def rememberSuite(self, suite):
+        '''Add current suite to list'''
+        self.suites.append( suite )
+
+def scanInputFileJob( job ):
+    '''Scan one input file with a scanner of its own, for parallelMap()'''
+    (fileName, options, classIndex) = job
+    scanner = Scanner( options, classIndex )
+    scanner.scanInputFile( fileName )
+    return scanner
+
+def indexInputFile( fileName, options, classIndex ):
+    '''Scan a file only to record its classes in the class index'''
+    Scanner( options, classIndex ).scanInputFile( fileName )
+
+def readInputFile( fileName ):
+    '''Read a whole input file as text'''
+    INPUT = open( fileName, 'rb' )
+    data = INPUT.read()
+    INPUT.close()
+    try:
+        # Plain ASCII, by far the most common case, needs no detection
+        return data.decode( 'ascii' )
+    except UnicodeDecodeError:
+        return decodeInputFile( data )
+
+def decodeInputFile( data ):
+    '''Decode the contents of a non-ASCII input file.  A byte order mark or
+    an Emacs/Vim style coding comment in the first two lines selects the
+    encoding; otherwise the file is taken to be UTF-8, or Latin-1 if it is
+    not valid UTF-8.'''
+    for (bom, encoding) in boms:
+        if data.startswith( bom ):
+            return data[len(bom):].decode( encoding, 'replace' )
+    m = coding_re.search( b'\n'.join( data.split( b'\n', 2 )[:2] ) )
     if m:
-        sys.stdout.write( "%s:%s: Warning: Inline test suites are deprecated.\n" % (fileName, lineNo) )
-        startSuite( m.group(1), fileName, lineNo, 1 )
-
-def startSuite( name, file, line, generated ):
-    '''Start scanning a new suite'''
-    global suite
-    closeSuite()
-    object_name = name.replace(':',"_")
-    suite = { 'name'         : name,
-              'file'         : file,
-              'cfile'        : cstr(file),
-              'line'         : line,
-              'generated'    : generated,
-              'object'       : 'suite_%s' % object_name,
-              'dobject'      : 'suiteDescription_%s' % object_name,
-              'tlist'        : 'Tests_%s' % object_name,
-              'tests'        : [],
-              'lines'        : [] }
-    suites_re[re.compile( general_suite + name )] = suite
-    return suite
+        try:
+            return data.decode( m.group(1).decode( 'ascii' ), 'replace' )
+        except LookupError:
+            pass
+    try:
+        return data.decode( 'utf-8' )
+    except UnicodeDecodeError:
+        return data.decode( 'latin-1' )
+
+def scanLine( line ):
+    '''Find the first match of each kind in a line.  Returns a dictionary
+    from match kind to match object, or None if nothing matched.'''
+    matches = None
+    for m in line_re.finditer( line ):
+        if matches is None:
+            matches = {}
+        if m.lastgroup not in matches:
+            matches[m.lastgroup] = m
+    return matches
+
+def lineUses( matches, kind, pattern ):
+    '''Check if the matches of a line include one of kind.  The head of a
+    suite is matched as a whole, so it is searched with pattern as well.'''
+    if kind in matches:
+        return True
+    m = matches.get( 'suite' )
+    return m is not None and pattern.search( m.group(0) ) is not None
+
+def baseNames( bases ):
+    '''The normalized names of the public base classes in a class head'''
+    return [ className( name ) for name in publicBase_re.findall( bases ) ]
+
+def className( name ):
+    '''Normalize the spelling of a (possibly qualified) class name'''
+    return re.sub( r'\s+', '', name )
 
 def lineStartsBlock( line ):
     '''Check if current line starts a new CXXTEST_CODE() block'''
     return re.search( r'\bCXXTEST_CODE\s*\(', line ) is not None
 
-test_re = re.compile( r'^([^/]|/[^/])*\bvoid\s+([Tt]est\w+)\s*\(\s*(void)?\s*\)' )
-def scanLineForTest( suite, lineNo, line ):
+def scanLineForTest( suite, lineNo, line, matches ):
     '''Check if current line starts a test'''
-    m = test_re.search( line )
-    if m:
-        addTest( suite, m.group(2), lineNo )
+    name = testName( line, matches )
+    if name:
+        addTest( suite, name, lineNo )
+
+def testName( line, matches ):
+    '''The name of the test that starts in the current line, if any'''
+    m = matches.get( 'test' )
+    if m and '//' not in line[:m.start()]:
+        return m.group('testName')
+    return None
 
 def addTest( suite, name, line ):
     '''Add a test function to the current suite'''
@@ -181,7 +360,7 @@ def addLineToBlock( suite, lineNo, line ):
     '''Append the line to the current CXXTEST_CODE() block'''
     line = fixBlockLine( suite, lineNo, line )
     line = re.sub( r'^.*\{\{', '', line )
-    
+
     e = re.search( r'\}\}', line )
     if e:
         line = line[:e.start()]
@@ -194,16 +373,14 @@ def fixBlockLine( suite, lineNo, line):
                    r'_\1(%s,%s,' % (suite['cfile'], lineNo),
                    line, 0 )
 
-create_re = re.compile( r'\bstatic\s+\w+\s*\*\s*createSuite\s*\(\s*(void)?\s*\)' )
-def scanLineForCreate( suite, lineNo, line ):
+def scanLineForCreate( suite, lineNo, matches ):
     '''Check if current line defines a createSuite() function'''
-    if create_re.search( line ):
+    if 'create' in matches:
         addSuiteCreateDestroy( suite, 'create', lineNo )
 
-destroy_re = re.compile( r'\bstatic\s+void\s+destroySuite\s*\(\s*\w+\s*\*\s*\w*\s*\)' )
-def scanLineForDestroy( suite, lineNo, line ):
+def scanLineForDestroy( suite, lineNo, matches ):
     '''Check if current line defines a destroySuite() function'''
-    if destroy_re.search( line ):
+    if 'destroy' in matches:
         addSuiteCreateDestroy( suite, 'destroy', lineNo )
 
 def cstr( s ):
@@ -217,15 +394,6 @@ def addSuiteCreateDestroy( suite, which, line ):
         abort( '%s:%s: %sSuite() already declared' % ( suite['file'], str(line), which ) )
     suite[which] = line
 
-def closeSuite():
-    '''Close current suite and add it to the list if valid'''
-    global suite
-    if suite is not None:
-        if len(suite['tests']) is not 0:
-            verifySuite(suite)
-            rememberSuite(suite)
-        suite = None
-
 def verifySuite(suite):
     '''Verify current suite is legal'''
     if 'create' in suite and 'destroy' not in suite:
@@ -234,9 +402,3 @@ def verifySuite(suite):
     elif 'destroy' in suite and 'create' not in suite:
         abort( '%s:%s: Suite %s has destroySuite() but no createSuite()' %
                (suite['file'], suite['destroy'], suite['name']) )
-
-def rememberSuite(suite):
-    '''Add current suite to list'''
-    global suites
-    suites.append( suite )
-
@@ -0,0 +1,205 @@
+#-------------------------------------------------------------------------
+# CxxTest: A lightweight C++ unit testing library.
+# Copyright (c) 2008 Sandia Corporation.
+# This software is distributed under the LGPL License v2.1
+# For more information, see the COPYING file in the top CxxTest directory.
+# Under the terms of Contract DE-AC04-94AL85000 with Sandia Corporation,
+# the U.S. Government retains certain rights in this software.
+#-------------------------------------------------------------------------
+
+#
+# A persistent cxxtestgen process.  The server listens on a Unix domain
+# socket and runs cxxtestgen for every request it receives, so the
+# Python startup, package imports and parser tables are paid only once
+# for a whole build.  A request is the client's working directory and
+# argument list, together with the environment variables that cxxtestgen
+# reads; the response is the exit status together with the text that was
+# written to stdout and stderr.  Each request is handled in a process
+# forked from the server, so parallel clients do not wait for each other.
+# Other environment variables, such as PYTHONPATH, are those of the
+# server.
+#
+# The client functions use only the standard library, so the driver
+# script can send a request without importing the cxxtest package.
+#
+
+from __future__ import division
+
+import os
+import sys
+import socket
+import signal
+import json
+import traceback
+from StringIO import StringIO
+
+#
+# The environment variables that are sent with a request
+#
+environment = ['HOME', 'XDG_CACHE_HOME']
+
+class Capture(StringIO):
+    '''A stdout/stderr replacement that survives being closed'''
+
+    def close(self):
+        pass
+
+def stop( signum, frame ):
+    '''Shut down the server when it is terminated'''
+    raise KeyboardInterrupt()
+
+def serve( socketName, handler ):
+    '''Run handler(args) for each request on socketName until terminated'''
+    from cxxtest_misc import abort
+    if not hasattr(socket, 'AF_UNIX'):
+        abort( '--serve requires support for Unix domain sockets' )
+    if os.path.exists( socketName ):
+        if isServing( socketName ):
+            abort( 'A cxxtestgen server is already listening on %s' % socketName )
+        os.remove( socketName )
+    server = socket.socket( socket.AF_UNIX, socket.SOCK_STREAM )
+    # Only the owner may connect, from the moment the socket exists
+    umask = os.umask( 0o077 )
+    try:
+        server.bind( socketName )
+    finally:
+        os.umask( umask )
+    server.listen( 16 )
+    signal.signal( signal.SIGTERM, stop )
+    forking = hasattr(os, 'fork')
+    if forking:
+        # The processes that handle requests are reaped automatically
+        signal.signal( signal.SIGCHLD, signal.SIG_IGN )
+    try:
+        try:
+            while 1:
+                (conn, address) = server.accept()
+                if not forking:
+                    respond( conn, handler )
+                    continue
+                if os.fork():
+                    conn.close()
+                    continue
+                try:
+                    server.close()
+                    signal.signal( signal.SIGTERM, signal.SIG_DFL )
+                    signal.signal( signal.SIGCHLD, signal.SIG_DFL )
+                    respond( conn, handler )
+                finally:
+                    os._exit( 0 )
+        except KeyboardInterrupt:
+            pass
+    finally:
+        server.close()
+        os.remove( socketName )
+
+def respond( conn, handler ):
+    '''Read one request from conn and send the response'''
+    try:
+        try:
+            message = receive( conn )
+            if message:
+                response = handleRequest( json.loads( message ), handler )
+                conn.sendall( json.dumps( response ).encode('utf-8') )
+        except (ValueError, socket.error):
+            # A malformed request or a client that went away
+            pass
+    finally:
+        conn.close()
+
+def handleRequest( request, handler ):
+    '''Run one request with its working directory and captured output'''
+    stdout = Capture()
+    stderr = Capture()
+    cwd = os.getcwd()
+    env = dict( [(name, os.environ.get( name )) for name in environment] )
+    (oldStdout, oldStderr) = (sys.stdout, sys.stderr)
+    (sys.stdout, sys.stderr) = (stdout, stderr)
+    status = 0
+    try:
+        try:
+            setEnvironment( request.get( 'env', {} ) )
+            os.chdir( request['cwd'] )
+            handler( request['args'] )
+        except SystemExit, err:
+            status = err.code
+            if status is None:
+                status = 0
+            elif not isinstance(status, int):
+                stderr.write( '%s\n' % status )
+                status = 1
+        except Exception:
+            traceback.print_exc()
+            status = 1
+    finally:
+        (sys.stdout, sys.stderr) = (oldStdout, oldStderr)
+        os.chdir( cwd )
+        setEnvironment( env )
+    return { 'status' : status,
+             'stdout' : stdout.getvalue(),
+             'stderr' : stderr.getvalue() }
+
+def setEnvironment( env ):
+    '''Set the variables in env, removing those whose value is None'''
+    for name in environment:
+        value = env.get( name )
+        if value is None:
+            os.environ.pop( name, None )
+        else:
+            os.environ[name] = value
+
+def request( socketName, args ):
+    '''Run cxxtestgen with args on the server listening on socketName.
+    Returns the exit status, or None if no server is listening or the
+    server failed to respond, in which case the caller runs the command
+    itself.'''
+    try:
+        conn = connect( socketName )
+    except socket.error:
+        return None
+    try:
+        try:
+            message = { 'cwd' : os.getcwd(), 'args' : list(args),
+                        'env' : dict( [(name, os.environ.get( name )) for name in environment] ) }
+            conn.sendall( json.dumps( message ).encode('utf-8') )
+            conn.shutdown( socket.SHUT_WR )
+            response = json.loads( receive( conn ) )
+            (status, stdout, stderr) = (response['status'], response['stdout'], response['stderr'])
+        except (ValueError, KeyError, TypeError, socket.error):
+            # The process that handled the request died before it responded
+            return None
+    finally:
+        conn.close()
+    sys.stdout.write( stdout )
+    sys.stderr.write( stderr )
+    return status
+
+def isServing( socketName ):
+    '''Check whether a server is listening on socketName'''
+    try:
+        connect( socketName ).close()
+    except socket.error:
+        return False
+    return True
+
+def connect( socketName ):
+    '''Open a connection to the server on socketName'''
+    if not hasattr(socket, 'AF_UNIX'):
+        raise socket.error( 'Unix domain sockets are not supported' )
+    conn = socket.socket( socket.AF_UNIX, socket.SOCK_STREAM )
+    try:
+        conn.connect( socketName )
+    except socket.error:
+        conn.close()
+        raise
+    return conn
+
+def receive( conn ):
+    '''Read a message until the sender closes its end of the connection'''
+    chunks = []
+    while 1:
+        chunk = conn.recv( 65536 )
+        if not chunk:
+            break
+        chunks.append( chunk )
+    return bytes().join( chunks ).decode('utf-8')
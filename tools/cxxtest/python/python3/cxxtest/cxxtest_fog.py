@@ -19,71 +19,58 @@ import re
 #from os.path import abspath, dirname
 #sys.path.insert(0, dirname(dirname(abspath(__file__))))
 #sys.path.insert(0, dirname(dirname(abspath(__file__)))+"/cxx_parse")
-from .cxxtest_misc import abort
+from .cxxtest_misc import abort, parallelMap
+from .cxxtest_parser import readInputFile
 from . import cxx_parser
+from . import cxxtest_index
 import re
 
 def cstr( str ):
     '''Convert a string to its C representation'''
     return '"' + re.sub('\\\\', '\\\\\\\\', str ) + '"'
 
-def scanInputFiles(files, _options):
+parsers={}
+
+def getParser(_options):
+    '''The C++ parser, which is built once and reused for every file'''
+    return buildParser(bool(_options.skipBodies))
+
+def buildParser(skipBodies):
+    '''Build the parser for skipBodies unless it is already built'''
+    if skipBodies not in parsers:
+        parsers[skipBodies] = cxx_parser.CppParser(optimize=1, skip_bodies=skipBodies)
+    return parsers[skipBodies]
+
+def buildParsers():
+    '''Build every parser, so that forked processes share them'''
+    for skipBodies in (False, True):
+        buildParser(skipBodies)
+
+def scanInputFiles(files, _options, classIndex=None):
     '''Scan all input files for test suites'''
     suites=[]
-    for file in files:
-        try:
-            print("Parsing file "+file, end=' ')
-            sys.stdout.flush()
-            parse_info = cxx_parser.parse_cpp(filename=file,optimize=1)
-        except IOError as err:
-            print(" error.")
-            print(str(err))
-            continue
-        print("done.") 
-        sys.stdout.flush()
-        #
-        # WEH: see if it really makes sense to use parse information to
-        # initialize this data.  I don't think so...
-        #
-        _options.haveStandardLibrary=1
-        if not parse_info.noExceptionLogic:
+    if _options.jobs > 1:
+        # Build the parser once, before the workers need it
+        getParser(_options)
+    jobs = [(file, _options, classIndex) for file in files]
+    results = parallelMap(scanInputFileJob, jobs, _options.jobs, replay=False)
+    for (file, ((options, fileSuites, fileIndex), out, err)) in zip(files, results):
+        rescan = False
+        if classIndex is not None and fileIndex is not classIndex:
+            classIndex.merge(fileIndex)
+            rescan = inheritsIndexedSuite(file, fileSuites, classIndex)
+        if rescan:
+            # The file may inherit from suites in earlier files.  The output
+            # of the first scan is dropped, as the rescan prints it again.
+            [options, fileSuites] = scanInputFile(file, _options, classIndex)
+        else:
+            sys.stdout.write(out)
+            sys.stderr.write(err)
+        if options.haveStandardLibrary and not _options.haveStandardLibrary:
+            _options.haveStandardLibrary=1
+        if options.haveExceptionHandling and not _options.haveExceptionHandling:
             _options.haveExceptionHandling=1
-        #
-        keys = list(parse_info.index.keys())
-        tpat = re.compile("[Tt][Ee][Ss][Tt]")
-        for key in keys:
-            if parse_info.index[key].scope_t == "class" and parse_info.is_baseclass(key,"CxxTest::TestSuite"):
-                name=parse_info.index[key].name
-                suite = { 'name'         : name,
-                        'file'         : file,
-                        'cfile'        : cstr(file),
-                        'line'         : str(parse_info.index[key].lineno),
-                        'generated'    : 0,
-                        'object'       : 'suite_%s' % name,
-                        'dobject'      : 'suiteDescription_%s' % name,
-                        'tlist'        : 'Tests_%s' % name,
-                        'tests'        : [],
-                        'lines'        : [] }
-                for fn in parse_info.get_functions(key,quiet=True):
-                    tname = fn[0]
-                    lineno = str(fn[1])
-                    if tname.startswith('createSuite'):
-                        # Indicate that we're using a dynamically generated test suite
-                        suite['create'] = str(lineno) # (unknown line)
-                    if tname.startswith('destroySuite'):
-                        # Indicate that we're using a dynamically generated test suite
-                        suite['destroy'] = str(lineno) # (unknown line)
-                    if not tpat.match(tname):
-                        # Skip non-test methods
-                        continue
-                    test = { 'name'   : tname,
-                        'suite'  : suite,
-                        'class'  : 'TestDescription_suite_%s_%s' % (suite['name'], tname),
-                        'object' : 'testDescription_suite_%s_%s' % (suite['name'], tname),
-                        'line'   : lineno,
-                        }
-                    suite['tests'].append(test)
-                suites.append(suite)
+        suites.extend(fileSuites)
 
     if not _options.root:
         ntests = 0
@@ -94,3 +81,253 @@ def scanInputFiles(files, _options):
     #
     return [_options, suites]
 
+def scanInputFileJob(job):
+    '''Scan one input file for test suites, for parallelMap()'''
+    (file, _options, classIndex) = job
+    return scanInputFile(file, _options, classIndex) + [classIndex]
+
+def indexInputFile(file, _options, classIndex):
+    '''Scan a file only to record its classes in the class index'''
+    scanInputFile(file, _options, classIndex)
+
+def scanInputFile(file, _options, classIndex=None):
+    '''Scan a single input file for test suites'''
+    suites=[]
+    try:
+        print("Parsing file "+file, end=' ')
+        sys.stdout.flush()
+        data = readInputFile(file)
+        if _options.parseSuitesOnly:
+            parse_info = parseSuites(data, _options, classIndex)
+        else:
+            parse_info = getParser(_options).parse(data=data)
+    except IOError as err:
+        print(" error.")
+        print(str(err))
+        return [_options, suites]
+    print("done.") 
+    sys.stdout.flush()
+    #
+    # WEH: see if it really makes sense to use parse information to
+    # initialize this data.  I don't think so...
+    #
+    _options.haveStandardLibrary=1
+    if not parse_info.noExceptionLogic and not _options.noExceptionHandling:
+        _options.haveExceptionHandling=1
+    #
+    keys = list(parse_info.index.keys())
+    tpat = re.compile("[Tt][Ee][Ss][Tt]|[Bb][Ee][Nn][Cc][Hh]")
+    for key in keys:
+        functions = suiteFunctions(parse_info, key, classIndex)
+        if functions is not None:
+            name=parse_info.index[key].name
+            suite = { 'name'         : name,
+                    'file'         : file,
+                    'cfile'        : cstr(file),
+                    'line'         : str(parse_info.index[key].lineno),
+                    'generated'    : 0,
+                    'object'       : 'suite_%s' % name,
+                    'dobject'      : 'suiteDescription_%s' % name,
+                    'tlist'        : 'Tests_%s' % name,
+                    'tests'        : [],
+                    'lines'        : [] }
+            for fn in functions:
+                tname = fn[0]
+                lineno = str(fn[1])
+                if tname.startswith('createSuite'):
+                    # Indicate that we're using a dynamically generated test suite
+                    suite['create'] = str(lineno) # (unknown line)
+                if tname.startswith('destroySuite'):
+                    # Indicate that we're using a dynamically generated test suite
+                    suite['destroy'] = str(lineno) # (unknown line)
+                if not tpat.match(tname):
+                    # Skip non-test methods
+                    continue
+                test = { 'name'   : tname,
+                    'suite'  : suite,
+                    'class'  : 'TestDescription_suite_%s_%s' % (suite['name'], tname),
+                    'object' : 'testDescription_suite_%s_%s' % (suite['name'], tname),
+                    'line'   : lineno,
+                    }
+                suite['tests'].append(test)
+            suites.append(suite)
+    if classIndex is not None:
+        classIndex.update(file, indexClasses(parse_info))
+    return [_options, suites]
+
+def suiteFunctions(parse_info, key, classIndex):
+    '''The functions of a test suite class, including the tests it inherits
+    from suites in the class index, or None if key is not a test suite'''
+    scope = parse_info.index[key]
+    if scope.scope_t != "class":
+        return None
+    functions = parse_info.get_functions(key,quiet=True)
+    if parse_info.is_baseclass(key,"CxxTest::TestSuite"):
+        return functions
+    if classIndex is not None:
+        for base in sorted(parse_info.get_hierarchy()[key].bases):
+            tests = classIndex.suiteTests(base)
+            if tests is not None:
+                names = set([fn[0] for fn in functions])
+                return functions + [fn for fn in tests if fn[0] not in names]
+    return None
+
+def inheritsIndexedSuite(file, fileSuites, classIndex):
+    '''Check whether a file that was scanned with a copy of the class index
+    has a class that derives from a suite of the index, but is no suite'''
+    names = set([suite['name'] for suite in fileSuites])
+    classes = classIndex.headers.get(cxxtest_index.headerKey(file), {}).get('classes', {})
+    for name in classes:
+        if name.split('::')[-1] not in names:
+            for base in classes[name]['bases']:
+                if classIndex.suiteTests(base) is not None:
+                    return True
+    return False
+
+def indexClasses(parse_info):
+    '''The classes of a parsed file, as they are recorded in the class index'''
+    tpat = re.compile("[Tt][Ee][Ss][Tt]|[Bb][Ee][Nn][Cc][Hh]")
+    classes = {}
+    for key in parse_info.index:
+        scope = parse_info.index[key]
+        if scope.scope_t == "class" and scope.base_classes:
+            tests = [fn for fn in scope.function if tpat.match(fn[0])]
+            classes[key[2:]] = { 'bases' : list(scope.base_classes), 'tests' : tests }
+    return classes
+
+#
+# Parsing only the classes that may be test suites.  A quick scan of the
+# text finds the extent of each class and namespace, and the classes that
+# derive from a TestSuite, directly or through other classes in the same
+# file, are parsed together with the classes they derive from.  Everything
+# else is replaced by blank lines, so line numbers do not change.
+#
+region_re = re.compile( r"""[{};]|"([^"\\]|\\.)*"|'([^'\\]|\\.)*'|/\*.*?\*/|//[^\n]*|\#[^\n]*|\b(try|catch|throw)\b""", re.S )
+comment_re = re.compile( r"/\*.*?\*/|//[^\n]*|\#[^\n]*", re.S )
+namespace_re = re.compile( r'\b(namespace\b[\w\s:]*|extern\s*"C(\+\+)?"\s*)$' )
+classhead_re = re.compile( r'\b(class|struct)\s+(\w+\s+)*?(\w+)\s*(final\s*)?(:(?P<bases>[^{;]*))?$' )
+template_re = re.compile( r'\btemplate\b' )
+word_re = re.compile( r'\w+' )
+
+def parseSuites(data, _options, classIndex=None):
+    '''Parse the classes in data that may be test suites'''
+    suiteNames = set()
+    if classIndex is not None:
+        suiteNames = set([name.split('::')[-1] for name in classIndex.classes])
+    regions = suiteRegions(data, suiteNames)
+    if regions is not None:
+        (text, exceptions) = regions
+        try:
+            parse_info = getParser(_options).parse(data=text)
+            parse_info.noExceptionLogic = not exceptions
+            return parse_info
+        except IOError:
+            # The classes cannot be parsed on their own
+            pass
+    return getParser(_options).parse(data=data)
+
+def suiteRegions(data, suiteNames=set()):
+    '''Blank out everything in data but the test suites and their base
+    classes.  Classes that derive from one of suiteNames are also taken
+    to be test suites.  Returns the resulting text and whether data uses exception
+    handling, or None if the structure of data is not understood.'''
+    classes = []
+    kept = []
+    stack = []
+    headStart = 0
+    closed = None
+    exceptions = False
+    for m in region_re.finditer(data):
+        token = m.group()
+        if token == ';':
+            if closed is not None and closed['kind'] == 'class':
+                closed['end'] = m.end()
+            closed = None
+            headStart = m.end()
+        elif token == '{':
+            entry = classifyBlock(data, headStart, m.end(), stack)
+            if entry['kind'] == 'class':
+                classes.append(entry)
+            elif entry['kind'] == 'namespace':
+                kept.append((entry['start'], entry['end']))
+            stack.append(entry)
+            closed = None
+            headStart = m.end()
+        elif token == '}':
+            if not stack:
+                return None
+            entry = stack.pop()
+            entry['end'] = m.end()
+            if entry['kind'] == 'namespace':
+                kept.append((m.start(), m.end()))
+            closed = entry
+            headStart = m.end()
+        elif m.group(3):
+            exceptions = True
+    if stack:
+        return None
+    for entry in suiteClasses(classes, suiteNames):
+        if entry['nested']:
+            return None
+        kept.append((entry['start'], entry['end']))
+    kept.sort()
+    text = []
+    end = 0
+    for (start, stop) in kept:
+        text.append( '\n' * data.count('\n', end, start) )
+        text.append( data[start:stop] )
+        end = stop
+    text.append( '\n' * data.count('\n', end) )
+    return (''.join(text), exceptions)
+
+def classifyBlock(data, headStart, brace, stack):
+    '''Describe the block that starts with the brace ending at brace'''
+    head = comment_re.sub(lambda m: re.sub('[^\n]', ' ', m.group()), data[headStart:brace-1])
+    nested = False
+    for entry in stack:
+        if entry['kind'] != 'namespace':
+            nested = True
+    m = namespace_re.search(head.rstrip())
+    if m and not nested:
+        return { 'kind' : 'namespace', 'start' : headStart + m.start(), 'end' : brace }
+    m = classhead_re.search(head.rstrip())
+    if m:
+        start = m.start()
+        t = template_re.search(head, 0, start)
+        if t:
+            start = t.start()
+        bases = m.group('bases') or ''
+        return { 'kind'   : 'class',
+                 'name'   : m.group(3),
+                 'bases'  : set(word_re.findall(bases)),
+                 'suite'  : 'TestSuite' in word_re.findall(bases),
+                 'start'  : headStart + start,
+                 'end'    : None,
+                 'nested' : nested }
+    return { 'kind' : 'other' }
+
+def suiteClasses(classes, suiteNames):
+    '''The classes that may be test suites, and the classes they derive from'''
+    suites = [entry for entry in classes if entry['suite'] or entry['bases'] & suiteNames]
+    names = set([entry['name'] for entry in suites])
+    found = True
+    while found:
+        found = False
+        for entry in classes:
+            if entry['name'] not in names and entry['bases'] & names:
+                suites.append(entry)
+                names.add(entry['name'])
+                found = True
+    bases = set()
+    for entry in suites:
+        bases |= entry['bases']
+    found = True
+    while found:
+        found = False
+        for entry in classes:
+            if entry['name'] in bases and entry['name'] not in names:
+                suites.append(entry)
+                names.add(entry['name'])
+                bases |= entry['bases']
+                found = True
+    return suites
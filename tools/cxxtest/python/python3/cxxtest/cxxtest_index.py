@@ -0,0 +1,197 @@
+#-------------------------------------------------------------------------
+# CxxTest: A lightweight C++ unit testing library.
+# Copyright (c) 2008 Sandia Corporation.
+# This software is distributed under the LGPL License v2.1
+# For more information, see the COPYING file in the top CxxTest directory.
+# Under the terms of Contract DE-AC04-94AL85000 with Sandia Corporation,
+# the U.S. Government retains certain rights in this software.
+#-------------------------------------------------------------------------
+
+#
+# Persistent index of the classes in all headers that were scanned.  For
+# every header the index keeps a hash of its contents and, for each class
+# that derives from another class, the names of its base classes and its
+# own test methods.  A suite can then inherit the tests of a suite that
+# is defined in a header that is not scanned in the current run.  A
+# header is scanned again when its contents no longer match the hash.
+#
+
+
+
+import os
+import copy
+import json
+import hashlib
+from .cxxtest_parser import testsuite_re
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+indexVersion = 1
+
+def fileHash( fileName ):
+    '''The hash of the contents of a file, or None if it cannot be read'''
+    try:
+        INPUT = open( fileName, 'rb' )
+    except IOError:
+        return None
+    digest = hashlib.sha1( INPUT.read() ).hexdigest()
+    INPUT.close()
+    return digest
+
+def headerKey( fileName ):
+    '''The name under which a header is recorded in the index'''
+    return os.path.abspath( fileName )
+
+def indexedFiles( fileName ):
+    '''The headers recorded in the index file fileName'''
+    return sorted( loadIndex( fileName ).keys() )
+
+def loadIndex( fileName ):
+    '''Read the headers recorded in the index file fileName'''
+    try:
+        INPUT = open( fileName, 'r' )
+        try:
+            data = json.load( INPUT )
+        finally:
+            INPUT.close()
+    except (IOError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get( 'version' ) != indexVersion:
+        return {}
+    return data.get( 'headers', {} )
+
+class ClassIndex(object):
+    '''The classes of every header scanned with the index file fileName.
+    scan(fileName, options, index) is called to scan a header again when
+    it has changed since it was recorded.'''
+
+    def __init__(self, fileName, scan, options):
+        self.fileName = fileName
+        self.scan = scan
+        self.options = options
+        self.headers = loadIndex( fileName )
+        self.updated = set()
+        self.checked = set()
+        self.used = set()
+        self.classes = {}
+        for key in self.headers:
+            self.addClasses( key )
+
+    def addClasses(self, key):
+        '''Make the classes of a header available for lookup'''
+        for name in self.headers[key]['classes']:
+            self.classes[name] = key
+
+    def removeClasses(self, key):
+        '''Forget the classes of a header'''
+        for name in self.headers[key]['classes']:
+            if self.classes.get( name ) == key:
+                del self.classes[name]
+
+    def update(self, fileName, classes):
+        '''Record the classes found in a header.  classes maps each class
+        name to a dictionary with the names of its 'bases' and a list of
+        its own 'tests', each test being a (name, line) pair.'''
+        key = headerKey( fileName )
+        if key in self.headers:
+            self.removeClasses( key )
+        self.headers[key] = { 'hash' : fileHash( fileName ), 'classes' : classes }
+        self.addClasses( key )
+        self.updated.add( key )
+        self.checked.add( key )
+
+    def remove(self, key):
+        '''Forget a header that no longer exists'''
+        self.removeClasses( key )
+        del self.headers[key]
+        self.updated.add( key )
+
+    def merge(self, other):
+        '''Add the headers that were recorded in a copy of this index'''
+        if other is self:
+            return
+        for key in other.updated:
+            if key in self.headers:
+                self.removeClasses( key )
+                del self.headers[key]
+            if key in other.headers:
+                self.headers[key] = other.headers[key]
+                self.addClasses( key )
+            self.updated.add( key )
+            self.checked.add( key )
+        self.used |= other.used
+
+    def findClass(self, name):
+        '''The index entry of a class, or None if it is not known'''
+        if name.startswith( '::' ):
+            name = name[2:]
+        key = self.classes.get( name )
+        if key is None:
+            return None
+        if key not in self.checked:
+            self.checked.add( key )
+            if fileHash( key ) != self.headers[key]['hash']:
+                self.remove( key )
+                if os.path.exists( key ):
+                    self.scan( key, copy.copy( self.options ), self )
+                return self.findClass( name )
+        self.used.add( key )
+        return self.headers[key]['classes'][name]
+
+    def suiteTests(self, name, active=()):
+        '''The tests of the test suite class name, including the tests it
+        inherits, as a list of (name, line) pairs.  Returns None if the
+        class is not known to be a test suite.'''
+        entry = self.findClass( name )
+        if entry is None or name in active:
+            return None
+        inherited = None
+        for base in entry['bases']:
+            if testsuite_re.match( base ):
+                inherited = []
+                break
+        if inherited is None:
+            for base in entry['bases']:
+                inherited = self.suiteTests( base, active + (name,) )
+                if inherited is not None:
+                    break
+        if inherited is None:
+            return None
+        return inherited + [tuple(test) for test in entry['tests']]
+
+    def save(self):
+        '''Write the index file if any header was recorded.  The headers
+        that other builds recorded in the meantime are kept.'''
+        if not self.updated:
+            return
+        dirName = os.path.dirname( self.fileName )
+        if dirName and not os.path.isdir( dirName ):
+            os.makedirs( dirName )
+        LOCK = open( self.fileName + '.lock', 'a' )
+        try:
+            if fcntl is not None:
+                fcntl.flock( LOCK.fileno(), fcntl.LOCK_EX )
+            headers = loadIndex( self.fileName )
+            for key in self.updated:
+                if key in self.headers:
+                    headers[key] = self.headers[key]
+                elif key in headers:
+                    del headers[key]
+            # Write under a temporary name so concurrent builds never read a
+            # partially written index
+            tmpName = '%s.%d.tmp' % (self.fileName, os.getpid())
+            OUTPUT = open( tmpName, 'w' )
+            json.dump( { 'version' : indexVersion, 'headers' : headers }, OUTPUT, sort_keys=True )
+            OUTPUT.close()
+            os.rename( tmpName, self.fileName )
+        finally:
+            # Closing the file releases the lock
+            LOCK.close()
+        self.headers = headers
+        self.classes = {}
+        for key in self.headers:
+            self.addClasses( key )
+        self.updated = set()
@@ -0,0 +1,82 @@
+#-------------------------------------------------------------------------
+# CxxTest: A lightweight C++ unit testing library.
+# Copyright (c) 2008 Sandia Corporation.
+# This software is distributed under the LGPL License v2.1
+# For more information, see the COPYING file in the top CxxTest directory.
+# Under the terms of Contract DE-AC04-94AL85000 with Sandia Corporation,
+# the U.S. Government retains certain rights in this software.
+#-------------------------------------------------------------------------
+
+#
+# Test times of earlier runs, for --timings.  A timing file is either the
+# history that a test runner writes with its --save-timings option (one
+# line per test with the suite name, the test name and the time in
+# seconds) or an XML file written by the XUnitPrinter.  The times of the tests that
+# are found are written into the runner, which balances its shards and
+# worker processes with them.
+#
+
+
+
+import re
+from .cxxtest_misc import abort
+
+testcase_re = re.compile( r'<testcase\s([^>]*)>' )
+attribute_re = re.compile( r'(\w+)\s*=\s*"([^"]*)"' )
+
+def className( suiteName ):
+    '''The name of a suite as the XUnitPrinter writes it'''
+    return suiteName.replace( '::', '.' ).lstrip( '.' )
+
+def readTimings( fileNames ):
+    '''Read the times in the timing files.  Return a dictionary from
+    (class name, test name) to seconds; later files take precedence.'''
+    times = {}
+    for fileName in fileNames:
+        try:
+            INPUT = open( fileName, 'r' )
+            try:
+                text = INPUT.read()
+            finally:
+                INPUT.close()
+        except IOError:
+            abort( "Cannot read the timings file '%s'" % fileName )
+        if text.lstrip().startswith( '<' ):
+            readXUnit( text, times )
+        else:
+            readHistory( fileName, text, times )
+    return times
+
+def readHistory( fileName, text, times ):
+    '''Add the times of a runner's timing history'''
+    for line in text.splitlines():
+        fields = line.split()
+        if not fields:
+            continue
+        try:
+            if len(fields) != 3:
+                raise ValueError
+            times[(className( fields[0] ), fields[1])] = float( fields[2] )
+        except ValueError:
+            abort( "Bad line in the timings file '%s': %s" % (fileName, line) )
+
+def readXUnit( text, times ):
+    '''Add the times of the test cases of an XUnit XML file'''
+    for match in testcase_re.finditer( text ):
+        attributes = dict( attribute_re.findall( match.group(1) ) )
+        try:
+            key = (attributes['classname'], attributes['name'])
+            times[key] = float( attributes['time'] )
+        except (KeyError, ValueError):
+            pass
+
+def suiteTimings( suites, times ):
+    '''The (suite name, test name, seconds) of the tests of suites that
+    have a time'''
+    entries = []
+    for suite in suites:
+        for test in suite['tests']:
+            key = (className( suite['name'] ), test['name'])
+            if key in times:
+                entries.append( (suite['name'], test['name'], times[key]) )
+    return entries
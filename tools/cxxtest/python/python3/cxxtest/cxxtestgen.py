@@ -13,15 +13,21 @@
 # the above import important for forward-compatibility with python3,
 # which is already the default in archlinux!
 
-__all__ = ['main']
+__all__ = ['main', 'generate', 'GenerationError']
 
 from . import __release__
 import os
 import sys
 import re
 import glob
+import json
 from optparse import OptionParser
+from io import StringIO
 from . import cxxtest_parser
+from . import cxxtest_cache
+from . import cxxtest_index
+from . import cxxtest_timings
+from . import cxxtest_server
 
 try:
     from . import cxxtest_fog
@@ -29,40 +35,71 @@ try:
 except ImportError:
     imported_fog=False
 
-from .cxxtest_misc import abort
-
-options = []
-suites = []
-
-wrotePreamble = 0
-wroteWorld = 0
-lastIncluded = ''
+from .cxxtest_misc import abort, reportError, GenerationError
 
 def main(args=sys.argv):
     '''The main program'''
-    #
-    # Reset global state
-    #
-    global wrotePreamble
-    wrotePreamble=0
-    global wroteWorld
-    wroteWorld=0
-    global lastIncluded
-    lastIncluded = ''
-
-    global suites
-    global options
-    files = parseCommandline(args)
-    if imported_fog and options.fog:
-        [options,suites] = cxxtest_fog.scanInputFiles( files, options )
-    else:
-        [options,suites] = cxxtest_parser.scanInputFiles( files, options )
-    writeOutput()
+    try:
+        (options, files) = parseCommandline(args)
+        if options.serveSocket:
+            if imported_fog:
+                cxxtest_fog.buildParsers()
+            cxxtest_server.serve( options.serveSocket, runCommand )
+            return
+        if options.serverSocket:
+            status = cxxtest_server.request( options.serverSocket, args )
+            if status is not None:
+                sys.exit( status )
+        Generator(options).run(files)
+    except GenerationError as err:
+        reportError( err )
+
+def runCommand(args):
+    '''Generate a runner for a request sent to a cxxtestgen server'''
+    try:
+        (options, files) = parseCommandline(args)
+        Generator(options).run(files)
+    except GenerationError as err:
+        reportError( err )
+
+def generate(files, **kwds):
+    '''Return the source of a test runner for the given header files.
+
+    Options are given as keyword arguments that are named like the
+    attributes set by the command line options, e.g.
+    generate(['MyTest.h'], runner='ErrorPrinter', haveStandardLibrary=True).
+    Problems such as a missing header or conflicting options raise
+    GenerationError.  No output files are written, although the class
+    index is updated when classIndex is given, and no module state is
+    used, so separate calls may generate separate runners in the same
+    process.'''
+    parser = createParser()
+    (options, args) = parser.parse_args(args=[])
+    for name in kwds:
+        if not hasattr(options, name):
+            raise TypeError( "generate() got an unexpected keyword argument '%s'" % name )
+        setattr( options, name, kwds[name] )
+    options.outputFileName = None
+    options.cacheDir = None
+    options.shards = 0
+    files = checkOptions(options, [''] + list(files))
+    if len(files) == 0 and not options.root:
+        abort( 'No input files found' )
+    return Generator(options).generate(files)
 
 def parseCommandline(args):
     '''Analyze command line arguments'''
-    global imported_fog
-    global options
+    parser = createParser()
+    # Accept the spelling used by compilers for --MD
+    args = [(arg == '-MD' and '--MD' or arg) for arg in args]
+    (options, args) = parser.parse_args(args=args)
+    files = checkOptions(options, args)
+    if len(files) == 0 and not options.root and not options.serveSocket:
+        parser.error("No input files found")
+    return (options, files)
+
+def createParser():
+    '''Create the parser for command line arguments'''
     parser = OptionParser("%prog [options] [<filename> ...]")
     parser.add_option("--version",
                       action="store_true", dest="version", default=False,
@@ -78,6 +115,15 @@ def parseCommandline(args):
     parser.add_option("", "--abort-on-fail",
                       action="store_true", dest="abortOnFail", default=False,
                       help="Abort tests on failed asserts (like xUnit).")
+    parser.add_option("", "--test-timeout",
+                      dest="testTimeout", type="int", default=0, metavar="SECONDS",
+                      help="Fail a test that runs longer than SECONDS, and go on with the next test.  (default: no limit)")
+    parser.add_option("", "--suite-timeout",
+                      dest="suiteTimeout", type="int", default=0, metavar="SECONDS",
+                      help="Fail a suite that runs longer than SECONDS, and go on with the next suite.  (default: no limit)")
+    parser.add_option("", "--isolate",
+                      dest="isolate", default=None, metavar="MODE", choices=["none", "suites", "tests"],
+                      help="Run each suite (MODE=suites) or each test (MODE=tests) in a process of its own, so that a crash fails only that suite or test.  (default: none)")
     parser.add_option("", "--main",
                       action="store", dest="main", default="main",
                       help="Specify an alternative name for the main() function.")
@@ -110,6 +156,9 @@ def parseCommandline(args):
     parser.add_option("", "--no-eh",
                       action="store_true", dest="noExceptionHandling", default=False,
                       help="Do not use exception handling (even if found in tests).")
+    parser.add_option("", "--have-fork",
+                      action="store_true", dest="haveFork", default=False,
+                      help="Use fork() to run tests in worker processes, which the --jobs, --isolate and timeout options of the test runner require.  (implied by --isolate, --test-timeout and --suite-timeout)")
     parser.add_option("", "--longlong",
                       dest="longlong", default=None, metavar="TYPE",
                       help="Use TYPE as for long long integers.  (default: not supported)")
@@ -125,6 +174,42 @@ def parseCommandline(args):
     parser.add_option("", "--part",
                       action="store_true", dest="part", default=False,
                       help="Write the tester classes for a test runner.")
+    parser.add_option("", "--shards",
+                      type="int", dest="shards", default=0, metavar="N",
+                      help="Write the main() function to the output file and divide the tester classes between N part files that can be compiled in parallel.")
+    parser.add_option("", "--timings",
+                      action="append", dest="timingsFiles", default=[], metavar="FILE",
+                      help="Write the test times in FILE, a timing history written by a test runner or an XUnit XML file, into the runner, which uses them to balance its shards and worker processes.  May be given more than once.")
+    parser.add_option("", "--depfile",
+                      dest="depFileName", default=None, metavar="FILE",
+                      help="Write a Make dependency file FILE that lists the files the test runner is generated from.")
+    parser.add_option("", "--MD",
+                      action="store_true", dest="writeDepFile", default=False,
+                      help="Write a Make dependency file named like the output file, with the extension .d (also -MD).")
+    parser.add_option("", "--manifest",
+                      dest="manifestFileName", default=None, metavar="FILE",
+                      help="Write the suites and tests found in the input files to FILE, in JSON format.")
+    parser.add_option("", "--manifest-only",
+                      action="store_true", dest="manifestOnly", default=False,
+                      help="Write only the manifest of suites and tests, to the --manifest file or to the standard output, and no test runner.")
+    parser.add_option("-j", "--jobs",
+                      type="int", dest="jobs", default=1, metavar="N",
+                      help="Scan the input files using N processes.")
+    parser.add_option("", "--cache-dir",
+                      dest="cacheDir", default=None, metavar="DIR",
+                      help="Cache generated runners in directory DIR, and do not rewrite an output file that is already up to date.")
+    parser.add_option("", "--cache-size",
+                      type="float", dest="cacheSize", default=100, metavar="MB",
+                      help="Remove the least recently used runners from the --cache-dir directory when it holds more than MB megabytes, or never if MB is 0.  (default: 100)")
+    parser.add_option("", "--class-index",
+                      dest="classIndex", default=None, metavar="FILE",
+                      help="Record the classes of all scanned headers in the index FILE, so test suites may derive from suites in headers that are not scanned.")
+    parser.add_option("", "--serve",
+                      dest="serveSocket", default=None, metavar="SOCKET",
+                      help="Run as a server that generates test runners for requests received on the Unix domain socket SOCKET.")
+    parser.add_option("", "--server",
+                      dest="serverSocket", default=None, metavar="SOCKET",
+                      help="Send this command to the server listening on SOCKET.  The command is executed locally if no server is running.")
     #parser.add_option("", "--factor",
                       #action="store_true", dest="factor", default=False,
                       #help="Declare the _CXXTEST_FACTOR macro.  (deprecated)")
@@ -139,7 +224,24 @@ def parseCommandline(args):
                         help=fog_help
                         )
 
-    (options, args) = parser.parse_args(args=args)
+    parser.add_option("", "--skip-bodies",
+                        action="store_true",
+                        dest="skipBodies",
+                        default=False,
+                        help="Skip the bodies of function definitions when using the FOG parser.  This is faster, but test discovery may fail for unusual code."
+                        )
+
+    parser.add_option("", "--parse-suites-only",
+                        action="store_true",
+                        dest="parseSuitesOnly",
+                        default=False,
+                        help="Use the FOG parser only on the classes that may be test suites, and the classes they derive from."
+                        )
+
+    return parser
+
+def checkOptions(options, args):
+    '''Complete and verify the options, and return the input files'''
     if not options.header_filename is None:
         if not os.path.exists(options.header_filename):
             abort( "ERROR: the file '%s' does not exist!" % options.header_filename )
@@ -178,14 +280,47 @@ def parseCommandline(args):
     if options.noStaticInit and (options.root or options.part):
         abort( '--no-static-init cannot be used with --root/--part' )
 
+    if options.shards:
+        if options.root or options.part:
+            abort( '--shards cannot be used with --root/--part' )
+        if options.noStaticInit:
+            abort( '--no-static-init cannot be used with --shards' )
+        if options.outputFileName is None:
+            abort( '--shards requires an output file name (-o)' )
+
+    if options.manifestOnly:
+        if options.root or options.part or options.shards:
+            abort( '--manifest-only cannot be used with --root/--part/--shards' )
+        options.outputFileName = None
+
+    if options.writeDepFile and not options.depFileName and depTargets( options ):
+        options.depFileName = os.path.splitext( depTargets( options )[0] )[0] + '.d'
+
+    if (options.writeDepFile or options.depFileName) and not depTargets( options ):
+        abort( '--depfile requires an output file name (-o)' )
+
+    if options.skipBodies and not options.fog:
+        abort( '--skip-bodies requires the FOG parser (--fog-parser)' )
+
+    if options.parseSuitesOnly and not options.fog:
+        abort( '--parse-suites-only requires the FOG parser (--fog-parser)' )
+
+    if options.jobs < 1:
+        abort( '--jobs must be at least 1' )
+
+    if options.testTimeout < 0 or options.suiteTimeout < 0:
+        abort( '--test-timeout and --suite-timeout cannot be negative' )
+
+    if options.cacheSize < 0:
+        abort( '--cache-size cannot be negative' )
+
+    if options.testTimeout or options.suiteTimeout or options.isolate in ('suites', 'tests'):
+        options.haveFork = True
+
     if options.gui and not options.runner:
         options.runner = 'StdioPrinter'
 
-    files = setFiles(args[1:])
-    if len(files) == 0 and not options.root:
-        sys.stderr.write(parser.error("No input files found"))
-
-    return files
+    return setFiles(args[1:])
 
 
 def printVersion():
@@ -211,144 +346,500 @@ def fixBackslashes( fileName ):
     '''Convert backslashes to slashes in file name'''
     return re.sub( r'\\', '/', fileName, 0 )
 
+include_re = re.compile( r"\s*\#\s*include\s+<cxxtest/" )
+preamble_re = re.compile( r"^\s*<CxxTest\s+preamble>\s*$" )
+world_re = re.compile( r"^\s*<CxxTest\s+world>\s*$" )
 
-def writeOutput():
-    '''Create output file'''
-    if options.templateFileName:
-        writeTemplateOutput()
-    else:
-        writeSimpleOutput()
-
-def writeSimpleOutput():
-    '''Create output not based on template'''
-    output = startOutputFile()
-    writePreamble( output )
-    if options.root or not options.part:
-        writeMain( output )
+class Generator(object):
+    '''Generates one test runner.  A generator owns all of the state that
+    is used while scanning the headers and writing the runner.'''
+
+    def __init__(self, options):
+        self.options = options
+        self.suites = []
+        self.cacheKey = None
+        self.captured = None
+        self.classIndex = None
+        self.timings = []
+        self.resetOutputState()
+
+    def run(self, files):
+        '''Scan files and write the runner to the output files'''
+        if self.options.manifestOnly:
+            self.scanInputFiles( files )
+            self.writeManifest()
+            self.writeDepFile( files )
+            return
+        if self.options.cacheDir:
+            self.cacheKey = cxxtest_cache.cacheKey( files, self.options )
+            # The manifest needs the suites, so the input files are scanned
+            if not self.options.manifestFileName and self.writeCachedOutput():
+                self.writeDepFile( files )
+                return
+        self.scanInputFiles( files )
+        self.writeOutput()
+        self.writeManifest()
+        self.writeDepFile( files )
+
+    def generate(self, files):
+        '''Scan files and return the source of the runner'''
+        self.scanInputFiles( files )
+        self.captured = {}
+        self.writeOutput()
+        return self.captured[self.options.outputFileName]
+
+    def scanInputFiles(self, files):
+        '''Find the test suites in files'''
+        if imported_fog and self.options.fog:
+            module = cxxtest_fog
+        else:
+            module = cxxtest_parser
+        if self.options.classIndex:
+            self.classIndex = cxxtest_index.ClassIndex( self.options.classIndex, module.indexInputFile, self.options )
+        [self.options,self.suites] = module.scanInputFiles( files, self.options, self.classIndex )
+        if self.classIndex is not None:
+            self.classIndex.save()
+
+    def writeDepFile( self, files ):
+        '''Write the Make rule for the output files, if requested'''
+        if not self.options.depFileName:
+            return
+        inputs = list( files )
+        if self.options.header_filename:
+            inputs.append( self.options.header_filename )
+        if self.options.templateFileName:
+            inputs.append( self.options.templateFileName )
+        for header in self.options.headers:
+            if os.path.exists( header ):
+                inputs.append( header )
+        inputs.extend( self.options.timingsFiles )
+        if self.classIndex is not None:
+            inputs.extend( sorted( self.classIndex.used ) )
+        elif self.options.classIndex:
+            # The runner was cached, so any indexed header may have been used
+            for fileName in cxxtest_index.indexedFiles( self.options.classIndex ):
+                if os.path.exists( fileName ):
+                    inputs.append( fileName )
+        targets = depTargets( self.options )
+        cxxtest_cache.writeIfChanged( self.options.depFileName, makeRule( targets, inputs ) )
+
+    def writeManifest( self ):
+        '''Write the manifest of suites and tests, if requested'''
+        if self.options.manifestFileName or self.options.manifestOnly:
+            text = json.dumps( manifest( self.suites, self.options ), indent=2, separators=(',', ': '), sort_keys=True ) + '\n'
+            if self.options.manifestFileName:
+                cxxtest_cache.writeIfChanged( self.options.manifestFileName, text )
+            else:
+                sys.stdout.write( text )
+
+    def writeCachedOutput( self ):
+        '''Write the cached runner for the current inputs, if there is one'''
+        outputs = self.outputFiles()
+        texts = [cxxtest_cache.lookup( self.options.cacheDir, key ) for (fileName, key) in outputs]
+        if None in texts:
+            return False
+        for i in range(len(outputs)):
+            self.publishOutput( outputs[i][0], texts[i] )
+        return True
+
+    def publishOutput( self, fileName, text ):
+        '''Write buffered output to the output file, if it has changed'''
+        if fileName is not None:
+            cxxtest_cache.writeIfChanged( fileName, text )
+        else:
+            sys.stdout.write( text )
+
+    def outputFiles( self ):
+        '''List the (file name, cache key) of every file that is written'''
+        outputs = [(self.options.outputFileName, self.cacheKey)]
+        for i in range(1, self.options.shards + 1):
+            outputs.append( (self.shardFileName( i ), self.shardCacheKey( i )) )
+        return outputs
+
+    def shardFileName( self, i ):
+        '''Name of the i-th part file written with --shards'''
+        return shardFileName( self.options, i )
+
+    def shardCacheKey( self, i ):
+        '''Cache key of the i-th part file written with --shards'''
+        if self.cacheKey is None:
+            return None
+        return '%s_part%d' % (self.cacheKey, i)
+
+    def writeOutput( self ):
+        '''Create output file'''
+        if self.options.timingsFiles:
+            times = cxxtest_timings.readTimings( self.options.timingsFiles )
+            self.timings = cxxtest_timings.suiteTimings( self.suites, times )
+        if self.options.shards:
+            self.writeShardedOutput()
+        else:
+            self.writeRunner( self.options.outputFileName, self.cacheKey )
 
-    if len(suites) > 0:
-        output.write("bool "+suites[0]['object']+"_init = false;\n")
+    def writeRunner( self, fileName, key ):
+        '''Create a single output file'''
+        if self.options.templateFileName:
+            self.writeTemplateOutput( fileName, key )
+        else:
+            self.writeSimpleOutput( fileName, key )
+
+    def writeShardedOutput( self ):
+        '''Create part files for the suites and a root file for main()'''
+        allSuites = self.suites
+        shards = splitSuites( allSuites, self.options.shards )
+        self.options.root = False
+        self.options.part = True
+        for i in range(len(shards)):
+            self.resetOutputState()
+            self.suites = shards[i]
+            self.writeSimpleOutput( self.shardFileName( i + 1 ), self.shardCacheKey( i + 1 ) )
+        self.resetOutputState()
+        self.suites = []
+        self.options.root = True
+        self.options.part = False
+        self.writeRunner( self.options.outputFileName, self.cacheKey )
+        self.suites = allSuites
+
+    def resetOutputState( self ):
+        '''Forget what was written to the previous output file'''
+        self.wrotePreamble = 0
+        self.wroteWorld = 0
+        self.lastIncluded = ''
+
+    def writeSimpleOutput( self, fileName, key ):
+        '''Create output not based on template'''
+        output = self.startOutputFile( fileName )
+        self.writePreamble( output )
+        if self.options.root or not self.options.part:
+            self.writeMain( output )
+
+        if len(self.suites) > 0:
+            output.write("bool "+self.suites[0]['object']+"_init = false;\n")
+
+        self.writeWorld( output )
+        self.finishOutputFile( output, fileName, key )
+
+    def writeTemplateOutput( self, fileName, key ):
+        '''Create output based on template file'''
+        template = open(self.options.templateFileName)
+        output = self.startOutputFile( fileName )
+        while 1:
+            line = template.readline()
+            if not line:
+                break;
+            if include_re.search( line ):
+                self.writePreamble( output )
+                output.write( line )
+            elif preamble_re.search( line ):
+                self.writePreamble( output )
+            elif world_re.search( line ):
+                if len(self.suites) > 0:
+                    output.write("bool "+self.suites[0]['object']+"_init = false;\n")
+                self.writeWorld( output )
+            else:
+                output.write( line )
+        template.close()
+        self.finishOutputFile( output, fileName, key )
+
+    def startOutputFile( self, fileName ):
+        '''Create output file and write header'''
+        if self.options.cacheDir or self.captured is not None:
+            output = StringIO()
+        elif fileName is not None:
+            output = open( fileName, 'w' )
+        else:
+            output = sys.stdout
+        output.write( "/* Generated file, do not edit */\n\n" )
+        return output
+
+    def finishOutputFile( self, output, fileName, key ):
+        '''Close the output file, saving it in the cache if one is used'''
+        if self.options.cacheDir or self.captured is not None:
+            text = output.getvalue()
+            if self.options.cacheDir:
+                cxxtest_cache.store( self.options.cacheDir, key, text, int( self.options.cacheSize * 1024 * 1024 ) )
+            if self.captured is not None:
+                self.captured[fileName] = text
+            else:
+                self.publishOutput( fileName, text )
+        output.close()
+
+    def writePreamble( self, output ):
+        '''Write the CxxTest header (#includes and #defines)'''
+        if self.wrotePreamble: return
+        output.write( "#ifndef CXXTEST_RUNNING\n" )
+        output.write( "#define CXXTEST_RUNNING\n" )
+        output.write( "#endif\n" )
+        output.write( "\n" )
+        if self.options.xunit_printer:
+            output.write( "#include <fstream>\n" )
+        if self.options.haveStandardLibrary:
+            output.write( "#define _CXXTEST_HAVE_STD\n" )
+        if self.options.haveExceptionHandling:
+            output.write( "#define _CXXTEST_HAVE_EH\n" )
+        if self.options.haveFork:
+            output.write( "#define _CXXTEST_HAVE_FORK\n" )
+        if self.options.abortOnFail:
+            output.write( "#define _CXXTEST_ABORT_TEST_ON_FAIL\n" )
+        if self.options.longlong:
+            output.write( "#define _CXXTEST_LONGLONG %s\n" % self.options.longlong )
+        if self.options.testTimeout:
+            output.write( "#define CXXTEST_TEST_TIMEOUT %d\n" % self.options.testTimeout )
+        if self.options.suiteTimeout:
+            output.write( "#define CXXTEST_SUITE_TIMEOUT %d\n" % self.options.suiteTimeout )
+        if self.options.isolate in ('suites', 'tests'):
+            output.write( "#define CXXTEST_ISOLATION CxxTest::ISOLATE_%s\n" % self.options.isolate.upper() )
+        #if self.options.factor:
+            #output.write( "#define _CXXTEST_FACTOR\n" )
+        for header in self.options.headers:
+            output.write( "#include \"%s\"\n" % header )
+        output.write( "#include <cxxtest/TestListener.h>\n" )
+        output.write( "#include <cxxtest/TestTracker.h>\n" )
+        output.write( "#include <cxxtest/TestRunner.h>\n" )
+        output.write( "#include <cxxtest/RealDescriptions.h>\n" )
+        output.write( "#include <cxxtest/TestMain.h>\n" )
+        if self.options.runner:
+            output.write( "#include <cxxtest/%s.h>\n" % self.options.runner )
+        if self.options.gui:
+            output.write( "#include <cxxtest/%s.h>\n" % self.options.gui )
+        output.write( "\n" )
+        self.wrotePreamble = 1
+
+    def writeMain( self, output ):
+        '''Write the main() function for the test runner'''
+        if not (self.options.gui or self.options.runner):
+           return
+        output.write( 'int %s( int argc, char *argv[] ) {\n' % self.options.main )
+        output.write( ' int status;\n' )
+        if self.options.noStaticInit:
+            output.write( ' CxxTest::initialize();\n' )
+        if self.options.gui:
+            tester_t = "CxxTest::GuiTuiRunner<CxxTest::%s, CxxTest::%s> " % (self.options.gui, self.options.runner)
+        else:
+            tester_t = "CxxTest::%s" % (self.options.runner)
+        if self.options.xunit_printer:
+           output.write( '    std::ofstream ofstr("%s");\n' % self.options.xunit_file )
+           output.write( '    %s tmp(ofstr);\n' % tester_t )
+           output.write( '    CxxTest::RealWorldDescription::_worldName = "%s";\n' % self.options.world )
+        else:
+           output.write( '    %s tmp;\n' % tester_t )
+        output.write( '    status = CxxTest::Main<%s>( tmp, argc, argv );\n' % tester_t )
+        output.write( '    return status;\n')
+        output.write( '}\n' )
+
+    def writeWorld( self, output ):
+        '''Write the world definitions'''
+        if self.wroteWorld: return
+        self.writePreamble( output )
+        self.writeSuites( output )
+        if self.options.root or not self.options.part:
+            writeRoot( output )
+            self.writeWorldDescr( output )
+            self.writeTimings( output )
+        if self.options.noStaticInit:
+            self.writeInitialize( output )
+        self.wroteWorld = 1
+
+    def writeSuites( self, output):
+        '''Write all TestDescriptions and SuiteDescriptions'''
+        for suite in self.suites:
+            self.writeInclude( output, suite['file'] )
+            if isGenerated(suite):
+                generateSuite( output, suite )
+            if isDynamic(suite):
+                self.writeSuitePointer( output, suite )
+            else:
+                writeSuiteObject( output, suite )
+            self.writeTestList( output, suite )
+            self.writeSuiteDescription( output, suite )
+            self.writeTestDescriptions( output, suite )
+
+    def writeInclude( self, output, file):
+        '''Add #include "file" statement'''
+        if file == self.lastIncluded: return
+        output.writelines( [ '#include "', file, '"\n\n' ] )
+        self.lastIncluded = file
+
+    def writeSuitePointer( self, output, suite ):
+        '''Create static suite pointer object for dynamic suites'''
+        if self.options.noStaticInit:
+            output.write( 'static %s *%s;\n\n' % (suite['name'], suite['object']) )
+        else:
+            output.write( 'static %s *%s = 0;\n\n' % (suite['name'], suite['object']) )
 
-    writeWorld( output )
-    output.close()
+    def writeTestList( self, output, suite ):
+        '''Write the head of the test linked list for a suite'''
+        if self.options.noStaticInit:
+            output.write( 'static CxxTest::List %s;\n' % suite['tlist'] )
+        else:
+            output.write( 'static CxxTest::List %s = { 0, 0 };\n' % suite['tlist'] )
 
-include_re = re.compile( r"\s*\#\s*include\s+<cxxtest/" )
-preamble_re = re.compile( r"^\s*<CxxTest\s+preamble>\s*$" )
-world_re = re.compile( r"^\s*<CxxTest\s+world>\s*$" )
-def writeTemplateOutput():
-    '''Create output based on template file'''
-    template = open(options.templateFileName)
-    output = startOutputFile()
-    while 1:
-        line = template.readline()
-        if not line:
-            break;
-        if include_re.search( line ):
-            writePreamble( output )
-            output.write( line )
-        elif preamble_re.search( line ):
-            writePreamble( output )
-        elif world_re.search( line ):
-            if len(suites) > 0:
-                output.write("bool "+suites[0]['object']+"_init = false;\n")
-            writeWorld( output )
+    def writeWorldDescr( self, output ):
+        '''Write the static name of the world name'''
+        if self.options.noStaticInit:
+            output.write( 'const char* CxxTest::RealWorldDescription::_worldName;\n' )
         else:
-            output.write( line )
-    template.close()
-    output.close()
-
-def startOutputFile():
-    '''Create output file and write header'''
-    if options.outputFileName is not None:
-        output = open( options.outputFileName, 'w' )
-    else:
-        output = sys.stdout
-    output.write( "/* Generated file, do not edit */\n\n" )
-    return output
-
-def writePreamble( output ):
-    '''Write the CxxTest header (#includes and #defines)'''
-    global wrotePreamble
-    if wrotePreamble: return
-    output.write( "#ifndef CXXTEST_RUNNING\n" )
-    output.write( "#define CXXTEST_RUNNING\n" )
-    output.write( "#endif\n" )
-    output.write( "\n" )
-    if options.xunit_printer:
-        output.write( "#include <fstream>\n" )
-    if options.haveStandardLibrary:
-        output.write( "#define _CXXTEST_HAVE_STD\n" )
-    if options.haveExceptionHandling:
-        output.write( "#define _CXXTEST_HAVE_EH\n" )
-    if options.abortOnFail:
-        output.write( "#define _CXXTEST_ABORT_TEST_ON_FAIL\n" )
-    if options.longlong:
-        output.write( "#define _CXXTEST_LONGLONG %s\n" % options.longlong )
-    #if options.factor:
-        #output.write( "#define _CXXTEST_FACTOR\n" )
-    for header in options.headers:
-        output.write( "#include \"%s\"\n" % header )
-    output.write( "#include <cxxtest/TestListener.h>\n" )
-    output.write( "#include <cxxtest/TestTracker.h>\n" )
-    output.write( "#include <cxxtest/TestRunner.h>\n" )
-    output.write( "#include <cxxtest/RealDescriptions.h>\n" )
-    output.write( "#include <cxxtest/TestMain.h>\n" )
-    if options.runner:
-        output.write( "#include <cxxtest/%s.h>\n" % options.runner )
-    if options.gui:
-        output.write( "#include <cxxtest/%s.h>\n" % options.gui )
-    output.write( "\n" )
-    wrotePreamble = 1
-
-def writeMain( output ):
-    '''Write the main() function for the test runner'''
-    if not (options.gui or options.runner):
-       return
-    output.write( 'int %s( int argc, char *argv[] ) {\n' % options.main )
-    output.write( ' int status;\n' )
-    if options.noStaticInit:
-        output.write( ' CxxTest::initialize();\n' )
-    if options.gui:
-        tester_t = "CxxTest::GuiTuiRunner<CxxTest::%s, CxxTest::%s> " % (options.gui, options.runner)
-    else:
-        tester_t = "CxxTest::%s" % (options.runner)
-    if options.xunit_printer:
-       output.write( '    std::ofstream ofstr("%s");\n' % options.xunit_file )
-       output.write( '    %s tmp(ofstr);\n' % tester_t )
-       output.write( '    CxxTest::RealWorldDescription::_worldName = "%s";\n' % options.world )
-    else:
-       output.write( '    %s tmp;\n' % tester_t )
-    output.write( '    status = CxxTest::Main<%s>( tmp, argc, argv );\n' % tester_t )
-    output.write( '    return status;\n')
-    output.write( '}\n' )
-
-
-def writeWorld( output ):
-    '''Write the world definitions'''
-    global wroteWorld
-    if wroteWorld: return
-    writePreamble( output )
-    writeSuites( output )
-    if options.root or not options.part:
-        writeRoot( output )
-        writeWorldDescr( output )
-    if options.noStaticInit:
-        writeInitialize( output )
-    wroteWorld = 1
-
-def writeSuites(output):
-    '''Write all TestDescriptions and SuiteDescriptions'''
-    for suite in suites:
-        writeInclude( output, suite['file'] )
-        if isGenerated(suite):
-            generateSuite( output, suite )
-        if isDynamic(suite):
-            writeSuitePointer( output, suite )
+            output.write( 'const char* CxxTest::RealWorldDescription::_worldName = "cxxtest";\n' )
+
+    def writeTimings( self, output ):
+        '''Write the test times given with --timings'''
+        if not self.timings:
+            return
+        output.write( 'static const CxxTest::TestTime cxxtest_timings[] = {\n' )
+        for (suite, test, seconds) in self.timings:
+            output.write( ' { "%s", "%s", %r },\n' % (suite, test, seconds) )
+        output.write( ' { 0, 0, 0 }\n' )
+        output.write( '};\n' )
+        if not self.options.noStaticInit:
+            output.write( 'static CxxTest::DefaultTimings cxxtest_defaultTimings( cxxtest_timings );\n' )
+        output.write( '\n' )
+
+    def writeTestDescriptions( self, output, suite ):
+        '''Write all test descriptions for a suite'''
+        for test in suite['tests']:
+            self.writeTestDescription( output, suite, test )
+
+    def writeTestDescription( self, output, suite, test ):
+        '''Write test description object'''
+        output.write( 'static class %s : public CxxTest::RealTestDescription {\n' % test['class'] )
+        output.write( 'public:\n' )
+        if not self.options.noStaticInit:
+            output.write( ' %s() : CxxTest::RealTestDescription( %s, %s, %s, "%s" ) {}\n' %
+                          (test['class'], suite['tlist'], suite['dobject'], test['line'], test['name']) )
+        if isBenchmark( test ):
+            output.write( ' bool isBenchmark() const { return true; }\n' )
+        output.write( ' void runTest() { %s }\n' % runBody( suite, test ) )
+        output.write( '} %s;\n\n' % test['object'] )
+
+    def writeSuiteDescription( self, output, suite ):
+        '''Write SuiteDescription object'''
+        if isDynamic( suite ):
+            self.writeDynamicDescription( output, suite )
         else:
-            writeSuiteObject( output, suite )
-        writeTestList( output, suite )
-        writeSuiteDescription( output, suite )
-        writeTestDescriptions( output, suite )
+            self.writeStaticDescription( output, suite )
+
+    def writeDynamicDescription( self, output, suite ):
+        '''Write SuiteDescription for a dynamic suite'''
+        output.write( 'CxxTest::DynamicSuiteDescription<%s> %s' % (suite['name'], suite['dobject']) )
+        if not self.options.noStaticInit:
+            output.write( '( %s, %s, "%s", %s, %s, %s, %s )' %
+                          (suite['cfile'], suite['line'], suite['name'], suite['tlist'],
+                           suite['object'], suite['create'], suite['destroy']) )
+        output.write( ';\n\n' )
+
+    def writeStaticDescription( self, output, suite ):
+        '''Write SuiteDescription for a static suite'''
+        output.write( 'CxxTest::StaticSuiteDescription %s' % suite['dobject'] )
+        if not self.options.noStaticInit:
+            output.write( '( %s, %s, "%s", %s, %s )' %
+                          (suite['cfile'], suite['line'], suite['name'], suite['object'], suite['tlist']) )
+        output.write( ';\n\n' )
+
+    def writeInitialize( self, output):
+        '''Write CxxTest::initialize(), which replaces static initialization'''
+        output.write( 'namespace CxxTest {\n' )
+        output.write( ' void initialize()\n' )
+        output.write( ' {\n' )
+        if self.timings:
+            output.write( '  setDefaultTimings( cxxtest_timings );\n' )
+        for suite in self.suites:
+            output.write( '  %s.initialize();\n' % suite['tlist'] )
+            if isDynamic(suite):
+                output.write( '  %s = 0;\n' % suite['object'] )
+                output.write( '  %s.initialize( %s, %s, "%s", %s, %s, %s, %s );\n' %
+                              (suite['dobject'], suite['cfile'], suite['line'], suite['name'],
+                               suite['tlist'], suite['object'], suite['create'], suite['destroy']) )
+            else:
+                output.write( '  %s.initialize( %s, %s, "%s", %s, %s );\n' %
+                              (suite['dobject'], suite['cfile'], suite['line'], suite['name'],
+                               suite['object'], suite['tlist']) )
+
+            for test in suite['tests']:
+                output.write( '  %s.initialize( %s, %s, %s, "%s" );\n' %
+                              (test['object'], suite['tlist'], suite['dobject'], test['line'], test['name']) )
+
+        output.write( ' }\n' )
+        output.write( '}\n' )
+
+def splitSuites( suites, count ):
+    '''Divide suites into count lists with balanced numbers of tests.
+    Suites declared in the same file are kept together, so every header
+    is compiled in exactly one part file'''
+    groups = []
+    byFile = {}
+    for suite in suites:
+        if suite['file'] not in byFile:
+            byFile[suite['file']] = len(groups)
+            groups.append( [] )
+        groups[byFile[suite['file']]].append( suite )
+    #
+    # Assign the largest groups first, each to the part with the fewest tests
+    #
+    sizes = [sum([len(suite['tests']) for suite in group]) for group in groups]
+    order = sorted( list(range(len(groups))), key=lambda i: -sizes[i] )
+    load = [0] * count
+    assigned = [[] for i in range(count)]
+    for i in order:
+        j = load.index( min(load) )
+        load[j] += sizes[i]
+        assigned[j].append( i )
+    shards = []
+    for indices in assigned:
+        shard = []
+        for i in sorted(indices):
+            shard.extend( groups[i] )
+        shards.append( shard )
+    return shards
+
+def shardFileName( options, i ):
+    '''Name of the i-th part file written with --shards'''
+    (base, ext) = os.path.splitext( options.outputFileName )
+    return '%s_part%d%s' % (base, i, ext)
+
+def depTargets( options ):
+    '''The files that are written, as targets of the dependency file'''
+    targets = []
+    if options.outputFileName:
+        targets.append( options.outputFileName )
+        for i in range(1, options.shards + 1):
+            targets.append( shardFileName( options, i ) )
+    if options.manifestFileName:
+        targets.append( options.manifestFileName )
+    return targets
+
+def manifest( suites, options ):
+    '''Describe the suites and tests of a runner, for the --manifest file'''
+    entries = []
+    for suite in suites:
+        entry = { 'name'      : suite['name'],
+                  'file'      : suite['file'],
+                  'line'      : int(suite['line']),
+                  'generated' : bool(suite['generated']),
+                  'dynamic'   : isDynamic(suite),
+                  'create'    : None,
+                  'destroy'   : None,
+                  'tests'     : [] }
+        for which in ('create', 'destroy'):
+            if which in suite:
+                entry[which] = int(suite[which])
+        for test in suite['tests']:
+            entry['tests'].append( { 'name' : test['name'], 'line' : int(test['line']) } )
+        entries.append( entry )
+    return { 'world' : options.world, 'suites' : entries }
+
+def makeRule( targets, prerequisites ):
+    '''A Make rule without commands, in the format written by gcc -MD'''
+    rule = [' '.join( [makeEscape( target ) for target in targets] ) + ':']
+    seen = set()
+    for prerequisite in prerequisites:
+        if prerequisite not in seen:
+            seen.add( prerequisite )
+            rule.append( makeEscape( prerequisite ) )
+    return ' \\\n  '.join( rule ) + '\n'
+
+def makeEscape( fileName ):
+    '''Quote a file name for use in a Make rule'''
+    return fileName.replace( '$', '$$' ).replace( '#', '\\#' ).replace( ' ', '\\ ' )
 
 def isGenerated(suite):
     '''Checks whether a suite class should be created'''
@@ -358,12 +849,9 @@ def isDynamic(suite):
     '''Checks whether a suite is dynamic'''
     return 'create' in suite
 
-def writeInclude(output, file):
-    '''Add #include "file" statement'''
-    global lastIncluded
-    if file == lastIncluded: return
-    output.writelines( [ '#include "', file, '"\n\n' ] )
-    lastIncluded = file
+def isBenchmark(test):
+    '''Checks whether a test is a bench*() benchmark'''
+    return test['name'][:5].lower() == 'bench'
 
 def generateSuite( output, suite ):
     '''Write a suite declared with CXXTEST_SUITE()'''
@@ -373,46 +861,10 @@ def generateSuite( output, suite ):
         output.write(line)
     output.write( '};\n\n' )
 
-def writeSuitePointer( output, suite ):
-    '''Create static suite pointer object for dynamic suites'''
-    if options.noStaticInit:
-        output.write( 'static %s *%s;\n\n' % (suite['name'], suite['object']) )
-    else:
-        output.write( 'static %s *%s = 0;\n\n' % (suite['name'], suite['object']) )
-
 def writeSuiteObject( output, suite ):
     '''Create static suite object for non-dynamic suites'''
     output.writelines( [ "static ", suite['name'], " ", suite['object'], ";\n\n" ] )
 
-def writeTestList( output, suite ):
-    '''Write the head of the test linked list for a suite'''
-    if options.noStaticInit:
-        output.write( 'static CxxTest::List %s;\n' % suite['tlist'] )
-    else:
-        output.write( 'static CxxTest::List %s = { 0, 0 };\n' % suite['tlist'] )
-
-def writeWorldDescr( output ):
-    '''Write the static name of the world name'''
-    if options.noStaticInit:
-        output.write( 'const char* CxxTest::RealWorldDescription::_worldName;\n' )
-    else:
-        output.write( 'const char* CxxTest::RealWorldDescription::_worldName = "cxxtest";\n' )
-
-def writeTestDescriptions( output, suite ):
-    '''Write all test descriptions for a suite'''
-    for test in suite['tests']:
-        writeTestDescription( output, suite, test )
-
-def writeTestDescription( output, suite, test ):
-    '''Write test description object'''
-    output.write( 'static class %s : public CxxTest::RealTestDescription {\n' % test['class'] )
-    output.write( 'public:\n' )
-    if not options.noStaticInit:
-        output.write( ' %s() : CxxTest::RealTestDescription( %s, %s, %s, "%s" ) {}\n' %
-                      (test['class'], suite['tlist'], suite['dobject'], test['line'], test['name']) )
-    output.write( ' void runTest() { %s }\n' % runBody( suite, test ) )
-    output.write( '} %s;\n\n' % test['object'] )
-
 def runBody( suite, test ):
     '''Body of TestDescription::run()'''
     if isDynamic(suite): return dynamicRun( suite, test )
@@ -421,60 +873,11 @@ def runBody( suite, test ):
 def dynamicRun( suite, test ):
     '''Body of TestDescription::run() for test in a dynamic suite'''
     return 'if ( ' + suite['object'] + ' ) ' + suite['object'] + '->' + test['name'] + '();'
-    
+
 def staticRun( suite, test ):
     '''Body of TestDescription::run() for test in a non-dynamic suite'''
     return suite['object'] + '.' + test['name'] + '();'
-    
-def writeSuiteDescription( output, suite ):
-    '''Write SuiteDescription object'''
-    if isDynamic( suite ):
-        writeDynamicDescription( output, suite )
-    else:
-        writeStaticDescription( output, suite )
-
-def writeDynamicDescription( output, suite ):
-    '''Write SuiteDescription for a dynamic suite'''
-    output.write( 'CxxTest::DynamicSuiteDescription<%s> %s' % (suite['name'], suite['dobject']) )
-    if not options.noStaticInit:
-        output.write( '( %s, %s, "%s", %s, %s, %s, %s )' %
-                      (suite['cfile'], suite['line'], suite['name'], suite['tlist'],
-                       suite['object'], suite['create'], suite['destroy']) )
-    output.write( ';\n\n' )
-
-def writeStaticDescription( output, suite ):
-    '''Write SuiteDescription for a static suite'''
-    output.write( 'CxxTest::StaticSuiteDescription %s' % suite['dobject'] )
-    if not options.noStaticInit:
-        output.write( '( %s, %s, "%s", %s, %s )' %
-                      (suite['cfile'], suite['line'], suite['name'], suite['object'], suite['tlist']) )
-    output.write( ';\n\n' )
 
 def writeRoot(output):
     '''Write static members of CxxTest classes'''
     output.write( '#include <cxxtest/Root.cpp>\n' )
-
-def writeInitialize(output):
-    '''Write CxxTest::initialize(), which replaces static initialization'''
-    output.write( 'namespace CxxTest {\n' )
-    output.write( ' void initialize()\n' )
-    output.write( ' {\n' )
-    for suite in suites:
-        output.write( '  %s.initialize();\n' % suite['tlist'] )
-        if isDynamic(suite):
-            output.write( '  %s = 0;\n' % suite['object'] )
-            output.write( '  %s.initialize( %s, %s, "%s", %s, %s, %s, %s );\n' %
-                          (suite['dobject'], suite['cfile'], suite['line'], suite['name'],
-                           suite['tlist'], suite['object'], suite['create'], suite['destroy']) )
-        else:
-            output.write( '  %s.initialize( %s, %s, "%s", %s, %s );\n' %
-                          (suite['dobject'], suite['cfile'], suite['line'], suite['name'],
-                           suite['object'], suite['tlist']) )
-
-        for test in suite['tests']:
-            output.write( '  %s.initialize( %s, %s, %s, "%s" );\n' %
-                          (test['object'], suite['tlist'], suite['dobject'], test['line'], test['name']) )
-
-    output.write( ' }\n' )
-    output.write( '}\n' )
-
@@ -0,0 +1,38 @@
+#include <cxxtest/TestSuite.h>
+
+//
+// This is a test suite with benchmarks next to its tests,
+// used to test the bench*() functions.
+//
+
+class BenchSuite : public CxxTest::TestSuite
+{
+public:
+    BenchSuite() : _total( 0 ) {}
+
+    void testSum()
+    {
+        TS_ASSERT_EQUALS( sum( 10 ), 45u );
+    }
+
+    void benchSum()
+    {
+        _total = _total + sum( 100 );
+    }
+
+    void benchFails()
+    {
+        TS_FAIL( "Benchmark failed" );
+    }
+
+private:
+    static unsigned sum( unsigned n )
+    {
+        unsigned total = 0;
+        for ( unsigned i = 0; i < n; ++ i )
+            total += i;
+        return total;
+    }
+
+    volatile unsigned _total;
+};
@@ -0,0 +1,46 @@
+#include <cxxtest/TestSuite.h>
+#include <stdlib.h>
+
+//
+// This is a test suite with tests that crash the process,
+// used to test the --isolate option.
+//
+
+class CrashSuite : public CxxTest::TestSuite
+{
+public:
+    void testBefore()
+    {
+        TS_ASSERT( true );
+    }
+
+    void testSegfault()
+    {
+        volatile int *p = 0;
+        *p = 1;
+    }
+
+    void testAfter()
+    {
+        TS_ASSERT_EQUALS( 1, 2 );
+    }
+
+    void testAbort()
+    {
+        abort();
+    }
+
+    void testLast()
+    {
+        TS_ASSERT( true );
+    }
+};
+
+class AfterCrashSuite : public CxxTest::TestSuite
+{
+public:
+    void testNext()
+    {
+        TS_ASSERT( true );
+    }
+};
@@ -0,0 +1,16 @@
+#include "SimpleInheritedTest.h"
+
+//
+// A suite that derives from a suite in another header, which is found
+// with the class index
+//
+class IndexedTests : public Tests
+{
+public:
+
+   void test_empty()
+   {
+      TS_ASSERT(cache->empty());
+   }
+
+};
@@ -0,0 +1,15 @@
+//
+// A suite that derives from a suite in another header, which it does not
+// include, so only the class index finds its base
+//
+class IndexedTests2 : public Tests
+{
+public:
+
+   void test_clear()
+   {
+      cache->clear();
+      TS_ASSERT(cache->empty());
+   }
+
+};
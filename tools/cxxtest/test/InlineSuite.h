@@ -0,0 +1,22 @@
+#include <cxxtest/TestSuite.h>
+
+//
+// A deprecated inline suite, and a suite that derives from a suite in
+// SimpleInheritedTest.h, which it does not include, so a parallel scan
+// scans this file again after that header
+//
+CXXTEST_SUITE(InlineSuite)
+{
+};
+
+class InlineInheritedTests : public Tests
+{
+public:
+
+   void test_clear()
+   {
+      cache->clear();
+      TS_ASSERT(cache->empty());
+   }
+
+};
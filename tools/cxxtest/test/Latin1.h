@@ -0,0 +1,20 @@
+#include <cxxtest/TestSuite.h>
+
+//
+// This file is encoded in Latin-1: t, nave, ber
+//
+
+class Latin1 : public CxxTest::TestSuite
+{
+public:
+    void testLatin1Comment()
+    {
+        // Crme brle
+        TS_ASSERT_EQUALS( 1, 1 );
+    }
+
+    void testAccents()
+    {
+        TS_ASSERT_DIFFERS( "", "e" );
+    }
+};
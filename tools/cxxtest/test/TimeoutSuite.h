@@ -0,0 +1,35 @@
+#include <cxxtest/TestSuite.h>
+
+//
+// This is a test suite with a test that never returns,
+// used to test the --test-timeout and --suite-timeout options.
+//
+
+class TimeoutSuite : public CxxTest::TestSuite
+{
+public:
+    void testBefore()
+    {
+        TS_ASSERT( true );
+    }
+
+    void testHang()
+    {
+        for ( volatile unsigned i = 0; ; i = i + 1 ) {
+        }
+    }
+
+    void testAfter()
+    {
+        TS_WARN( "After the hang" );
+    }
+};
+
+class AfterTimeoutSuite : public CxxTest::TestSuite
+{
+public:
+    void testNext()
+    {
+        TS_ASSERT( true );
+    }
+};
@@ -5,6 +5,13 @@ import glob
 import difflib
 import subprocess
 import re
+import shutil
+import socket
+import time
+import json
+import atexit
+import tempfile
+import threading
 if sys.version_info < (2,7):
     import unittest2 as unittest
 else:
@@ -19,6 +26,19 @@ currdir = os.path.dirname(os.path.abspath(__file__))+os.sep
 sampledir = os.path.dirname(os.path.dirname(currdir))+'/sample'+os.sep
 cxxtestdir = os.path.dirname(os.path.dirname(currdir))+os.sep
 
+if sys.version_info < (3,0):
+    sys.path.insert(0, cxxtestdir+'python')
+else:
+    sys.path.insert(0, cxxtestdir+'python'+os.sep+'python3')
+import cxxtest
+
+# The FOG parser tables are saved in a cache directory of the user, so the
+# tests, and the cxxtestgen commands that they run, save them in a
+# directory of their own instead
+tablecachedir = tempfile.mkdtemp(prefix='cxxtest_tables_')
+os.environ['XDG_CACHE_HOME'] = tablecachedir
+atexit.register(shutil.rmtree, tablecachedir, True)
+
 compilerre = re.compile("^(?P<path>[^:]+)(?P<rest>:[0-9]+:.*)$")
 dirre      = re.compile("^([^"+os.sep+"]*/)*")
 xmlre      = re.compile("\"(?P<path>[^\"]*/[^\"]*)\"")
@@ -75,6 +95,9 @@ def normalize_line_for_diff(line):
     line = re.sub(" ?= ?", "=", line)
 
 
+    # timings differ from run to run
+    line = re.sub('time="[^"]*"', 'time="0"', line)
+
     # remove all absolute path prefixes
     line = ''.join(line.split(cxxtestdir))
     # for xml, remove prefixes from everything that looks like a 
@@ -209,6 +232,32 @@ class BaseTestCase(object):
         #
         self.passed=True
 
+    def check_shards(self, prefix='', args=None, shards=2, output=None):
+        self.init(prefix)
+        cmd = "cd %s; %s %s../bin/cxxtestgen %s --shards=%d -o %s %s > %s 2>&1" % (currdir, sys.executable, currdir, self.fog, shards, self.py_cpp, args, self.py_out)
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        #
+        files = [self.py_cpp]
+        for i in range(1, shards+1):
+            files.append(currdir+self.prefix+'_py_part%d.cpp' % i)
+        cmd = "cd %s; %s %s %s %s. %s%s../ %s > %s 2>&1" % (currdir, self.compiler, self.exe_option, self.build_target, self.include_option, self.include_option, currdir, ' '.join(files), self.build_log)
+        status = subprocess.call(cmd, shell=True)
+        for file in files:
+            if os.path.exists(file):
+                os.remove(file)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        #
+        status = subprocess.call("cd %s; %s -v > %s 2>&1" % (currdir, self.build_target, self.px_pre), shell=True)
+        OUTPUT = open(self.px_pre,'a')
+        OUTPUT.write('Error level = '+str(status)+'\n')
+        OUTPUT.close()
+        diffstr = file_diff(self.px_pre, currdir+output)
+        if not diffstr == '':
+            self.fail("Unexpected differences in output:\n"+diffstr)
+        #
+        self.passed=True
+
     def compile(self, prefix='', args=None, compile='', output=None, main=None, failGen=False, run=None, logfile=None, failBuild=False):
         self.init(prefix)
         #
@@ -275,6 +324,144 @@ class BaseTestCase(object):
         """Root + Part"""
         self.compile(prefix='root_plus_part', args="--error-printer --root --part "+samples, output="error.out")
 
+    def test_generate(self):
+        """In-process generation"""
+        self.init('generate')
+        cmd = "cd %s; %s %s../bin/cxxtestgen %s --error-printer -o %s GoodSuite.h Part1.h > %s 2>&1" % (currdir, sys.executable, currdir, self.fog, self.py_cpp, self.py_out)
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        INPUT = open(self.py_cpp)
+        expected = INPUT.read()
+        INPUT.close()
+        #
+        cwd = os.getcwd()
+        os.chdir(currdir)
+        try:
+            fog = self.fog != ''
+            source = cxxtest.generate(['GoodSuite.h', 'Part1.h'], error_printer=True, fog=fog)
+            other = cxxtest.generate(['Part2.h'], runner='ParenPrinter', fog=fog)
+            again = cxxtest.generate(['GoodSuite.h', 'Part1.h'], error_printer=True, fog=fog)
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(source, expected)
+        self.assertEqual(again, expected)
+        self.assertTrue('Part2' in other and not 'Part1' in other)
+        #
+        # Problems raise an exception instead of exiting
+        self.assertRaises(cxxtest.GenerationError, cxxtest.generate, [currdir+'missing.h'])
+        self.assertRaises(cxxtest.GenerationError, cxxtest.generate, [currdir+'GoodSuite.h'], noStaticInit=True, root=True)
+        self.passed=True
+
+    def test_server(self):
+        """Generation server"""
+        if not hasattr(socket, 'AF_UNIX'):
+            self.skipTest("Unix domain sockets are not supported")
+        self.init('server')
+        sock = currdir+self.prefix+'.sock'
+        server = subprocess.Popen([sys.executable, cxxtestdir+'bin'+os.sep+'cxxtestgen', '--serve='+sock], cwd=currdir)
+        try:
+            for i in range(100):
+                if os.path.exists(sock):
+                    break
+                time.sleep(0.1)
+            cmd = "cd %s; %s %s../bin/cxxtestgen %s --server=%s --error-printer -o %s GoodSuite.h > %s 2>&1" % (currdir, sys.executable, currdir, self.fog, sock, self.py_cpp, self.py_out)
+            status = subprocess.call(cmd, shell=True)
+            self.assertEqual(status, 0, 'Error executing command: '+cmd)
+            cmd = "cd %s; %s %s../bin/cxxtestgen --server=%s EmptySuite.h > %s 2>&1" % (currdir, sys.executable, currdir, sock, self.py_out)
+            status = subprocess.call(cmd, shell=True)
+            self.assertEqual(status, 2, 'Expected cxxtestgen to fail: '+cmd)
+        finally:
+            server.terminate()
+            server.wait()
+        self.assertFalse(os.path.exists(sock))
+        INPUT = open(self.py_cpp)
+        source = INPUT.read()
+        INPUT.close()
+        cwd = os.getcwd()
+        os.chdir(currdir)
+        try:
+            expected = cxxtest.generate(['GoodSuite.h'], error_printer=True, fog=self.fog != '')
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(source, expected)
+        self.passed=True
+
+    def test_server_died(self):
+        """Generation server that dies during a request"""
+        if not hasattr(socket, 'AF_UNIX'):
+            self.skipTest("Unix domain sockets are not supported")
+        self.init('server_died')
+        sock = currdir+self.prefix+'.sock'
+        if os.path.exists(sock):
+            os.remove(sock)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(sock)
+        server.listen(1)
+        def die():
+            # Read the request and close the connection without a response
+            (conn, address) = server.accept()
+            while conn.recv(65536):
+                pass
+            conn.close()
+        thread = threading.Thread(target=die)
+        thread.start()
+        try:
+            cmd = "cd %s; %s %s../bin/cxxtestgen %s --server=%s --error-printer -o %s GoodSuite.h > %s 2>&1" % (currdir, sys.executable, currdir, self.fog, sock, self.py_cpp, self.py_out)
+            status = subprocess.call(cmd, shell=True)
+            self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        finally:
+            thread.join()
+            server.close()
+            os.remove(sock)
+        self.assertTrue(os.path.exists(self.py_cpp))
+        self.passed=True
+
+    def test_shards(self):
+        """Shards"""
+        self.check_shards(prefix='shards', args="--error-printer Part1.h Part2.h", output="parts.out")
+
+    def test_timings(self):
+        """Timing history"""
+        history = currdir+'timings_history.txt'
+        xunit = currdir+'timings_xunit.xml'
+        OUTPUT = open(history, 'w')
+        OUTPUT.write('SimpleTest testEquality 2.5\nSimpleTest testAddition 1.0\nNoSuchSuite testNothing 1.0\n')
+        OUTPUT.close()
+        OUTPUT = open(xunit, 'w')
+        OUTPUT.write('<?xml version="1.0" encoding="UTF-8" ?>\n<testsuite name="cxxtest" tests="1" errors="0" failures="0" time="0.75" >\n')
+        OUTPUT.write('    <testcase classname="SimpleTest" name="testAddition" line="21" time="0.75" />\n</testsuite>\n')
+        OUTPUT.close()
+        try:
+            self.compile(prefix='timings', args="--error-printer --timings=%s --timings=%s %s" % (history, xunit, samples), output="error.out")
+        finally:
+            os.remove(history)
+            os.remove(xunit)
+        INPUT = open(self.py_cpp)
+        source = INPUT.read()
+        INPUT.close()
+        self.assertTrue('{ "SimpleTest", "testEquality", 2.5 }' in source)
+        self.assertTrue('{ "SimpleTest", "testAddition", 0.75 }' in source)
+        self.assertFalse('NoSuchSuite' in source)
+
+    def test_jobs(self):
+        """Parallel scanning"""
+        self.init('jobs')
+        files = "GoodSuite.h SimpleInheritedTest.h Part1.h Part2.h"
+        cmd = "cd %s; %s %s../bin/cxxtestgen %s --error-printer -o %s %s > %s 2>&1" % (currdir, sys.executable, currdir, self.fog, self.py_cpp, files, self.py_out)
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        INPUT = open(self.py_cpp)
+        expected = INPUT.read()
+        INPUT.close()
+        cmd = "cd %s; %s %s../bin/cxxtestgen %s --error-printer --jobs=3 -o %s %s > %s 2>&1" % (currdir, sys.executable, currdir, self.fog, self.py_cpp, files, self.py_out)
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        INPUT = open(self.py_cpp)
+        source = INPUT.read()
+        INPUT.close()
+        self.assertEqual(source, expected)
+        self.passed=True
+
     def test_wildcard(self):
         """Wildcard input"""
         self.compile(prefix='wildcard', args='../sample/*.h', main=True, output="wildcard.out")
@@ -321,6 +508,277 @@ class BaseTestCase(object):
         """Include"""
         self.compile(prefix='include', args="--include=VoidTraits.h --include=LongTraits.h --error-printer IncludeTest.h", output="include.out")
 
+    def test_latin1(self):
+        """Latin-1 input"""
+        cwd = os.getcwd()
+        os.chdir(currdir)
+        try:
+            source = cxxtest.generate(['Latin1.h'], error_printer=True, fog=self.fog != '')
+        finally:
+            os.chdir(cwd)
+        self.assertTrue('testDescription_suite_Latin1_testLatin1Comment' in source)
+        self.assertTrue('testDescription_suite_Latin1_testAccents' in source)
+        self.passed=True
+
+    def test_cache(self):
+        """Generation cache"""
+        self.init('cache')
+        cachedir = currdir+self.prefix+'_cache'
+        cmd = "cd %s; %s %s../bin/cxxtestgen %s --error-printer --cache-dir=%s -o %s GoodSuite.h > %s 2>&1" % (currdir, sys.executable, currdir, self.fog, cachedir, self.py_cpp, self.py_out)
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        self.assertEqual(len(os.listdir(cachedir)), 1)
+        mtime = os.path.getmtime(self.py_cpp)
+        os.utime(self.py_cpp, (mtime-10, mtime-10))
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        self.assertEqual(os.path.getmtime(self.py_cpp), mtime-10)
+        self.assertEqual(len(os.listdir(cachedir)), 1)
+        #
+        # A cache that is too large keeps only the latest runner
+        cmd = "cd %s; %s %s../bin/cxxtestgen %s --error-printer --cache-dir=%s --cache-size=0.001 -o %s ../sample/SimpleTest.h > %s 2>&1" % (currdir, sys.executable, currdir, self.fog, cachedir, self.py_cpp, self.py_out)
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        self.assertEqual(len(os.listdir(cachedir)), 1)
+        shutil.rmtree(cachedir)
+        self.passed=True
+
+    def test_depfile(self):
+        """Dependency file"""
+        self.init('depfile')
+        depfile = os.path.splitext(self.py_cpp)[0]+'.d'
+        headers = self.prefix+'_headers.txt'
+        OUTPUT = open(currdir+headers, 'w')
+        OUTPUT.write('Part1.h\n')
+        OUTPUT.close()
+        cmd = "cd %s; %s %s../bin/cxxtestgen %s --error-printer -MD --template=../sample/only.tpl --headers=%s -o %s GoodSuite.h > %s 2>&1" % (currdir, sys.executable, currdir, self.fog, headers, self.py_cpp, self.py_out)
+        try:
+            status = subprocess.call(cmd, shell=True)
+        finally:
+            os.remove(currdir+headers)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        INPUT = open(depfile)
+        rule = INPUT.read()
+        INPUT.close()
+        os.remove(depfile)
+        self.assertEqual(rule, self.py_cpp+': \\\n  GoodSuite.h \\\n  Part1.h \\\n  '+headers+' \\\n  ../sample/only.tpl\n')
+        self.passed=True
+
+    def test_manifest(self):
+        """Manifest of suites and tests"""
+        self.init('manifest')
+        manifest = currdir+self.prefix+'.json'
+        cmd = "cd %s; %s %s../bin/cxxtestgen %s --manifest-only --manifest=%s ../sample/CreatedTest.h GoodSuite.h > %s 2>&1" % (currdir, sys.executable, currdir, self.fog, manifest, self.py_out)
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        self.assertFalse(os.path.exists(self.py_cpp))
+        INPUT = open(manifest)
+        data = json.load(INPUT)
+        INPUT.close()
+        os.remove(manifest)
+        self.assertEqual(data['world'], 'cxxtest')
+        self.assertEqual([suite['name'] for suite in data['suites']], ['CreatedTest', 'GoodSuite'])
+        created = data['suites'][0]
+        self.assertTrue(created['dynamic'])
+        self.assertEqual((created['create'], created['destroy']), (21, 22))
+        self.assertEqual(created['tests'], [{'name': 'test_nothing', 'line': 24}])
+        good = data['suites'][1]
+        self.assertFalse(good['dynamic'])
+        self.assertEqual(good['file'], 'GoodSuite.h')
+        self.assertEqual(good['create'], None)
+        self.assertEqual(good['tests'][:2], [{'name': 'testAssert', 'line': 12}, {'name': 'testAssertMessage', 'line': 20}])
+        self.passed=True
+
+    def test_jobs_rescan(self):
+        """Parallel scanning of a file that inherits from an earlier file"""
+        if self.fog != '':
+            self.skipTest("Inline suites are only found by the line parser")
+        self.init('jobs_rescan')
+        cmd = "cd %s; %s %s../bin/cxxtestgen %s --error-printer --jobs=2 -o %s SimpleInheritedTest.h InlineSuite.h > %s 2>&1" % (currdir, sys.executable, currdir, self.fog, self.py_cpp, self.py_out)
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        INPUT = open(self.py_cpp)
+        source = INPUT.read()
+        INPUT.close()
+        self.assertTrue('TestDescription_suite_InlineInheritedTests_test_clear' in source)
+        #
+        # The rescanned file is reported once
+        INPUT = open(self.py_out)
+        output = INPUT.read()
+        INPUT.close()
+        self.assertEqual(output.count('Warning: Inline test suites are deprecated'), 1, output)
+        self.passed=True
+
+    def test_class_index(self):
+        """Class index"""
+        self.init('class_index')
+        index = currdir+self.prefix+'_index.json'
+        cwd = os.getcwd()
+        os.chdir(currdir)
+        try:
+            fog = self.fog != ''
+            cxxtest.generate(['SimpleInheritedTest.h'], error_printer=True, fog=fog, classIndex=index)
+            source = cxxtest.generate(['IndexedSuite.h'], error_printer=True, fog=fog, classIndex=index)
+        finally:
+            os.chdir(cwd)
+            for fileName in [index, index+'.lock']:
+                if os.path.exists(fileName):
+                    os.remove(fileName)
+        for name in ['test_size', 'test_insert', 'test_empty']:
+            self.assertTrue('TestDescription_suite_IndexedTests_'+name in source)
+        self.passed=True
+
+    def test_class_index_concurrent(self):
+        """Class index saved by concurrent builds"""
+        from cxxtest import cxxtest_index
+        self.init('class_index_concurrent')
+        index = currdir+self.prefix+'_index.json'
+        first = cxxtest_index.ClassIndex(index, None, None)
+        second = cxxtest_index.ClassIndex(index, None, None)
+        first.update(currdir+'SimpleInheritedTest.h', {'Tests' : {'bases' : ['CxxTest::TestSuite'], 'tests' : []}})
+        second.update(currdir+'IndexedSuite.h', {'IndexedTests' : {'bases' : ['Tests'], 'tests' : []}})
+        try:
+            first.save()
+            second.save()
+            files = cxxtest_index.indexedFiles(index)
+        finally:
+            for fileName in [index, index+'.lock']:
+                if os.path.exists(fileName):
+                    os.remove(fileName)
+        self.assertEqual(files, [currdir+'IndexedSuite.h', currdir+'SimpleInheritedTest.h'])
+        self.assertEqual(second.findClass('Tests')['bases'], ['CxxTest::TestSuite'])
+        self.passed=True
+
+    def test_class_index_jobs(self):
+        """Class index with parallel scanning"""
+        if self.fog == '':
+            self.skipTest("Files are only rescanned by the FOG parser")
+        self.init('class_index_jobs')
+        index = currdir+self.prefix+'_index.json'
+        cmd = "cd %s; %s %s../bin/cxxtestgen %s --error-printer --class-index=%s --jobs=2 -o %s SimpleInheritedTest.h IndexedSuite2.h > %s 2>&1" % (currdir, sys.executable, currdir, self.fog, index, self.py_cpp, self.py_out)
+        status = subprocess.call(cmd, shell=True)
+        os.remove(index)
+        os.remove(index+'.lock')
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        INPUT = open(self.py_cpp)
+        source = INPUT.read()
+        INPUT.close()
+        self.assertTrue('TestDescription_suite_IndexedTests2_test_clear' in source)
+        #
+        # The rescanned file is reported once
+        INPUT = open(self.py_out)
+        output = INPUT.read()
+        INPUT.close()
+        self.assertEqual(output.count('Parsing file IndexedSuite2.h'), 1, output)
+        self.passed=True
+
+    def test_parser_tables(self):
+        """Saved parser tables"""
+        if self.fog == '':
+            self.skipTest("Parser tables are only used by the FOG parser")
+        self.init('parser_tables')
+        cachedir = currdir+self.prefix+'_cache'
+        cmd = "cd %s; XDG_CACHE_HOME=%s %s %s../bin/cxxtestgen %s --error-printer -o %s GoodSuite.h > %s 2>&1" % (currdir, cachedir, sys.executable, currdir, self.fog, self.py_cpp, self.py_out)
+        for i in range(2):
+            status = subprocess.call(cmd, shell=True)
+            self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        self.assertEqual(len(glob.glob(cachedir+'/cxxtest/*/cxxtest_parsetab_*.py')), 1)
+        self.assertEqual(len(glob.glob(cachedir+'/cxxtest/*/cxxtest_lextab_*.py')), 1)
+        self.assertFalse(os.path.exists(currdir+'parsetab.py'))
+        shutil.rmtree(cachedir)
+        self.passed=True
+
+    def test_skip_bodies(self):
+        """Skipped function bodies"""
+        if self.fog == '':
+            self.skipTest("Function bodies are only skipped by the FOG parser")
+        cwd = os.getcwd()
+        os.chdir(currdir)
+        try:
+            files = ['GoodSuite.h', 'SimpleInheritedTest.h', 'ThrowNoStd.h', 'Comments2.h']
+            expected = cxxtest.generate(files, error_printer=True, fog=True)
+            source = cxxtest.generate(files, error_printer=True, fog=True, skipBodies=True)
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(source, expected)
+        self.passed=True
+
+    def test_skip_bodies_heads(self):
+        """Class and namespace bodies that follow parentheses"""
+        if self.fog == '':
+            self.skipTest("Function bodies are only skipped by the FOG parser")
+        from cxxtest import cxx_parser
+        lexer = cxx_parser.BodySkippingLexer(cxx_parser.CppParser(optimize=1).lexer)
+        def bodies(data):
+            lexer.input(data)
+            types = []
+            tok = lexer.token()
+            while tok is not None:
+                types.append(tok.type)
+                tok = lexer.token()
+            return types.count('FunctionBody')
+        self.assertEqual(bodies('struct S __attribute__((packed)) { int a; };'), 0)
+        self.assertEqual(bodies('namespace N __attribute__((visibility("default"))) { void f() { } }'), 1)
+        self.assertEqual(bodies('class __declspec(dllexport) S { void f() const { } };'), 1)
+        self.assertEqual(bodies('struct alignas(16) S { void f(int (*g)(int)) { } };'), 1)
+        self.assertEqual(bodies('class S EXPORT(x) { };'), 0)
+        self.assertEqual(bodies('template <class T> void f(T x) { if (x) { } }'), 1)
+        self.assertEqual(bodies('void f() __attribute__((noinline));\nvoid g() { }'), 1)
+        self.passed=True
+
+    def test_parse_suites_only(self):
+        """Parsing only the test suite classes"""
+        if self.fog == '':
+            self.skipTest("Test suite classes are only located by the FOG parser")
+        cwd = os.getcwd()
+        os.chdir(currdir)
+        try:
+            files = ['GoodSuite.h', 'InheritedTest.h', 'ThrowNoStd.h', 'Comments2.h', 'CppTemplateTest.h']
+            expected = cxxtest.generate(files, error_printer=True, fog=True)
+            source = cxxtest.generate(files, error_printer=True, fog=True, parseSuitesOnly=True)
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(source, expected)
+        self.passed=True
+
+    def test_parser_reuse(self):
+        """Reused C++ parser"""
+        if self.fog == '':
+            self.skipTest("The C++ parser is only used by the FOG parser")
+        from cxxtest import cxx_parser
+        parser = cxx_parser.CppParser(optimize=1)
+        first = parser.parse(data="class A\n{\n  void testA() { try { } catch (...) { } }\n};\n")
+        second = parser.parse(data="\nclass B\n{\n  void testB();\n};\n")
+        self.assertFalse(first.noExceptionLogic)
+        self.assertTrue(second.noExceptionLogic)
+        self.assertEqual(sorted(second.index.keys()), ['', '::B'])
+        self.assertEqual(second.index['::B'].lineno, 2)
+        self.assertEqual(second.get_functions('::B', quiet=True), [('testB', 4)])
+        third = parser.parse(data="class C\n{\n  void testC() { TS_ASSERT_THROWS( f(), int ); }\n};\n")
+        self.assertFalse(third.noExceptionLogic)
+        self.passed=True
+
+    def test_class_hierarchy(self):
+        """Inherited test functions"""
+        if self.fog == '':
+            self.skipTest("The class hierarchy is only used by the FOG parser")
+        from cxxtest import cxx_parser
+        data = "class A : public CxxTest::TestSuite { void testA(); };\n" \
+               "class B : public A { void testB(); };\n" \
+               "class C : public B { void testC(); };\n" \
+               "class D : public C { void testD(); void testA(); };\n"
+        info = cxx_parser.CppParser(optimize=1).parse(data=data)
+        self.assertTrue(info.is_baseclass('::D', 'CxxTest::TestSuite'))
+        self.assertTrue(info.is_baseclass('D', 'A'))
+        self.assertFalse(info.is_baseclass('A', 'D'))
+        for i in range(3):
+            names = [fn[0] for fn in info.get_functions('::C', quiet=True)]
+            self.assertEqual(names, ['testC', 'testB', 'testA'])
+            names = [fn[0] for fn in info.get_functions('::D', quiet=True)]
+            self.assertEqual(names, ['testD', 'testA', 'testC', 'testB'])
+        self.assertEqual(len(info.index['::C'].function), 1)
+        self.passed=True
+
     #
     # Template file tests
     #
@@ -384,6 +842,31 @@ class BaseTestCase(object):
         """Normal Behavior with XUnit Output"""
         self.compile(prefix='normal_behavior_xunit', args="--xunit-printer "+self.normals, logfile='TEST-cxxtest.xml', output="normal.xml")
 
+    def test_xunit_crash(self):
+        """XUnit output of a run that crashes"""
+        if sys.platform.startswith('win'):
+            self.skipTest("Crashes are not caught on Windows")
+        self.init('xunit_crash')
+        xmlfile = currdir+self.prefix+'.xml'
+        cmd = "cd %s; %s %s../bin/cxxtestgen %s --xunit-printer --xunit-file=%s -o %s CrashSuite.h > %s 2>&1" % (currdir, sys.executable, currdir, self.fog, xmlfile, self.py_cpp, self.py_out)
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        cmd = "cd %s; %s %s %s %s. %s%s../ %s > %s 2>&1" % (currdir, self.compiler, self.exe_option, self.build_target, self.include_option, self.include_option, currdir, self.py_cpp, self.build_log)
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        #
+        # The testcases are written as they end, so the file keeps the
+        # test that ended before the crash
+        status = subprocess.call("cd %s; %s > %s 2>&1" % (currdir, self.build_target, self.px_pre), shell=True)
+        self.assertNotEqual(status, 0)
+        INPUT = open(xmlfile)
+        xml = INPUT.read()
+        INPUT.close()
+        self.assertTrue(xml.startswith('<?xml version="1.0" encoding="UTF-8" ?>\n<testsuite name="cxxtest" '), xml)
+        self.assertEqual(re.findall('classname="([^"]*)" name="([^"]*)"', xml), [('CrashSuite', 'testBefore')])
+        os.remove(xmlfile)
+        self.passed=True
+
     def test_normal_behavior(self):
         """Normal Behavior"""
         self.compile(prefix='normal_behavior', args="--error-printer "+self.normals, output="normal.out")
@@ -466,6 +949,357 @@ class BaseTestCase(object):
         """GF:TDW throws"""
         self.compile(prefix='gf_tdw_throws', args="--error-printer TearDownWorldThrows.h", output="tdwt.out")
 
+    #
+    # Parallel execution
+    #
+
+    def test_runner_jobs(self):
+        """Worker processes"""
+        if sys.platform.startswith('win'):
+            self.skipTest("Worker processes are not supported on Windows")
+        self.compile(prefix='runner_jobs', args="--error-printer --have-fork "+samples, run="%s -v --jobs 3 > %s 2>&1", output="error.out")
+
+    def test_runner_jobs_serial(self):
+        """Worker processes in a runner without fork support"""
+        self.compile(prefix='runner_jobs_serial', args="--error-printer "+samples, run="%s -v --jobs 3 > %s 2>&1", output="jobs_serial.out")
+
+    def test_runner_jobs_fixtures(self):
+        """Worker processes + global fixtures"""
+        if sys.platform.startswith('win'):
+            self.skipTest("Worker processes are not supported on Windows")
+        self.compile(prefix='runner_jobs_fixtures', args="--error-printer --have-fork GlobalFixtures.h WorldFixtures.h", run="%s -v --jobs 2 > %s 2>&1", output="gfxs.out")
+
+    def test_runner_jobs_throws(self):
+        """Worker processes + exception from world"""
+        if sys.platform.startswith('win'):
+            self.skipTest("Worker processes are not supported on Windows")
+        self.compile(prefix='runner_jobs_throws', args="--error-printer --have-fork GfSetUpThrows.h", run="%s -v --jobs 2 > %s 2>&1", output="gfsut.out")
+
+    def test_runner_isolate_suites(self):
+        """Suites in processes of their own"""
+        if sys.platform.startswith('win'):
+            self.skipTest("Worker processes are not supported on Windows")
+        self.compile(prefix='runner_isolate_suites', args="--error-printer --have-fork "+samples, run="%s -v --isolate suites > %s 2>&1", output="error.out")
+
+    def test_runner_isolate_tests(self):
+        """Tests in processes of their own"""
+        if sys.platform.startswith('win'):
+            self.skipTest("Worker processes are not supported on Windows")
+        self.compile(prefix='runner_isolate_tests', args="--error-printer --have-fork "+samples, run="%s -v --jobs 3 --isolate tests > %s 2>&1", output="error.out")
+
+    def test_runner_isolate_crash(self):
+        """Tests that crash in processes of their own"""
+        if sys.platform.startswith('win'):
+            self.skipTest("Worker processes are not supported on Windows")
+        self.compile(prefix='runner_isolate_crash', args="--error-printer --isolate=tests CrashSuite.h", run="%s > %s 2>&1", output="isolate.out")
+
+    def test_runner_shards(self):
+        """Runner shards"""
+        self.init('runner_shards')
+        xmlfile = currdir+self.prefix+'.xml'
+        cmd = "cd %s; %s %s../bin/cxxtestgen %s --xunit-printer --xunit-file=%s -o %s %s > %s 2>&1" % (currdir, sys.executable, currdir, self.fog, xmlfile, self.py_cpp, samples, self.py_out)
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        cmd = "cd %s; %s %s %s %s. %s%s../ %s > %s 2>&1" % (currdir, self.compiler, self.exe_option, self.build_target, self.include_option, self.include_option, currdir, self.py_cpp, self.build_log)
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        #
+        def run(args):
+            subprocess.call("cd %s; %s %s > %s 2>&1" % (currdir, self.build_target, args, self.px_pre), shell=True)
+            INPUT = open(xmlfile)
+            text = INPUT.read()
+            INPUT.close()
+            return re.findall('classname="([^"]*)" name="([^"]*)"', text)
+        expected = sorted(run(''))
+        for mode in ['', '--shard-hash']:
+            shards = [run('%s --shard-index %d --shard-count 3' % (mode, i)) for i in range(3)]
+            self.assertEqual(sorted(sum(shards, [])), expected)
+            if mode == '':
+                sizes = [len(shard) for shard in shards]
+                self.assertTrue(max(sizes) - min(sizes) <= 1)
+        status = subprocess.call("cd %s; %s --shard-index 3 --shard-count 3 > %s 2>&1" % (currdir, self.build_target, self.px_pre), shell=True)
+        self.assertNotEqual(status, 0)
+        os.remove(xmlfile)
+        self.passed=True
+
+    def test_runner_timings(self):
+        """Runner timing history"""
+        self.init('runner_timings')
+        xmlfile = currdir+self.prefix+'.xml'
+        history = currdir+self.prefix+'.txt'
+        cmd = "cd %s; %s %s../bin/cxxtestgen %s --xunit-printer --xunit-file=%s -o %s %s > %s 2>&1" % (currdir, sys.executable, currdir, self.fog, xmlfile, self.py_cpp, samples, self.py_out)
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        cmd = "cd %s; %s %s %s %s. %s%s../ %s > %s 2>&1" % (currdir, self.compiler, self.exe_option, self.build_target, self.include_option, self.include_option, currdir, self.py_cpp, self.build_log)
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        #
+        def run(args):
+            subprocess.call("cd %s; %s %s > %s 2>&1" % (currdir, self.build_target, args, self.px_pre), shell=True)
+            INPUT = open(xmlfile)
+            text = INPUT.read()
+            INPUT.close()
+            return re.findall('classname="([^"]*)" name="([^"]*)"', text)
+        def readHistory(path=history):
+            INPUT = open(path)
+            lines = [line.split() for line in INPUT.read().splitlines()]
+            INPUT.close()
+            return lines
+        #
+        # The first run writes the history of all of the tests
+        if os.path.exists(history):
+            os.remove(history)
+        expected = sorted(run('--save-timings %s' % history))
+        lines = readHistory()
+        self.assertEqual(sorted([(suite, test) for (suite, test, seconds) in lines]), expected)
+        #
+        # A suite that takes longer than all others gets a shard of its own
+        OUTPUT = open(history, 'w')
+        for (suite, test, seconds) in lines:
+            if (suite, test) == ('SimpleTest', 'testEquality'):
+                seconds = '1000'
+            OUTPUT.write('%s %s %s\n' % (suite, test, seconds))
+        OUTPUT.close()
+        INPUT = open(history)
+        before = INPUT.read()
+        INPUT.close()
+        #
+        # The shards share one history, and save their times in one file
+        saved = history+'.saved'
+        if os.path.exists(saved):
+            os.remove(saved)
+        shards = []
+        for i in range(3):
+            shards.append(run('--timings %s --save-timings %s --shard-index %d --shard-count 3' % (history, saved, i)))
+        self.assertEqual(sorted(sum(shards, [])), expected)
+        for shard in shards:
+            if ('SimpleTest', 'testEquality') in shard:
+                self.assertEqual(set([suite for (suite, test) in shard]), set(['SimpleTest']))
+        INPUT = open(history)
+        self.assertEqual(INPUT.read(), before)
+        INPUT.close()
+        self.assertEqual(sorted([(suite, test) for (suite, test, seconds) in readHistory(saved)]), expected)
+        os.remove(saved)
+        #
+        # A shard may not save its times in the history that balances the shards
+        status = subprocess.call("cd %s; %s --timings %s --save-timings %s --shard-index 0 --shard-count 3 > %s 2>&1" % (currdir, self.build_target, history, history, self.px_pre), shell=True)
+        self.assertNotEqual(status, 0)
+        os.remove(history)
+        os.remove(xmlfile)
+        self.passed=True
+
+    def test_runner_failed_first(self):
+        """Runner failed tests first"""
+        self.init('runner_failed_first')
+        xmlfile = currdir+self.prefix+'.xml'
+        results = currdir+self.prefix+'.txt'
+        cmd = "cd %s; %s %s../bin/cxxtestgen %s --xunit-printer --xunit-file=%s -o %s %s > %s 2>&1" % (currdir, sys.executable, currdir, self.fog, xmlfile, self.py_cpp, samples, self.py_out)
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        cmd = "cd %s; %s %s %s %s. %s%s../ %s > %s 2>&1" % (currdir, self.compiler, self.exe_option, self.build_target, self.include_option, self.include_option, currdir, self.py_cpp, self.build_log)
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        #
+        def run():
+            subprocess.call("cd %s; %s --failed-first %s > %s 2>&1" % (currdir, self.build_target, results, self.px_pre), shell=True)
+            INPUT = open(xmlfile)
+            text = INPUT.read()
+            INPUT.close()
+            return re.findall('classname="([^"]*)" name="([^"]*)"', text)
+        def readFailed():
+            INPUT = open(results)
+            lines = [line.split() for line in INPUT.read().splitlines()]
+            INPUT.close()
+            return [(line[1], line[2]) for line in lines if line[0] == 'failed']
+        #
+        # The first run records the tests that failed
+        if os.path.exists(results):
+            os.remove(results)
+        first = run()
+        failed = readFailed()
+        self.assertNotEqual(failed, [])
+        #
+        # The next run starts with the suites that had failures, and
+        # with the failed tests within those suites
+        second = run()
+        self.assertEqual(sorted(second), sorted(first))
+        failedSuites = set([suite for (suite, test) in failed])
+        suites = []
+        for (suite, test) in second:
+            if suite not in suites:
+                suites.append(suite)
+        self.assertEqual(set(suites[:len(failedSuites)]), failedSuites)
+        for name in failedSuites:
+            tests = [(suite, test) for (suite, test) in second if suite == name]
+            failedTests = [(suite, test) for (suite, test) in failed if suite == name]
+            self.assertEqual(set(tests[:len(failedTests)]), set(failedTests))
+        self.assertEqual(readFailed(), failed)
+        os.remove(results)
+        os.remove(xmlfile)
+        self.passed=True
+
+    def test_runner_slowest(self):
+        """Runner slowest tests"""
+        self.init('runner_slowest')
+        cmd = "cd %s; %s %s../bin/cxxtestgen %s --error-printer -o %s %sSimpleTest.h > %s 2>&1" % (currdir, sys.executable, currdir, self.fog, self.py_cpp, sampledir, self.py_out)
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        cmd = "cd %s; %s %s %s %s. %s%s../ %s > %s 2>&1" % (currdir, self.compiler, self.exe_option, self.build_target, self.include_option, self.include_option, currdir, self.py_cpp, self.build_log)
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        status = subprocess.call("cd %s; %s --slowest 3 > %s 2>&1" % (currdir, self.build_target, self.px_pre), shell=True)
+        self.assertEqual(status, 6)
+        INPUT = open(self.px_pre)
+        lines = INPUT.read().splitlines()
+        INPUT.close()
+        self.assertTrue('Slowest 3 tests:' in lines)
+        timings = lines[lines.index('Slowest 3 tests:')+1:]
+        self.assertEqual(len(timings), 3)
+        for timing in timings:
+            self.assertTrue(re.match('^   [0-9]+\\.[0-9]{3}s wall, [0-9]+\\.[0-9]{3}s cpu: SimpleTest::[Tt]est', timing), timing)
+        self.passed=True
+
+    def test_runner_timeout(self):
+        """Runner test and suite timeouts"""
+        self.init('runner_timeout')
+        cmd = "cd %s; %s %s../bin/cxxtestgen %s --error-printer --have-fork -o %s TimeoutSuite.h > %s 2>&1" % (currdir, sys.executable, currdir, self.fog, self.py_cpp, self.py_out)
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        cmd = "cd %s; %s %s %s %s. %s%s../ %s > %s 2>&1" % (currdir, self.compiler, self.exe_option, self.build_target, self.include_option, self.include_option, currdir, self.py_cpp, self.build_log)
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        def run(args):
+            status = subprocess.call("cd %s; %s %s > %s 2>&1" % (currdir, self.build_target, args, self.px_pre), shell=True)
+            INPUT = open(self.px_pre)
+            text = INPUT.read()
+            INPUT.close()
+            return status, text
+        #
+        # The test that hangs fails, and the run goes on with the next test
+        for args in ['--test-timeout 1', '--jobs 2 --test-timeout 1', '--isolate tests --test-timeout 1']:
+            status, text = run(args)
+            self.assertEqual(status, 1, text)
+            self.assertTrue(re.search('TimeoutSuite.h:[0-9]+: Error: Test failed: Test timed out after [0-9.]+s', text), text)
+            self.assertTrue('Warning: After the hang' in text, text)
+            self.assertTrue('Failed 1 of 4 tests' in text, text)
+        #
+        # A suite that times out skips its remaining tests
+        status, text = run('--suite-timeout 1')
+        self.assertEqual(status, 1, text)
+        self.assertTrue(re.search('Error: Test failed: Suite timed out, test stopped after [0-9.]+s', text), text)
+        self.assertFalse('Warning: After the hang' in text, text)
+        self.assertTrue('Failed 1 of 4 tests' in text, text)
+        self.passed=True
+
+    def test_runner_benchmarks(self):
+        """Runner benchmarks"""
+        self.init('runner_benchmarks')
+        results = currdir+self.prefix+'.json'
+        cmd = "cd %s; %s %s../bin/cxxtestgen %s --error-printer --have-fork -o %s BenchSuite.h > %s 2>&1" % (currdir, sys.executable, currdir, self.fog, self.py_cpp, self.py_out)
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        cmd = "cd %s; %s %s %s %s. %s%s../ %s > %s 2>&1" % (currdir, self.compiler, self.exe_option, self.build_target, self.include_option, self.include_option, currdir, self.py_cpp, self.build_log)
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        #
+        # The benchmark that passes is reported and saved, the one that
+        # fails is a failed test, in a serial run and in workers
+        for args in ['', '--jobs 2 ']:
+            if os.path.exists(results):
+                os.remove(results)
+            cmd = "cd %s; %s %s--bench-samples 3 --bench-results %s > %s 2>&1" % (currdir, self.build_target, args, results, self.px_pre)
+            status = subprocess.call(cmd, shell=True)
+            INPUT = open(self.px_pre)
+            text = INPUT.read()
+            INPUT.close()
+            self.assertEqual(status, 1, text)
+            self.assertTrue(re.search(r'Benchmark BenchSuite::benchSum: min [0-9.]+[mun]?s, median [0-9.]+[mun]?s, stddev [0-9.]+[mun]?s \([0-9]+ calls? x 3 samples\)', text), text)
+            self.assertTrue('Error: Test failed: Benchmark failed' in text, text)
+            self.assertTrue('Failed 1 of 3 tests' in text, text)
+            INPUT = open(results)
+            benchmarks = json.load(INPUT)['benchmarks']
+            INPUT.close()
+            self.assertEqual([(b['suite'], b['test'], b['samples']) for b in benchmarks], [('BenchSuite', 'benchSum', 3)])
+            self.assertTrue(0 < benchmarks[0]['min'] <= benchmarks[0]['median'])
+            self.assertTrue(benchmarks[0]['iterations'] >= 1)
+        os.remove(results)
+        self.passed=True
+
+    def test_runner_benchmark_baseline(self):
+        """Runner benchmark baseline"""
+        self.init('runner_benchmark_baseline')
+        xmlfile = currdir+self.prefix+'.xml'
+        baseline = currdir+self.prefix+'.json'
+        cmd = "cd %s; %s %s../bin/cxxtestgen %s --xunit-printer --have-fork --xunit-file=%s -o %s BenchSuite.h > %s 2>&1" % (currdir, sys.executable, currdir, self.fog, xmlfile, self.py_cpp, self.py_out)
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        cmd = "cd %s; %s %s %s %s. %s%s../ %s > %s 2>&1" % (currdir, self.compiler, self.exe_option, self.build_target, self.include_option, self.include_option, currdir, self.py_cpp, self.build_log)
+        status = subprocess.call(cmd, shell=True)
+        self.assertEqual(status, 0, 'Error executing command: '+cmd)
+        def run(args):
+            status = subprocess.call("cd %s; %s --bench-samples 3 %s > %s 2>&1" % (currdir, self.build_target, args, self.px_pre), shell=True)
+            INPUT = open(self.px_pre)
+            text = INPUT.read()
+            INPUT.close()
+            INPUT = open(xmlfile)
+            xml = INPUT.read()
+            INPUT.close()
+            return status, text, xml
+        def writeBaseline(median):
+            OUTPUT = open(baseline, 'w')
+            json.dump({'benchmarks': [{'suite': 'BenchSuite', 'test': 'benchSum', 'iterations': 1, 'samples': 3, 'min': median, 'median': median, 'stddev': 0}]}, OUTPUT)
+            OUTPUT.close()
+        #
+        # A missing baseline is an error
+        if os.path.exists(baseline):
+            os.remove(baseline)
+        status, text, xml = run('--baseline %s' % baseline)
+        self.assertTrue("cannot read baseline file" in text, text)
+        #
+        # The saved baseline holds the benchmark that passed
+        status, text, xml = run('--save-baseline %s' % baseline)
+        self.assertEqual(status, 1, text)
+        INPUT = open(baseline)
+        benchmarks = json.load(INPUT)['benchmarks']
+        INPUT.close()
+        self.assertEqual([(b['suite'], b['test']) for b in benchmarks], [('BenchSuite', 'benchSum')])
+        #
+        # A benchmark far faster than its baseline passes
+        writeBaseline(1.0)
+        status, text, xml = run('--baseline %s' % baseline)
+        self.assertEqual(status, 1, text)
+        self.assertTrue(re.search(r'Benchmark BenchSuite::benchSum: .*, baseline median 1\.000s \(-[0-9.]+%\)', text), text)
+        self.assertTrue(re.search(r'<benchmark baseline="1" ', xml), xml)
+        #
+        # A benchmark far slower than its baseline fails, in a serial
+        # run and in workers
+        writeBaseline(1e-12)
+        for args in ['', '--jobs 2 ']:
+            status, text, xml = run('%s--baseline %s --bench-threshold 20' % (args, baseline))
+            self.assertEqual(status, 2, text)
+            self.assertTrue(re.search(r'BenchSuite.h:[0-9]+: Error: Test failed: Benchmark regressed: median [0-9.]+[mun]?s, baseline 0\.001ns, limit [0-9.]+[mun]?s', text), text)
+            self.assertTrue('Failed 2 of 3 tests' in text, text)
+            self.assertTrue(re.search(r'<failure [^>]*>Test failed: Benchmark regressed: ', xml), xml)
+            self.assertTrue('failures="2"' in xml, xml)
+        #
+        # Times that are too long for fixed notation are printed in
+        # exponent notation
+        writeBaseline(1e300)
+        status, text, xml = run('--baseline %s' % baseline)
+        self.assertEqual(status, 1, text)
+        self.assertTrue(re.search(r', baseline median 1\.000e\+300s \(-[0-9.]+%\)', text), text)
+        writeBaseline(-1e300)
+        status, text, xml = run('--baseline %s' % baseline)
+        self.assertEqual(status, 2, text)
+        self.assertTrue(re.search(r'Benchmark regressed: median [0-9.]+[mun]?s, baseline -1\.000e\+300s, limit -[0-9.]+e\+300s', text), text)
+        writeBaseline(1e-300)
+        status, text, xml = run('--baseline %s' % baseline)
+        self.assertEqual(status, 2, text)
+        self.assertTrue(re.search(r', baseline median 0\.000ns \(\+[0-9.]+e\+[0-9]+%\)', text), text)
+        os.remove(baseline)
+        os.remove(xmlfile)
+        self.passed=True
+
     #
     # GUI
     #